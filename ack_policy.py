@@ -0,0 +1,68 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# ACK policy
+"""
+Decides when the server sends an ACK. Packets that arrive between two
+ACKs are covered by one cumulative ACK with SACK blocks, so the server
+does not need one send() per packet. An ACK is sent when:
+- `every` packets have arrived since the last ACK,
+- the oldest unACKed packet has waited `delay` seconds (delayed ACK), or
+- a packet arrived out of order and `immediate_out_of_order` is set,
+  so the client learns about the hole right away.
+"""
+
+
+class AckPolicy:
+    """
+    Counts packets waiting for an ACK and says when one is due
+    """
+
+    def __init__(self, every=16, delay=0.01, immediate_out_of_order=True):
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        self.every = every
+        self.delay = delay
+        self.immediate_out_of_order = immediate_out_of_order
+        self.pending = 0
+        self.first_pending = None  # arrival time of the oldest unACKed packet
+        self.out_of_order = False
+
+    def on_packet(self, now, out_of_order=False):
+        """
+        Counts a packet that needs to be ACKed
+        Args:
+            now (float): Arrival time
+            out_of_order (bool): True if the packet was not the next expected one
+        """
+        if not self.pending:
+            self.first_pending = now
+        self.pending += 1
+        if out_of_order and self.immediate_out_of_order:
+            self.out_of_order = True
+
+    def due(self, now):
+        """
+        Args: now (float): Current time
+        Returns: True if an ACK should be sent now
+        """
+        if not self.pending:
+            return False
+        return (self.pending >= self.every or self.out_of_order
+                or now - self.first_pending >= self.delay)
+
+    def time_until_due(self, now):
+        """
+        Args: now (float): Current time
+        Returns: Seconds until the delayed ACK timer fires, or None if no
+        packet is waiting for an ACK
+        """
+        if not self.pending:
+            return None
+        return max(0.0, self.first_pending + self.delay - now)
+
+    def reset(self):
+        """
+        Called after an ACK is sent
+        """
+        self.pending = 0
+        self.first_pending = None
+        self.out_of_order = False
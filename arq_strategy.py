@@ -0,0 +1,131 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# ARQ strategy
+"""
+Retransmission strategies of the client. The Client is one sender
+engine: the sliding window, the retransmission timers, the send buffer,
+the ACK parsing and the congestion control are the same for every
+protocol, and a strategy only decides what an ACK and a loss mean:
+    acked_ranges(stream, ranges): which of the ranges the server
+        reported are taken as ACKed
+    packets_past_hole(stream): how many packets the server has past the
+        start of the window, the duplicate ACK count of fast retransmit
+    lost(stream, seq_num): which packets are sent again when seq_num
+        is found lost (packets that are ACKed or already queued to be
+        sent again are skipped by the client)
+Both strategies run on the same receiver, which keeps every packet that
+fits its window.
+
+The strategies are picked by name with get_strategy:
+    sr   Selective Repeat: every packet the server reports is ACKed and
+         only the lost packet is sent again (the default)
+    gbn  Go-Back-N: only the cumulative ACK counts, and a loss sends the
+         lost packet and every packet sent after it again
+"""
+
+
+class SelectiveRepeat:
+    """
+    Selective Repeat: packets are ACKed one by one and resent one by one
+    """
+
+    name = "sr"
+
+    def acked_ranges(self, stream, ranges):
+        """
+        Args:
+            stream (SendStream): Stream the ranges are for
+            ranges (list): (start, end) ranges the server reported
+        Returns: The ranges to mark ACKed
+        """
+        return ranges
+
+    def packets_past_hole(self, stream):
+        """
+        Args: stream (SendStream): Stream to check
+        Returns: Packets the server has past the start of the window
+        """
+        return stream.packets.acked_past_base()
+
+    def lost(self, stream, seq_num):
+        """
+        Args:
+            stream (SendStream): Stream of the lost packet
+            seq_num (int): Packet found lost
+        Returns: The packets to send again
+        """
+        return (seq_num,)
+
+
+class GoBackN:
+    """
+    Go-Back-N: only the cumulative ACK counts. A packet received past a
+    hole is not ACKed, so once the hole is found lost the sender goes
+    back to it and sends every packet after it again. The packet it went
+    back to is kept in stream.go_back, so the other packets found lost by
+    the same timeout, which are past it and already queued, cost nothing.
+    The client clears it at every timeout and fast retransmit.
+    """
+
+    name = "gbn"
+
+    def acked_ranges(self, stream, ranges):
+        """
+        Keeps the ranges that extend the packets ACKed in order. The
+        packets reported past a hole are only counted, they stand for the
+        duplicate ACKs of the hole.
+        Args:
+            stream (SendStream): Stream the ranges are for
+            ranges (list): (start, end) ranges the server reported
+        Returns: The ranges to mark ACKed
+        """
+        accepted = []
+        edge = stream.win_start
+        covered = edge
+        past = 0
+        for start, end in sorted(ranges):
+            if start <= edge:
+                accepted.append((start, end))
+                edge = max(edge, end)
+            elif end > max(start, covered):
+                # count each packet once, SACK blocks repeat in every ACK
+                past += end - max(start, covered)
+            covered = max(covered, edge, end)
+        stream.sacked_past_hole = past
+        return accepted
+
+    def packets_past_hole(self, stream):
+        return stream.sacked_past_hole
+
+    def lost(self, stream, seq_num):
+        """
+        Args:
+            stream (SendStream): Stream of the lost packet
+            seq_num (int): Packet found lost
+        Returns: The lost packet and every packet sent after it, nothing
+        if it is past the packet already gone back to. The client skips
+        the ones ACKed or already waiting to be sent again.
+        """
+        if stream.go_back is not None and stream.go_back <= seq_num:
+            return ()
+        stream.go_back = seq_num
+        return range(seq_num, stream.next_seq)
+
+
+STRATEGIES = {
+    SelectiveRepeat.name: SelectiveRepeat,
+    GoBackN.name: GoBackN,
+}
+
+DEFAULT_STRATEGY = SelectiveRepeat.name
+
+
+def get_strategy(name):
+    """
+    Returns a retransmission strategy instance
+    Args: name (str): Name of the strategy
+    Returns: A SelectiveRepeat or GoBackN object
+    """
+    try:
+        return STRATEGIES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown ARQ strategy: {name}") from None
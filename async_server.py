@@ -0,0 +1,273 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Asyncio server
+"""
+Selective Repeat server that serves many clients at once on one asyncio
+event loop. Every connection gets its own ReceiverSession (receive
+window, ACK state and stats), so clients do not share any receive state.
+The delayed ACK timer of each session is a loop.call_later callback and
+connections that stay idle for idle_timeout seconds are closed.
+The sessions share one table of striped transfers, so the stripes a
+client sends over several connections are put back together here (see
+striping.py). With --trace the sessions record their events into one
+shared ring buffer (see tracing.py), and with --metrics each session
+writes its own metrics file, numbered by connection (see metrics.py).
+
+Run: python async_server.py [--host HOST] [--port PORT] [--idle-timeout S]
+     [--recv-budget BYTES] [--output PATH] [--trace events|packets]
+     [--metrics PATH]
+"""
+
+import argparse
+import asyncio
+import time
+
+from metrics import (MetricsRecorder, RECEIVER_COLUMNS, DEFAULT_INTERVAL,
+                     numbered_path)
+from receiver_session import (ReceiverSession, DEFAULT_RECV_BUDGET,
+                              OFFER_GRACE)
+from tracing import LEVELS, DEFAULT_CAPACITY, Tracer, dump_on_signal
+
+
+class SessionProtocol(asyncio.Protocol):
+    """
+    Connects one client's transport to its ReceiverSession
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.session = ReceiverSession(transfers=server.transfers,
+                                       **server.session_options)
+        self.transport = None
+        self.address = None
+        self.handshake_done = False
+        self.offer_timer = None  # accepts an offer that has no end marker
+        self.ack_timer = None
+        self.idle_timer = None
+        self.last_activity = 0.0
+        self.connected_at = 0.0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.address = transport.get_extra_info("peername")
+        self.connected_at = time.time()
+        self.last_activity = self.server.loop.time()
+        self.server.connection_made(self)
+        if self.server.metrics:
+            self.session.metrics = MetricsRecorder(
+                numbered_path(self.server.metrics, self.server.connections),
+                RECEIVER_COLUMNS, self.server.metrics_interval)
+        self.schedule_idle_check()
+
+    def data_received(self, data):
+        self.last_activity = self.server.loop.time()
+        if not self.handshake_done:
+            # the offer may come in pieces, packets may follow it at once
+            self.handshake(self.session.receive_offer(data))
+            return
+        self.session.parser.feed(data)
+        self.session.process_packets()
+        self.send_replies()
+
+    def handshake(self, reply):
+        """
+        Sends the handshake reply once the whole offer is in, then handles
+        any packets that came with it
+        Args: reply (bytes): Reply from the session, None if the offer is
+        not whole yet
+        """
+        if self.offer_timer is not None:
+            self.offer_timer.cancel()
+            self.offer_timer = None
+        if reply is None:
+            self.offer_timer = self.server.loop.call_later(
+                OFFER_GRACE, self.offer_timed_out)
+            return
+        self.transport.write(reply)
+        self.handshake_done = True
+        self.session.process_packets()
+        self.send_replies()
+
+    def offer_timed_out(self):
+        # an older client sends its offer without an end marker
+        self.offer_timer = None
+        if not self.handshake_done and not self.transport.is_closing():
+            self.handshake(self.session.receive_offer(b"", complete=True))
+
+    def send_replies(self):
+        """
+        Sends the ACKs that are due and restarts the timer for the next
+        delayed ACK or window update
+        """
+        if self.ack_timer is not None:
+            self.ack_timer.cancel()
+            self.ack_timer = None
+        if self.transport.is_closing():
+            return
+        now = time.time()
+        msg = self.session.replies(now)
+        if msg:
+            self.transport.write(msg)
+        delay = self.session.time_until_reply(now)
+        if delay is not None:
+            self.ack_timer = self.server.loop.call_later(delay, self.send_replies)
+
+    def schedule_idle_check(self):
+        """
+        Closes the connection once nothing has arrived for idle_timeout
+        """
+        idle_for = self.server.loop.time() - self.last_activity
+        if idle_for >= self.server.idle_timeout:
+            print(f"Closing idle connection from {self.address}")
+            self.server.idle_closed += 1
+            self.transport.close()
+            return
+        self.idle_timer = self.server.loop.call_later(
+            self.server.idle_timeout - idle_for, self.schedule_idle_check)
+
+    def eof_received(self):
+        # flush what is left and close our side too
+        self.send_replies()
+        return False
+
+    def connection_lost(self, exc):
+        for timer in (self.offer_timer, self.ack_timer, self.idle_timer):
+            if timer is not None:
+                timer.cancel()
+        if self.session.metrics is not None:
+            # the last, partial interval
+            self.session.sample_metrics(time.time())
+            self.session.metrics.close()
+        self.server.connection_lost(self)
+
+
+class AsyncServer:
+    """
+    Accepts clients and keeps stats across all of their sessions
+    """
+
+    def __init__(self, host="0.0.0.0", port=12344, idle_timeout=30.0,
+                 backlog=4096, metrics=None, metrics_interval=DEFAULT_INTERVAL,
+                 **session_options):
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.backlog = backlog
+        self.session_options = session_options
+        # metrics file of each session, numbered by connection
+        self.metrics = metrics
+        self.metrics_interval = metrics_interval
+        self.loop = None
+        self.server = None
+        self.sessions = set()
+        self.transfers = {}  # striped transfers in progress by id
+
+        self.connections = 0
+        self.completed = 0
+        self.idle_closed = 0
+        self.packets_received = 0
+        self.acks_sent = 0
+
+    def connection_made(self, protocol):
+        self.sessions.add(protocol)
+        self.connections += 1
+
+    def connection_lost(self, protocol):
+        self.sessions.discard(protocol)
+        session = protocol.session
+        if session.fin:
+            self.completed += 1
+        self.packets_received += session.pkt_counter
+        self.acks_sent += session.acks_sent
+        print(f"Client {protocol.address} done: {session.pkt_counter} packets, "
+              f"{session.acks_sent} ACKs, "
+              f"{time.time() - protocol.connected_at:.3f}s")
+        file_result = session.finish()
+        if file_result:
+            print(file_result)
+
+    async def start(self):
+        """
+        Starts listening. Returns once the socket is bound.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.server = await self.loop.create_server(
+            lambda: SessionProtocol(self), self.host, self.port,
+            backlog=self.backlog)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """
+        Serves clients until cancelled
+        """
+        if self.server is None:
+            await self.start()
+        print(f"Listening on {self.host}:{self.port}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """
+        Stops accepting clients and closes every open session
+        """
+        if self.server is not None:
+            self.server.close()
+        for protocol in list(self.sessions):
+            protocol.transport.close()
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    def __str__(self):
+        return (f"connections {self.connections}, active {len(self.sessions)}, "
+                f"completed {self.completed}, idle closed {self.idle_closed}, "
+                f"packets {self.packets_received}, ACKs {self.acks_sent}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Selective Repeat server for many clients")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=12344)
+    parser.add_argument("--idle-timeout", type=float, default=30.0)
+    parser.add_argument("--recv-budget", type=int, default=DEFAULT_RECV_BUDGET,
+                        help="bytes of packets buffered per client")
+    parser.add_argument("--output", default=None,
+                        help="where to write a file sent by a client, "
+                             "striped or not")
+    parser.add_argument("--trace", choices=LEVELS, default="off",
+                        help="record events (drops) or packets (every "
+                             "packet and ACK too) of every session")
+    parser.add_argument("--trace-file", default="server.trace",
+                        help="where the trace is written on exit, or on "
+                             "SIGUSR1")
+    parser.add_argument("--trace-capacity", type=int,
+                        default=DEFAULT_CAPACITY,
+                        help="events kept, older ones are overwritten")
+    parser.add_argument("--metrics", default=None,
+                        help="metrics file of each session, numbered by "
+                             "connection before the extension, CSV if it "
+                             "ends in .csv")
+    parser.add_argument("--metrics-interval", type=float,
+                        default=DEFAULT_INTERVAL,
+                        help="seconds between rows of --metrics")
+    args = parser.parse_args()
+
+    tracer = None
+    if args.trace != "off":
+        tracer = Tracer(args.trace, args.trace_capacity)
+        dump_on_signal(tracer, args.trace_file)
+    server = AsyncServer(args.host, args.port, args.idle_timeout,
+                         recv_budget=args.recv_budget,
+                         output_path=args.output, tracer=tracer,
+                         metrics=args.metrics,
+                         metrics_interval=args.metrics_interval)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    print(f"Server stats: {server}")
+    if tracer is not None:
+        tracer.dump(args.trace_file)
+        print(f"Trace: {tracer}, written to {args.trace_file}")
+
+
+if __name__ == '__main__':
+    main()
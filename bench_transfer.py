@@ -0,0 +1,373 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Transfer benchmark
+"""
+Benchmark suite for whole transfers over loopback. For every combination
+of the swept options it starts the server, the loss proxy (when the
+loss rate is not 0, see loss_proxy.py) and the client as separate
+processes, with no input() and no IP to edit, and records
+    goodput, bytes and packets per second, completion time (from the
+    client's --stats), wall time, CPU time and peak RSS of the client
+    and of the server (from wait4), retransmits and timeouts
+Each configuration runs --repeat times and the median of every value is
+written to a CSV results file, one line per configuration, as soon as
+it is known.
+
+Any results file can be the baseline of a later run. With --baseline,
+every configuration found in both is compared, and a value that got
+worse by more than --threshold (10% by default) is flagged as a
+regression; the exit status is then 1, so the suite can gate a change.
+
+Run: python bench_transfer.py --packets 10000 100000 --window 64 65536
+     --loss 0 0.01 --arq sr gbn [--transport tcp udp] [--cc newreno]
+     [--repeat 3] [--output bench_results.csv] [--baseline old.csv]
+Loss needs TCP, the proxy only forwards TCP; UDP runs with a loss rate
+are skipped.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from arq_strategy import STRATEGIES
+from client_Sophia_Sorensen_Channon_Zuo import DEFAULT_MAX_WINDOW
+from congestion_control import ALGORITHMS, DEFAULT_ALGORITHM
+from udp_transport import TRANSPORTS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HOST = "127.0.0.1"
+
+CONFIG_COLUMNS = ("transport", "arq", "cc", "packets", "window", "loss")
+RESULT_COLUMNS = ("goodput", "bytes_per_sec", "packets_per_sec",
+                  "completion_time", "wall_time", "client_cpu", "server_cpu",
+                  "client_rss_kb", "server_rss_kb", "retransmits", "timeouts")
+COLUMNS = CONFIG_COLUMNS + RESULT_COLUMNS + ("runs", "status")
+
+# values compared with the baseline: 1 if higher is better, -1 if lower is
+COMPARED = {"goodput": 1, "bytes_per_sec": 1, "packets_per_sec": 1,
+            "completion_time": -1, "client_cpu": -1, "server_cpu": -1,
+            "client_rss_kb": -1, "server_rss_kb": -1}
+
+
+def free_port():
+    """
+    Returns: A TCP port nobody listens on right now
+    """
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def start(script, args, log_path):
+    """
+    Starts one of the programs with its output going to a log file
+    Args:
+        script (str): File name of the program
+        args (list): Command line arguments
+        log_path (str): File the output is written to
+    Returns: The subprocess.Popen
+    """
+    with open(log_path, "w") as log:
+        return subprocess.Popen(
+            [sys.executable, "-u", os.path.join(HERE, script)] + args,
+            stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+            cwd=HERE)
+
+
+def wait_for(process, log_path, text, timeout=10.0):
+    """
+    Waits until a program prints a line, e.g. that it is listening
+    Args:
+        process (Popen): The program
+        log_path (str): Its log file
+        text (str): Text to wait for
+        timeout (float): Seconds to wait
+    Returns: True once the text is in the log, False if the program
+    ended or the time ran out first
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with open(log_path) as log:
+            if text in log.read():
+                return True
+        if process.poll() is not None:
+            return False
+        time.sleep(0.01)
+    return False
+
+
+def reap(process, timeout):
+    """
+    Waits for a program to end, killing it after timeout seconds
+    Args:
+        process (Popen): The program
+        timeout (float): Seconds to wait
+    Returns: (exit code, CPU seconds, peak RSS in KB). CPU and RSS are
+    None where os.wait4 does not exist. The exit code is None if the
+    program was killed.
+    """
+    if not hasattr(os, "wait4"):
+        try:
+            return process.wait(timeout), None, None
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            return None, None, None
+    deadline = time.monotonic() + timeout
+    killed = False
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            break
+        if time.monotonic() >= deadline and not killed:
+            process.kill()
+            killed = True
+        time.sleep(0.005)
+    # reaped here, so Popen must not wait for it again
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return (None if killed else process.returncode,
+            usage.ru_utime + usage.ru_stime, usage.ru_maxrss)
+
+
+def tail(path, lines=5):
+    """
+    Returns: The last lines of a log file, indented
+    """
+    with open(path) as log:
+        return "".join("    " + line for line in log.readlines()[-lines:])
+
+
+def run_once(config, workdir, timeout, seed):
+    """
+    Runs one transfer with the server, the proxy and the client each in
+    its own process
+    Args:
+        config (dict): Values of CONFIG_COLUMNS
+        workdir (str): Directory for the logs and the client's stats
+        timeout (float): Seconds the client may take
+        seed (int): Seed of the proxy's losses
+    Returns: dict of RESULT_COLUMNS and status
+    """
+    logs = {name: os.path.join(workdir, f"{name}.log")
+            for name in ("server", "proxy", "client")}
+    stats_path = os.path.join(workdir, "stats.json")
+    if os.path.exists(stats_path):
+        os.remove(stats_path)
+    transport = config["transport"]
+    server_port = free_port()
+    server = start("server_Sophia_Sorensen_Channon_Zuo.py",
+                   ["--transport", transport, "--host", HOST,
+                    "--port", str(server_port)], logs["server"])
+    proxy = None
+    try:
+        if not wait_for(server, logs["server"], "Listening on"):
+            print(f"Server did not start:\n{tail(logs['server'])}")
+            return {"status": "failed"}
+        port = server_port
+        if config["loss"]:
+            port = free_port()
+            proxy = start("loss_proxy.py",
+                          ["--listen", str(port), "--listen-host", HOST,
+                           "--server", f"{HOST}:{server_port}",
+                           "--drop", str(config["loss"]), "--seed", str(seed)],
+                          logs["proxy"])
+            if not wait_for(proxy, logs["proxy"], "Proxy listening"):
+                print(f"Proxy did not start:\n{tail(logs['proxy'])}")
+                return {"status": "failed"}
+
+        started = time.perf_counter()
+        client = start("client_Sophia_Sorensen_Channon_Zuo.py",
+                       ["--transport", transport, "--host", HOST,
+                        "--port", str(port), "--packets",
+                        str(config["packets"]), "--max-window",
+                        str(config["window"]), "--arq", config["arq"],
+                        "--cc", config["cc"], "--stats", stats_path],
+                       logs["client"])
+        code, client_cpu, client_rss = reap(client, timeout)
+        wall_time = time.perf_counter() - started
+        if proxy is not None:
+            # the client is gone, so the proxy has passed on its close
+            proxy.terminate()
+        # over UDP the server lingers a little after the client's FIN
+        _, server_cpu, server_rss = reap(server, 10.0)
+    finally:
+        for process in (server, proxy):
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+    if code is None:
+        print(f"Client timed out after {timeout}s:\n{tail(logs['client'])}")
+        return {"status": "timeout"}
+    if code != 0 or not os.path.exists(stats_path):
+        print(f"Client failed with exit code {code}:\n{tail(logs['client'])}")
+        return {"status": "failed"}
+    with open(stats_path) as f:
+        stats = json.load(f)
+    return {"goodput": stats["goodput"],
+            "bytes_per_sec": stats["bytes_per_sec"],
+            "packets_per_sec": stats["packets_per_sec"],
+            "completion_time": stats["elapsed"], "wall_time": wall_time,
+            "client_cpu": client_cpu, "server_cpu": server_cpu,
+            "client_rss_kb": client_rss, "server_rss_kb": server_rss,
+            "retransmits": stats["retransmits"],
+            "timeouts": stats["timeouts"], "status": "ok"}
+
+
+def median_row(config, runs):
+    """
+    Args:
+        config (dict): Values of CONFIG_COLUMNS
+        runs (list): Results of every run of the configuration
+    Returns: dict of COLUMNS, each result the median of the runs that
+    finished
+    """
+    done = [run for run in runs if run["status"] == "ok"]
+    row = dict(config, runs=len(done),
+               status="ok" if len(done) == len(runs) else
+               f"{len(runs) - len(done)} of {len(runs)} failed")
+    for name in RESULT_COLUMNS:
+        values = [run[name] for run in done if run[name] is not None]
+        row[name] = statistics.median(values) if values else None
+    return row
+
+
+def config_key(row):
+    """
+    Returns: The configuration of a results row, the same whether the
+    row was just measured or read back from a file
+    """
+    return (row["transport"], row["arq"], row["cc"], int(row["packets"]),
+            int(row["window"]), float(row["loss"]))
+
+
+def load_results(path):
+    """
+    Args: path (str): Results file written by an earlier run
+    Returns: dict of configuration to its row
+    """
+    with open(path, newline="") as f:
+        return {config_key(row): row for row in csv.DictReader(f)}
+
+
+def compare(baseline, rows, threshold):
+    """
+    Prints every value of rows next to the baseline's and flags the ones
+    that got worse by more than threshold
+    Args:
+        baseline (dict): Rows of the baseline by configuration
+        rows (list): Rows of this run
+        threshold (float): Fraction a value may get worse by, e.g. 0.1
+    Returns: List of (configuration, value name, change) of the regressions
+    """
+    regressions = []
+    print(f"\n{'configuration':<40} {'value':<16} {'baseline':>12} "
+          f"{'now':>12} {'change':>8}")
+    for row in rows:
+        key = config_key(row)
+        old = baseline.get(key)
+        if old is None or row["status"] != "ok":
+            continue
+        label = " ".join(str(value) for value in key)
+        for name, better in COMPARED.items():
+            if row[name] is None or old.get(name) in (None, ""):
+                continue
+            before = float(old[name])
+            if not before:
+                continue
+            change = (row[name] - before) / before
+            flag = ""
+            if change * better < -threshold:
+                flag = "REGRESSION"
+                regressions.append((key, name, change))
+            elif change * better > threshold:
+                flag = "improved"
+            print(f"{label:<40} {name:<16} {before:>12.4g} {row[name]:>12.4g} "
+                  f"{change:>+8.1%} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transfer benchmark suite")
+    parser.add_argument("--packets", type=int, nargs="+", default=[10000])
+    parser.add_argument("--window", type=int, nargs="+",
+                        default=[DEFAULT_MAX_WINDOW],
+                        help="largest congestion windows in packets")
+    parser.add_argument("--loss", type=float, nargs="+", default=[0.0],
+                        help="chance that the proxy drops a data frame")
+    parser.add_argument("--arq", nargs="+", choices=sorted(STRATEGIES),
+                        default=sorted(STRATEGIES))
+    parser.add_argument("--transport", nargs="+", choices=TRANSPORTS,
+                        default=["tcp"])
+    parser.add_argument("--cc", nargs="+", choices=sorted(ALGORITHMS),
+                        default=[DEFAULT_ALGORITHM])
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs of each configuration, the median is kept")
+    parser.add_argument("--timeout", type=float, default=300.0,
+                        help="seconds a client may take before it is killed")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="seed of the proxy's losses")
+    parser.add_argument("--output", default="bench_results.csv",
+                        help="results file, usable as a later --baseline")
+    parser.add_argument("--baseline", default=None,
+                        help="results file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="fraction a value may get worse by before it "
+                             "is flagged")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline) if args.baseline else None
+    rows = []
+    print(f"{'transport':>9} {'arq':>3} {'cc':>8} {'packets':>8} "
+          f"{'window':>6} {'loss':>6} {'goodput':>7} {'bytes/s':>11} "
+          f"{'time s':>8} {'cpu c+s':>8} {'rss MB':>7} {'status'}")
+    with open(args.output, "w", newline="") as f, \
+            tempfile.TemporaryDirectory() as workdir:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        for transport, arq, cc, packets, window, loss in itertools.product(
+                args.transport, args.arq, args.cc, args.packets, args.window,
+                args.loss):
+            if loss and transport != "tcp":
+                print(f"Skipping {transport} with loss {loss}: the loss "
+                      f"proxy only forwards TCP")
+                continue
+            config = {"transport": transport, "arq": arq, "cc": cc,
+                      "packets": packets, "window": window, "loss": loss}
+            runs = [run_once(config, workdir, args.timeout, args.seed + i)
+                    for i in range(args.repeat)]
+            row = median_row(config, runs)
+            rows.append(row)
+            writer.writerow(row)
+            f.flush()
+            if row["runs"]:
+                cpu = (row["client_cpu"] or 0) + (row["server_cpu"] or 0)
+                rss = max(row["client_rss_kb"] or 0,
+                          row["server_rss_kb"] or 0) / 1024
+                print(f"{transport:>9} {arq:>3} {cc:>8} {packets:>8} "
+                      f"{window:>6} {loss:>6.3f} {row['goodput']:>7.3f} "
+                      f"{row['bytes_per_sec']:>11.0f} "
+                      f"{row['completion_time']:>8.3f} {cpu:>8.2f} "
+                      f"{rss:>7.1f} {row['status']}")
+            else:
+                print(f"{transport:>9} {arq:>3} {cc:>8} {packets:>8} "
+                      f"{window:>6} {loss:>6.3f} {row['status']}")
+    print(f"Results written to {args.output}")
+
+    if baseline is None:
+        return
+    regressions = compare(baseline, rows, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regressions past {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"\nNo regressions past {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Wire format microbenchmark
+"""
+Measures how many packets per second each wire format can encode and
+parse. A window of sequence numbers is encoded into one byte string, the
+way it would arrive from the socket, and then decoded repeatedly.
+
+Run: python bench_wire_format.py [window_size] [rounds]
+"""
+
+import sys
+import time
+
+import wire_format
+
+
+def bench_format(name, window_size, rounds):
+    """
+    Times encoding and decoding one window with a wire format
+    Args:
+        name (str): Name of the wire format
+        window_size (int): Number of packets in the window
+        rounds (int): Number of times the window is encoded and decoded
+    Returns: (encode packets/sec, decode packets/sec)
+    """
+    codec = wire_format.get_codec(name)
+    seq_nums = range(window_size)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        data = b"".join([codec.encode_data(i) for i in seq_nums])
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        frames, consumed = codec.decode(data)
+    decode_time = time.perf_counter() - start
+
+    assert consumed == len(data) and len(frames) == window_size
+    assert frames[-1][2] == window_size - 1
+    total = window_size * rounds
+    return total / encode_time, total / decode_time
+
+
+def main():
+    window_size = int(sys.argv[1]) if len(sys.argv) > 1 else 2**16
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"Window size: {window_size}, rounds: {rounds}")
+    print(f"{'format':<8}{'encode pkts/s':>16}{'decode pkts/s':>16}")
+    for name in wire_format.CODECS:
+        encode_rate, decode_rate = bench_format(name, window_size, rounds)
+        print(f"{name:<8}{encode_rate:>16,.0f}{decode_rate:>16,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,59 +3,71 @@
 """
 Selective Repeat TCP program
 This program simulates the process of a TCP program with a
-Selective Repeat sliding window protocol. There are two classes:
-Packet and Client.
-Packet maintains its data and its timer.
-Client interacts with the server program and manages the
-Selective Repeat protocol.
+Selective Repeat sliding window protocol. The Client class
+interacts with the server program and manages the Selective Repeat
+protocol. The state of every packet in the window (sent, ACKed and its
+timer) is kept in a SenderTable. Client.run drives the transfer with a
+selectors loop that sends, reads ACKs and fires retransmission timers
+as soon as each one is ready, instead of blocking on the next ACK.
+The same sender runs Go-Back-N with --arq gbn (see arq_strategy.py),
+which only changes what an ACK and a loss mean, so both protocols can be
+compared on equal terms. client.py runs it with Go-Back-N by default.
+With --transport udp the frames go over UDP instead of TCP, so losses
+are real and the sliding window is what makes the transfer reliable.
+The window size comes from a congestion control algorithm picked with
+--cc (see congestion_control.py), and --pacing spreads each window over
+the RTT instead of sending it in one burst (see pacer.py).
+With --file the packets carry a real file, one segment per sequence
+number, read straight out of a memory map (see file_transfer.py).
+With --streams the packets are split between several streams on the
+same connection. Each stream has its own window, sequence space and FIN
+(see send_stream.py) while the congestion window is shared, and
+--repeat sends again in new streams on the window already built up.
+With --stripes the packets are cut into stripes, each sent by its own
+worker process over its own connection so the transfer is not held to
+one core, and the asyncio server puts them back together (see
+striping.py).
+The hot paths do not print: with --trace they record typed events
+(packets sent, ACKs, timeouts, window changes) into an in-memory ring
+buffer that is dumped to --trace-file (see tracing.py). --metrics writes
+the window, RTT percentiles, throughput and retransmits to a CSV or
+binary file at a fixed interval (see metrics.py), and plot_metrics.py
+draws the charts from it afterwards.
 
 To run this program, run the server first and get the IP address of the server.
 Next, change the IP line in the Client init method and then run the client.
 """
 
+import argparse
+import contextlib
+import json
+import os
+import selectors
 import socket
 import time
-import math
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
 
+import wire_format
+from arq_strategy import STRATEGIES, DEFAULT_STRATEGY, get_strategy
+from congestion_control import ALGORITHMS, DEFAULT_ALGORITHM, get_algorithm
+from file_transfer import FileSource, DEFAULT_SEGMENT_SIZE
+from frame_parser import FrameParser, DEFAULT_BUFFER_SIZE
+from metrics import (MetricsRecorder, SENDER_COLUMNS, DEFAULT_INTERVAL,
+                     numbered_path)
+from pacer import Pacer, PACING_MODES, cwnd_rate
+from send_buffer import SendBuffer
+from send_stream import MAX_STREAMS, SendStream, fair_shares
+from striping import stripe_ranges
+from tracing import (LEVELS, EVENTS, PACKETS, SEND, RETRANSMIT, ACK, WINDOW,
+                     TIMEOUT, FAST_RETRANSMIT, PROBE, ADVANCE, DEFAULT_CAPACITY,
+                     Tracer, hook, dump_on_signal)
+from rtt_estimator import RttEstimator
+from sender_table import Packet  # noqa: F401 (kept for importers)
+from udp_transport import UdpSocket, DEFAULT_MTU, MAX_DATAGRAM, TRANSPORTS
+from wire_capture import OFFER, REPLY, WireCapture
 
-class Packet:
-    """
-    Packet object that manages its own data (sequence number) and its timer.
-    """
-
-    def __init__(self, sequence_num):
-        self.sequence_num = sequence_num
-        self.received = False
-        self.sent = False
-        self.start = time.time()
-
-    def start_timer(self):
-        """
-        Starts the timer for packet's rtt
-        """
-        if not self.received:
-            self.start = time.time()
-        else:
-            print(
-                f"Not starting packet {self.sequence_num}'s time because it has been ACKed already.")
-
-    def get_time_since_sent(self):
-        """
-        Returns the rtt of the packet
-        Returns: An integer representing the rtt of the packet
-        """
-        return time.time() - self.start
-
-    def __str__(self):
-        """
-        Overrides the print statement for printing packet
-        Returns: A string representation of the packet's sequence number
-        """
-        return str(self.sequence_num)
-
-    def __repr__(self):
-        return str(self.sequence_num) + " " + str(self.received)
+DUP_ACK_THRESHOLD = 3  # packets ACKed past a hole before it is resent
+DEFAULT_MAX_WINDOW = 2**16  # largest congestion window in packets
 
 
 class Client:
@@ -63,31 +75,143 @@ class Client:
     Client object that simulates the actions of a client server.
     """
 
-    def __init__(self, total_packets):
+    def __init__(self, total_packets, recv_buffer_size=DEFAULT_BUFFER_SIZE,
+                 min_rto=0.2, max_rto=60.0, transport="tcp", mtu=DEFAULT_MTU,
+                 congestion_control=DEFAULT_ALGORITHM, pacing=None,
+                 pacing_rate=None, source=None, max_streams=1, clock=time.time,
+                 sock=None, arq=DEFAULT_STRATEGY, tracer=None, metrics=None,
+                 max_window=DEFAULT_MAX_WINDOW, capture=None):
         self.ip = "192.168.1.67"  # TODO: Change depending on the host
         self.port = 12344
+        # every timer reads this clock, the simulator passes a virtual one
+        self.clock = clock
+        # structured trace (see tracing.py), a hook is None below its level
+        self.tracer = tracer
+        self.trace = hook(tracer, EVENTS)
+        self.trace_packets = hook(tracer, PACKETS)
+        # time series of the transfer, a MetricsRecorder or None
+        self.metrics = metrics
+        # bytes sent and when, for replay_capture.py, a WireCapture or None
+        self.capture = capture
 
-        self.win_size = 1  # Implement AIMD and intitial size should be 1
-        self.win_start = 0
-        self.packets = [Packet(i) for i in range(total_packets)]
-        self.packets.append(Packet("FIN"))
-
-        self.ttl = [Packet(i) for i in range(total_packets)]
-        self.client_socket = socket.socket(
-            socket.AF_INET, socket.SOCK_STREAM)  # instantiate
+        self.MAX_WIN_SIZE = max_window  # 2^16 max window size by default
+        # the congestion control algorithm sets the window size, which is
+        # shared by every stream of the connection
+        self.cc = get_algorithm(congestion_control, max_cwnd=self.MAX_WIN_SIZE)
+        self.win_size = self.cc.window()  # initial size should be 1
+        # Selective Repeat or Go-Back-N, see arq_strategy.py
+        self.arq = get_strategy(arq)
+        # "off" sends the window at once, "cwnd" paces at about one window
+        # per SRTT and "rate" at a fixed pacing_rate in packets per second.
+        # None paces only algorithms that need it (BBR).
+        if pacing is None:
+            pacing = "cwnd" if self.cc.paced else "off"
+        if pacing not in PACING_MODES:
+            raise ValueError(f"Unknown pacing mode: {pacing}")
+        if pacing == "rate" and not pacing_rate:
+            raise ValueError("pacing at a fixed rate needs pacing_rate")
+        self.pacing = pacing
+        self.pacer = Pacer()
+        if pacing == "rate":
+            self.pacer.set_rate(pacing_rate, self.clock())
+        self.pacing_held = False  # the pacer held back part of the last round
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}")
+        self.transport = transport
+        if sock is not None:
+            # socket-like object given by the caller, e.g. a simulated link
+            self.client_socket = sock
+        elif transport == "udp":
+            self.client_socket = UdpSocket(mtu)
+        else:
+            self.client_socket = socket.socket(
+                socket.AF_INET, socket.SOCK_STREAM)  # instantiate
+        self.mtu = mtu
+        if not 1 <= max_streams <= MAX_STREAMS:
+            raise ValueError(f"max_streams must be 1 to {MAX_STREAMS}")
+        # Wire formats offered in the handshake, best first. Streams need
+        # a format with stream ids (files one with payloads, see open_stream)
+        self.wire_formats = wire_format.SUPPORTED_FORMATS
+        if max_streams > 1:
+            self.wire_formats = self.supported_formats("supports_streams")
+        self.connected = False  # the handshake picked the wire format
+        # more key=value options to offer in the handshake, and the ones
+        # the server answered with
+        self.handshake_options = {}
+        self.server_options = {}
+        self.codec = wire_format.get_codec("ascii", wire_format.KIND_ACK)
+        self.parser = FrameParser(self.codec, recv_buffer_size)
+        if transport == "udp":
+            # a datagram is read whole or not at all
+            self.parser.min_room = MAX_DATAGRAM
+        # every packet due in a round is encoded here and sent together
+        self.send_buffer = SendBuffer(self.codec)
+        self.send_buffer.capture = capture
 
-        self.rtt = 0
-        self.estimated_rtt = 0
+        # smoothed RTT and retransmission timeout
+        self.rtt_estimator = RttEstimator(min_rto=min_rto, max_rto=max_rto)
 
         self.packets_sent = 0
         self.acks_received = 0
-        self.packets_dropped_dict = {}
         self.packets_dropped_counter = 0
+        self.fast_retransmits = 0
+        self.zero_window_probes = 0
+        self.probes_unanswered = 0  # probes the server will count as duplicates
 
-        self.AIMD_FLAG = False  # Triggered when first loss occurs and won't change
-        self.MAX_WIN_SIZE = 2**16  # 2^16 max window size
-        self.loss_occured_flag = False  # Triggered when any loss occurs.
-        self.fin = False
+        # streams multiplexed on the connection, each with its own
+        # sequence space, window and FIN. Stream 0 is opened here and
+        # more can be opened with open_stream, also between runs.
+        self.max_streams = max_streams  # lowered to what the server accepts
+        self.streams = {}
+        self.next_stream_id = 0
+        self.first_share = 0  # stream that gets leftover room first, rotated
+        self.open_stream(total_packets, source)
+
+        self.closed = False  # the server closed the connection
+
+    def open_stream(self, total_packets, source=None):
+        """
+        Opens another stream on the connection. It shares the congestion
+        window with the other streams, so on a connection that is already
+        running it does not start over from slow start.
+        Args:
+            total_packets (int): Number of packets to send on the stream
+            source (FileSource): File the packets carry, None for empty packets
+        Returns: The new SendStream
+        """
+        if self.next_stream_id >= MAX_STREAMS:
+            raise ValueError("Every stream id of the connection has been used")
+        if len(self.active_streams()) >= self.max_streams:
+            raise ValueError(f"At most {self.max_streams} streams can be open")
+        if source is not None:
+            if not self.connected:
+                self.wire_formats = self.supported_formats("supports_payload")
+            elif not self.codec.supports_payload:
+                raise ValueError(f"{self.codec.name} cannot carry file data")
+            frame_size = wire_format.HEADER.size + source.segment_size
+            if self.transport == "udp" and \
+                    frame_size > self.client_socket.max_payload:
+                raise ValueError(f"Segments of {source.segment_size} bytes do "
+                                 f"not fit in an MTU of {self.mtu}")
+        stream = SendStream(self.next_stream_id, total_packets, source,
+                            self.clock())
+        self.streams[stream.stream_id] = stream
+        self.next_stream_id += 1
+        return stream
+
+    def supported_formats(self, feature):
+        """
+        Args: feature (str): Codec attribute the format must have set
+        Returns: The wire formats still offered that have the feature
+        """
+        return tuple(name for name in self.wire_formats
+                     if getattr(wire_format.get_codec(name), feature))
+
+    def active_streams(self):
+        """
+        Returns: List of the streams that are not done, lowest id first
+        """
+        return [stream for stream in self.streams.values() if not stream.done()]
 
     def handshake(self):
         """
@@ -98,205 +222,965 @@ class Client:
         # Establish the connection
         self.client_socket.connect((self.ip, self.port))
         print("-------------- START of handshake --------------")
-        start = time.time()
-        self.client_socket.send(b"Network")
-        print(f"From Server: {self.client_socket.recv(1024).decode()}")
-        self.rtt = time.time() - start + 0.02
+        start = self.clock()
+        offer = self.make_offer()
+        if self.capture is not None:
+            self.capture.record(OFFER, offer)
+        if self.transport == "udp":
+            # nothing resends a lost offer or reply over UDP but us
+            reply = self.client_socket.request(offer, self.rtt_estimator.rto)
+        else:
+            self.client_socket.send(offer)
+            reply = self.client_socket.recv(1024)
+        rtt_sample = self.clock() - start
+        if self.transport == "udp" and self.client_socket.handshake_retries:
+            # the reply may be to any of the offers sent
+            rtt_sample = None
+        if self.capture is not None:
+            self.capture.record(REPLY, reply)
+        self.accept_reply(reply, rtt_sample)
         print("-------------- END of handshake --------------\n\n")
 
-    def get_win_end(self):
+    def make_offer(self):
         """
-        Returns the end of the sliding window
-        Returns: An int representing the end of the sliding window
+        Builds the handshake offer: the wire formats, the streams and the
+        file sent on stream 0
+        Returns: bytes to send
         """
-        win_end = self.win_start + self.win_size
-        if win_end >= len(self.packets) - 1:
-            print("Reaching end of all packets, win_end is end of list")
-            return len(self.packets)
-        else:
-            return win_end
+        options = dict(self.handshake_options)
+        if self.max_streams > 1:
+            options["streams"] = self.max_streams
+        source = self.streams[0].source
+        if source is not None:
+            # the file of stream 0 is the one the server stores
+            options.update(size=source.size, segment=source.segment_size)
+            digest = source.checksum()
+            if digest is not None:
+                options["checksum"] = digest
+        return wire_format.handshake_offer(self.wire_formats, **options)
+
+    def accept_reply(self, reply, rtt_sample=None):
+        """
+        Sets up the connection from the server's handshake reply
+        Args:
+            reply (bytes): Handshake reply from the server
+            rtt_sample (float): Seconds from offer to reply, None if unknown
+        """
+        print(f"From Server: {reply.decode()}")
+        if rtt_sample is not None:
+            self.rtt_estimator.on_sample(rtt_sample)
+        self.server_options = wire_format.parse_options(reply)
+        self.codec = wire_format.get_codec(
+            wire_format.parse_accept(reply), wire_format.KIND_ACK)
+        self.parser.codec = self.codec
+        self.send_buffer.codec = self.codec
+        if self.transport == "udp":
+            self.client_socket.codec = self.codec
+        print(f"Wire format: {self.codec.name}")
+        if any(stream.source is not None for stream in self.streams.values()) \
+                and not self.codec.supports_payload:
+            raise ValueError(f"The server picked {self.codec.name}, "
+                             f"which cannot carry file data")
+        if self.max_streams > 1:
+            if not self.codec.supports_streams:
+                raise ValueError(f"The server picked {self.codec.name}, "
+                                 f"which cannot carry stream ids")
+            accepted = int(self.server_options.get("streams", 1))
+            self.max_streams = max(1, min(self.max_streams, accepted))
+            print(f"Streams: up to {self.max_streams} at once")
+        self.connected = True
 
-    def send_message(self, packet):
+    def send_message(self, stream, seq_num):
         """
-        Sends sequence number to server
-        Args: packet (Packet): Packet object to send
+        Queues sequence number to be sent to server on the next flush
+        Args:
+            stream (SendStream): Stream of the packet
+            seq_num (int): Index of the packet to send
         """
-        msg = str(packet.sequence_num) + ","
-        self.client_socket.send(msg.encode())
+        if seq_num == stream.packets.fin_index:
+            self.send_buffer.add_fin(stream.stream_id)
+        elif stream.source is not None:
+            self.send_buffer.add_data(seq_num, stream.source.segment(seq_num),
+                                      stream.stream_id)
+        else:
+            self.send_buffer.add_data(seq_num, stream=stream.stream_id)
         self.packets_sent += 1
 
-    # TODO: Have the ttl for packet 0 be the rtt and then base the ttl on the prev ttl
-    # TODO: Turn time_in_flight into a small function
+    def flush_messages(self):
+        """
+        Sends every queued message. Short writes are retried until the
+        kernel has taken all of the bytes. On a non-blocking socket the
+        bytes that do not fit stay queued for the next flush.
+        Returns: True if nothing is left to send
+        """
+        return self.send_buffer.flush(self.client_socket)
+
+    def send_packet(self, stream, seq_num, now):
+        """
+        Sends a packet and starts its retransmission timer
+        Args:
+            stream (SendStream): Stream of the packet
+            seq_num (int): Index of the packet to send
+            now (float): Current time
+        """
+        if self.trace_packets:
+            self.trace_packets(
+                RETRANSMIT if stream.packets.retransmit_count(seq_num)
+                else SEND, stream.stream_id, seq_num)
+        stream.packets.mark_sent(seq_num, now)
+        stream.timer.schedule(seq_num, now, self.rtt_estimator.rto)
+        self.send_message(stream, seq_num)
+
     def send_window(self):
         """
-        Sends all messages in the window. Iterates through the window
-        and checks time on the packets. All packets that have surpassed
-        their window will be resent.
+        Sends all messages in the window. Packets whose retransmission
+        timer has run out are queued and resent, then packets that have
+        never been sent are sent. Only expired timers are looked at, so
+        the cost does not grow with the window. Every packet of the round
+        is encoded into the send buffer and flushed at the end.
+        All streams share the congestion window: the room it has left is
+        split fairly between the streams with new packets to send.
         Arguments: None
         Return: None
         """
-        win_end = self.get_win_end()
-        print(f"Sending window: {self.packets[self.win_start: win_end]}")
-        for i in range(self.win_start, self.get_win_end()):
-            # only send packets that did not receive an ack
-            if not self.packets[i].received:
-                # check the time on sent packets
-                # if they have went over time, set up packet to resend
-                if self.packets[i].sent and self.rtt < self.packets[i].get_time_since_sent():
-                    print(f"Packet {i} timed out, setting up to resend")
-                    # change to unsent to pass sending check
-                    self.packets[i].sent = False
-                    self.loss_occured_flag = True
-                    self.AIMD_FLAG = True
-                    self.packets_dropped_counter += 1
-                    # Graph purposes
-                    if i % 1000 == 0:
-                        self.packets_dropped_dict[i] = self.packets_dropped_counter
-
-                # only send packets queued to send
-                if not self.packets[i].sent:
-                    print(f"Sending packet {self.packets[i].sequence_num}")
-                    self.packets[i].start_timer()
-                    self.send_message(self.packets[i])
-                    self.packets[i].sent = True
-
-    def mark_ack_received(self, index):
-        """
-        Marks an ACK as received
+        if not self.flush_messages():
+            # backpressure: wait until the socket drains the last round
+            return
+        streams = self.active_streams()
+        now = self.clock()
+
+        # timers of packets sent before the RTO backed off run to the new RTO
+        rto = self.rtt_estimator.rto
+        expired = [(stream, stream.timer.expired(now, rto))
+                   for stream in streams]
+        if any(timed_out for _, timed_out in expired):
+            # back off once per round, not once per packet
+            self.rtt_estimator.on_timeout()
+            self.cc.on_timeout(now)
+            for stream in self.streams.values():
+                stream.recovery_point = None
+                stream.go_back = None
+            self.win_size = self.cc.window()
+            self.update_pacing_rate(now)
+            if self.trace:
+                self.trace(WINDOW, 0, self.win_size,
+                           int(self.rtt_estimator.rto * 1e6))
+        for stream, timed_out in expired:
+            for i in timed_out:
+                if self.trace:
+                    self.trace(TIMEOUT, stream.stream_id, i)
+                self.mark_lost(stream, i)
+
+        # the pacer decides how much of the window may go out now
+        budget = self.pacer.available(now)
+        sent = 0
+        held = 0
+
+        win_ends = []
+        for stream in streams:
+            win_end = stream.win_end(self.win_size)
+            win_ends.append(win_end)
+            stream.packets.reserve(win_end)
+
+            # resend timed out packets that are still in the window
+            packets = stream.packets
+            waiting = []
+            for i in stream.retransmit_queue:
+                if packets.is_acked(i):
+                    continue
+                if i < win_end and sent < budget:
+                    self.send_packet(stream, i, now)
+                    sent += 1
+                else:
+                    if i < win_end:
+                        held += 1
+                    waiting.append(i)
+            stream.retransmit_queue = waiting
+
+        # new packets fill the room left in the congestion window
+        room = self.win_size - sum(stream.outstanding() for stream in streams)
+        demands = [max(0, win_end - max(stream.next_seq, stream.win_start))
+                   for stream, win_end in zip(streams, win_ends)]
+        if len(streams) == 1:
+            # one stream may use its whole window, as before streams
+            room = demands[0]
+        wanted = min(room, sum(demands))
+        room = min(wanted, max(0, budget - sent))
+        if streams:
+            self.first_share = (self.first_share + 1) % len(streams)
+        shares = fair_shares(room, demands, self.first_share)
+        for stream, share in zip(streams, shares):
+            # send packets that have never been sent
+            first = max(stream.next_seq, stream.win_start)
+            last = first + share
+            for i in range(first, last):
+                self.send_packet(stream, i, now)
+            stream.next_seq = max(stream.next_seq, last)
+        sent += room
+        held += max(0, wanted - room)
+        self.pacer.consume(sent, sent + held)
+        self.pacing_held = held > 0
+        for stream in streams:
+            self.check_zero_window(stream, now)
+        self.flush_messages()
+        if self.metrics is not None and self.metrics.due(now):
+            # rows go on while no ACK comes back
+            self.sample_metrics(now)
+
+    def check_zero_window(self, stream, now):
+        """
+        Runs the persist timer of a stream. While its window is closed a
+        probe is sent every RTO, backing off exponentially up to the
+        maximum RTO, in case the ACK that opens the window was lost.
         Args:
-            index (int): Index of ACK to mark received
-        """
-        packet = self.packets[index]
-        if packet.sequence_num == index:
-            # update the Client's expected rtt
-            self.rtt = self.packets[index].get_time_since_sent() + 0.02
-            if not self.packets[index].received:
-                print(f"Marking {index} as received")
-                self.packets[index].received = True
-                self.acks_received += 1
-        else:
-            print("ERROR: index and seq num do not match")
-        print(f"----- TOTAL ACKS RECEIVED: {self.acks_received}")
+            stream (SendStream): Stream to check
+            now (float): Current time
+        """
+        if not stream.window_closed():
+            stream.probe_deadline = None
+            stream.probe_backoff = 0
+            return
+        if stream.probe_deadline is None:
+            stream.probe_deadline = now + self.rtt_estimator.rto
+        elif now >= stream.probe_deadline:
+            self.send_probe(stream)
+            stream.probe_backoff += 1
+            stream.probe_deadline = now + min(
+                self.rtt_estimator.rto * 2**stream.probe_backoff,
+                self.rtt_estimator.max_rto)
+
+    def send_probe(self, stream):
+        """
+        Sends a zero-window probe: the last packet ACKed in order sent
+        again. The server drops it as a duplicate and ACKs right away
+        with its current window.
+        Args: stream (SendStream): Stream whose window is closed
+        """
+        seq_num = stream.win_start - 1
+        if self.trace:
+            self.trace(PROBE, stream.stream_id, seq_num)
+        self.send_message(stream, seq_num)
+        self.zero_window_probes += 1
+        self.probes_unanswered += 1
+
+    def time_until_probe(self):
+        """
+        Returns: Seconds until the next zero-window probe, or None if no
+        persist timer is running
+        """
+        deadlines = [stream.probe_deadline for stream in self.streams.values()
+                     if stream.probe_deadline is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - self.clock())
+
+    def update_pacing_rate(self, now):
+        """
+        Sets the pacing rate from the congestion control algorithm, or
+        from the window and SRTT if it has no rate of its own
+        Args: now (float): Current time
+        """
+        if self.pacing != "cwnd":
+            return
+        rate = self.cc.pacing_rate
+        if not rate:
+            rate = cwnd_rate(self.win_size, self.rtt_estimator.srtt,
+                             self.cc.cwnd < self.cc.ssthresh)
+        self.pacer.set_rate(rate, now)
+
+    def mark_lost(self, stream, seq_num):
+        """
+        Queues a lost packet to be resent on the next round, along with
+        the packets the ARQ strategy sends again with it (Go-Back-N: every
+        packet sent after it)
+        Args:
+            stream (SendStream): Stream of the packet
+            seq_num (int): Index of the packet
+        """
+        packets = stream.packets
+        for i in self.arq.lost(stream, seq_num):
+            if not packets.is_sent(i) or packets.is_acked(i):
+                # ACKed, or already waiting to be resent
+                continue
+            stream.timer.cancel(i)
+            # change to unsent to pass sending check
+            packets.mark_timed_out(i)
+            stream.retransmit_queue.append(i)
+            self.packets_dropped_counter += 1
+
+    def detect_losses(self, stream, cumulative, now):
+        """
+        Fast retransmit: every packet the server has past the start of
+        the window stands for a duplicate ACK of it. Once DUP_ACK_THRESHOLD of them
+        arrive the first packet is taken as lost and resent without
+        waiting for its timer. Until every packet sent before the loss is
+        ACKed (NewReno recovery), each ACK that moves the window start to
+        another hole resends that one too. Losses on several streams at
+        once cut the shared window only once.
+        Args:
+            stream (SendStream): Stream the ACKs were for
+            cumulative (int): How far the start of the window moved
+            now (float): Current time
+        """
+        hole = stream.win_start
+        if stream.recovery_point is not None:
+            if hole >= stream.recovery_point:
+                stream.recovery_point = None
+                if not any(other.recovery_point is not None
+                           for other in self.streams.values()):
+                    self.cc.on_recovery_end(now)
+            elif cumulative:
+                # partial ACK, the next hole was lost too
+                self.fast_retransmit(stream, hole)
+            return
+        if hole < len(stream.packets) and \
+                self.arq.packets_past_hole(stream) >= DUP_ACK_THRESHOLD:
+            stream.recovery_point = stream.next_seq
+            if not self.cc.in_recovery:
+                self.cc.on_loss(now)
+            self.fast_retransmit(stream, hole)
+
+    def fast_retransmit(self, stream, seq_num):
+        """
+        Resends a packet found lost by duplicate ACKs
+        Args:
+            stream (SendStream): Stream of the packet
+            seq_num (int): Index of the packet
+        """
+        packets = stream.packets
+        if not packets.is_sent(seq_num) or packets.is_acked(seq_num):
+            # not sent yet, or already waiting to be resent
+            return
+        if self.trace:
+            self.trace(FAST_RETRANSMIT, stream.stream_id, seq_num)
+        stream.timer.cancel(seq_num)
+        stream.go_back = None
+        self.mark_lost(stream, seq_num)
+        self.fast_retransmits += 1
+
+    def mark_ack_received(self, stream, start, end=None):
+        """
+        Marks a range of ACKs as received in one pass. The RTT is sampled
+        once per range from the most recently sent packet in it.
+        Args:
+            stream (SendStream): Stream the ACKs are for
+            start (int): Index of the first ACK to mark received
+            end (int): One past the last index, defaults to start + 1
+        """
+        if end is None:
+            end = start + 1
+        packets = stream.packets
+        if not 0 <= start < end <= packets.fin_index:
+            print(f"ERROR: ACK {start} - {end} is not a packet sequence number")
+            return
+        now = self.clock()
+        rtt_sample = None
+        karn = False
+        newly_acked = packets.mark_acked_range(start, end)
+        for i in newly_acked:
+            stream.timer.cancel(i)
+            if packets.retransmit_count(i):
+                karn = True
+                continue
+            time_since_sent = packets.time_since_sent(i, now)
+            if rtt_sample is None or time_since_sent < rtt_sample:
+                rtt_sample = time_since_sent
+        # update the Client's expected rtt
+        if rtt_sample is not None:
+            self.rtt_estimator.on_ack(rtt_sample, False)
+            self.cc.on_rtt_sample(rtt_sample, now)
+            if self.metrics is not None:
+                self.metrics.record_rtt(rtt_sample)
+        elif karn:
+            self.rtt_estimator.on_ack(0, True)
+        if newly_acked and self.trace_packets:
+            self.trace_packets(ACK, stream.stream_id, start, end)
+        self.acks_received += len(newly_acked)
 
     def receive_acks(self):
         """
-        Handles receiving ACKs from server
+        Handles receiving ACKs from server. SACK frames give a cumulative
+        ACK and blocks of packets received past it. Single ACKs (ASCII)
+        are merged into ranges of consecutive packets.
         Arguments: None
-        Return: List of acknowledged messages
-        """
-        data = self.client_socket.recv(1024).decode()
-        print(f"-------------- WIN START: {self.win_start} --------------")
-        print(
-            f"-------------- WIN END: {self.get_win_end()} --------------")
-        if data:
-            ack_received = data.split(",")
-            ack_received = [x for x in ack_received if len(
-                x) != 0]     # remove empty list items
-            # find "FIN" ack
-            try:
-                # remove fin to avoid affecting processing remaining packets
-                ack_received.remove("FIN")
-            except ValueError:
-                print("Not at end of total packets (no FIN)")
-            else:
-                self.fin = True
-            print(
-                f"-------------- RECEIVED ACK {ack_received} --------------\n\n")
-            return [int(i) for i in ack_received]
-
-    def update_win_size(self):
-        """
-        Increases or decreases self.win_size whether or not loss occurs
-        """
-        # update win_start
-        while self.packets[self.win_start].received:
-            print("---- MOVING WIN_START ----")
-            self.win_start += 1
-            self.loss_occured_flag = False
-            print(f"Win start is {self.win_start}")
-
-        if self.win_size <= self.MAX_WIN_SIZE:
-            # Win size is at most max win size of 2^16
-            if not self.AIMD_FLAG:
-                # No packet drop has occured. Slow start is implemented
-                self.win_size *= 2
-                print(f"Window size doubled to {self.win_size}")
-            elif self.AIMD_FLAG and not self.loss_occured_flag:
-                # AIMD Implemented but no packet drop during the window
-                # Additive Increase
-                self.win_size += 1
-                print(f"Window size increased by 1 to {self.win_size}")
-            elif self.AIMD_FLAG or self.loss_occured_flag:
-                # AIMD Implemented and packet drop occured during window
-                # Multiplicative Decrease
-                old_win_size = self.win_size
-                self.win_size = math.ceil(old_win_size / 2)
-                print(f"Window size halved by 2 to {self.win_size}")
+        Return: Dict of stream to the list of (start, end) ranges of
+        acknowledged messages
+        """
+        try:
+            num_bytes = self.parser.read(self.client_socket)
+        except BlockingIOError:
+            # woken up without data on a non-blocking socket
+            return {}
+        ack_ranges = {}
+        single_acks = set()
+        if num_bytes:
+            for kind, stream_id, seq, payload in self.parser.frames():
+                stream = self.streams.get(stream_id)
+                if stream is None:
+                    print(f"ERROR: frame for unknown stream {stream_id}")
+                    continue
+                if kind == wire_format.KIND_FIN:
+                    # keep fin out of the list to avoid affecting remaining packets
+                    stream.fin = True
+                    stream.timer.cancel(stream.packets.fin_index)
+                    stream.packets.mark_acked(stream.packets.fin_index)
+                elif kind == wire_format.KIND_SACK:
+                    duplicates, window, blocks = self.codec.decode_sack(payload)
+                    stream.update_receive_window(seq, window)
+                    ranges = ack_ranges.setdefault(stream, [])
+                    if seq > stream.win_start:
+                        ranges.append((stream.win_start, seq))
+                    ranges.extend(blocks)
+                    # a probe is a duplicate on purpose, not a spurious resend
+                    probes = min(duplicates, self.probes_unanswered)
+                    self.probes_unanswered -= probes
+                    duplicates -= probes
+                    if duplicates:
+                        self.rtt_estimator.on_duplicate_ack(duplicates)
+                elif kind == wire_format.KIND_ACK:
+                    # the server ACKs every copy it gets of a packet
+                    if seq in single_acks or stream.packets.is_acked(seq):
+                        self.rtt_estimator.on_duplicate_ack()
+                    single_acks.add(seq)
+            if single_acks:
+                # ASCII has no stream ids, every ACK is for stream 0
+                ack_ranges.setdefault(self.streams[0], []).extend(
+                    merge_acks(single_acks))
         else:
-            self.win_size = self.MAX_WIN_SIZE
-            print(f"Window size is at it's max of {self.MAX_WIN_SIZE}")
+            print("Server closed the connection")
+            self.closed = True
+        return ack_ranges
 
-        # update the window size if we are reaching the end of the packet list
-        if self.get_win_end() > len(self.packets) - 1:
-            print("Readjusting Window Size")
-            self.win_size = len(self.packets) - self.win_start
-            print(f"Window size is now {self.win_size}")
+    def done(self):
+        """
+        Returns: True when every stream is over or the server hung up
+        """
+        return self.closed or not self.active_streams()
+
+    def handle_acks(self):
+        """
+        Reads the ACKs that arrived, marks them received and slides the
+        window of every stream they were for
+        """
+        ack_ranges = self.receive_acks()
+        acks_received = self.acks_received
+        for stream, ranges in ack_ranges.items():
+            for start, end in self.arq.acked_ranges(stream, ranges):
+                self.mark_ack_received(stream, start, end)
+        # a FIN on its own can finish a stream too
+        updated = dict.fromkeys(ack_ranges)
+        updated.update(dict.fromkeys(
+            stream for stream in self.streams.values()
+            if stream.fin and stream.finished is None))
+        self.update_win_size(self.acks_received - acks_received, list(updated))
 
+    def time_until_timeout(self):
+        """
+        Returns: Seconds until the next retransmission timer fires, or
+        None if no packet is in flight
+        """
+        deadlines = [deadline for deadline in
+                     (stream.timer.next_deadline()
+                      for stream in self.active_streams())
+                     if deadline is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - self.clock())
 
-def runner():
-    # SET WINDOW
-    total_packets = int(input(
-        "Enter the number of packets you want to send: "))  # take int input
-    client = Client(total_packets)
+    def run(self):
+        """
+        Runs the transfer until every packet and the FIN of every stream
+        are ACKed. The socket is
+        non-blocking and a selector wakes the loop when ACKs arrive, when
+        the socket can take more bytes, or when the next retransmission
+        timer is due, whichever comes first. After every wakeup the
+        window is topped up, so the pipe stays full and a lost packet is
+        resent one RTO after it was sent. When the pacer held packets
+        back, the loop also wakes up when the next quantum may go out,
+        and while the server's window is closed it wakes up to probe it.
+        With metrics it also wakes up for every row.
+        run can be called again after opening more streams; they reuse
+        the congestion window the connection has built up.
+        Arguments: None
+        Return: None
+        """
+        sock = self.client_socket
+        sock.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+        try:
+            self.send_window()
+            while not self.done():
+                events = selectors.EVENT_READ
+                if self.send_buffer.pending():
+                    events |= selectors.EVENT_WRITE
+                selector.modify(sock, events)
+                timeout = self.time_until_timeout()
+                if self.pacing_held:
+                    pace = self.pacer.time_until_ready(self.clock())
+                    timeout = pace if timeout is None else min(timeout, pace)
+                probe = self.time_until_probe()
+                if probe is not None:
+                    timeout = probe if timeout is None else min(timeout, probe)
+                if self.metrics is not None and \
+                        self.metrics.next_sample is not None:
+                    row = max(0.0, self.metrics.next_sample - self.clock())
+                    timeout = row if timeout is None else min(timeout, row)
+                for _, mask in selector.select(timeout):
+                    if mask & selectors.EVENT_WRITE:
+                        self.flush_messages()
+                    if mask & selectors.EVENT_READ:
+                        self.handle_acks()
+                if not self.done():
+                    self.send_window()
+        finally:
+            selector.close()
+            sock.setblocking(True)
+
+    def update_win_size(self, acked=0, streams=None):
+        """
+        Slides the window of each stream past the packets ACKed in order
+        and asks the congestion control algorithm for the new window size
+        Args:
+            acked (int): Packets ACKed for the first time in this batch
+            streams (list): Streams that got ACKs, defaults to all of them
+        """
+        now = self.clock()
+        if streams is None:
+            streams = list(self.streams.values())
+        cumulative = 0
+        for stream in streams:
+            old_win_start = stream.win_start
+            stream.win_start = stream.packets.advance()
+            if stream.win_start != old_win_start and self.trace_packets:
+                self.trace_packets(ADVANCE, stream.stream_id, stream.win_start)
+            moved = stream.win_start - old_win_start
+            cumulative += moved
+            if self.cc.fast_retransmit:
+                self.detect_losses(stream, moved, now)
+            if stream.finished is None and stream.done():
+                stream.finished = now
+                print(f"Stream {stream.stream_id} done")
+        self.cc.on_ack(acked, cumulative, now)
+        win_size = self.win_size
+        self.win_size = self.cc.window()
+        self.update_pacing_rate(now)
+        if self.win_size != win_size and self.trace:
+            self.trace(WINDOW, 0, self.win_size,
+                       int(self.rtt_estimator.rto * 1e6))
+        if self.metrics is not None and self.metrics.due(now):
+            self.sample_metrics(now)
+
+    def sample_metrics(self, now):
+        """
+        Writes a row of metrics, see metrics.SENDER_COLUMNS
+        Args: now (float): Current time
+        """
+        metrics = self.metrics
+        elapsed = metrics.elapsed(now)
+        per_sec = 1 / elapsed if elapsed > 0 else 0.0
+        # NaN where the interval had no RTT sample
+        p50, p99, p999 = (float("nan") if value is None else value
+                          for value in metrics.interval_rtt.percentiles(
+                              50, 99, 99.9))
+        srtt = self.rtt_estimator.srtt
+        metrics.write(now, (
+            self.win_size,
+            sum(stream.outstanding() for stream in self.streams.values()),
+            float("nan") if srtt is None else srtt, self.rtt_estimator.rto,
+            p50, p99, p999, metrics.interval_rtt.count,
+            metrics.delta("acks", self.acks_received) * per_sec,
+            metrics.delta("bytes", self.send_buffer.bytes_sent) * per_sec,
+            metrics.delta("retransmits", self.packets_dropped_counter)))
+
+
+def merge_acks(seq_nums):
+    """
+    Merges single ACKs into ranges of consecutive packets
+    Args: seq_nums (iterable): Sequence numbers that were ACKed
+    Returns: List of (start, end) ranges, end exclusive
+    """
+    ranges = []
+    for seq_num in sorted(seq_nums):
+        if ranges and ranges[-1][1] == seq_num:
+            ranges[-1][1] = seq_num + 1
+        else:
+            ranges.append([seq_num, seq_num + 1])
+    return [(start, end) for start, end in ranges]
+
+
+def send_stripe(job):
+    """
+    Sends one stripe of a striped transfer over its own connection. Runs
+    in a worker process, so the client's output goes to os.devnull.
+    Args: job (dict): Client options and the stripe's place in the
+    transfer, see run_stripes
+    Returns: dict of the stripe's stats
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        source = None
+        if job["file_path"]:
+            source = FileSource(job["file_path"], job["segment_size"],
+                                job["first"], job["count"])
+            source.digest = job["checksum"]  # hashed once by the parent
+        tracer = None
+        if job["trace"] != "off":
+            tracer = Tracer(job["trace"], job["trace_capacity"])
+        metrics = None
+        if job["metrics"]:
+            # one metrics file per stripe
+            metrics = MetricsRecorder(
+                numbered_path(job["metrics"], job["stripe"]), SENDER_COLUMNS,
+                job["metrics_interval"])
+        capture = None
+        if job["capture"]:
+            # one capture file per stripe
+            capture = WireCapture(f"{job['capture']}.{job['stripe']}",
+                                  job["transport"])
+        client = Client(job["count"], transport=job["transport"],
+                        mtu=job["mtu"],
+                        congestion_control=job["congestion_control"],
+                        pacing=job["pacing"], pacing_rate=job["pacing_rate"],
+                        source=source, arq=job["arq"], tracer=tracer,
+                        metrics=metrics, max_window=job["max_window"],
+                        capture=capture)
+        if job["host"]:
+            client.ip = job["host"]
+        if job["port"]:
+            client.port = job["port"]
+        client.handshake_options.update(
+            transfer=job["transfer"], stripe=job["stripe"],
+            stripes=job["stripes"], first=job["first"],
+            packets=job["count"], total=job["total"])
+        client.handshake()
+        if client.server_options.get("stripe") != str(job["stripe"]):
+            client.client_socket.close()
+            raise ValueError(f"The server did not take stripe {job['stripe']}"
+                             f", striped transfers need async_server.py")
+        start = time.time()
+        client.run()
+        elapsed = time.time() - start
+        client.client_socket.close()
+        if source is not None:
+            source.close()
+        if tracer is not None:
+            # one trace file per stripe
+            tracer.dump(f"{job['trace_file']}.{job['stripe']}")
+        if metrics is not None:
+            client.sample_metrics(client.clock())
+            metrics.close()
+        if capture is not None:
+            capture.close()
+    return {"stripe": job["stripe"], "first": job["first"],
+            "count": job["count"], "elapsed": elapsed,
+            "acks_received": client.acks_received,
+            "packets_sent": client.packets_sent - 1,  # minus the FIN
+            "bytes_sent": client.send_buffer.bytes_sent,
+            "retransmits": client.packets_dropped_counter,
+            "fast_retransmits": client.fast_retransmits,
+            "timeouts": client.rtt_estimator.timeouts,
+            "win_size": client.win_size, "rtt": str(client.rtt_estimator),
+            "rtt_histogram": str(metrics.rtt) if metrics else None}
+
+
+def run_stripes(total_packets, stripes, source=None, **options):
+    """
+    Sends a striped transfer: one worker process and one connection per
+    stripe, all running at once
+    Args:
+        total_packets (int): Packets of the whole transfer
+        stripes (int): Number of stripes
+        source (FileSource): File to send, None for empty packets
+        options: Client options of every stripe (transport, mtu,
+        congestion_control, pacing, pacing_rate, arq, host, port, trace,
+        trace_file, trace_capacity, metrics, metrics_interval, max_window,
+        capture)
+    Returns: dict of the stats of the whole transfer, see transfer_stats,
+    with the stats of each stripe under "stripes" (see send_stripe)
+    """
+    ranges = stripe_ranges(total_packets, stripes)
+    transfer_id = os.urandom(4).hex()
+    jobs = [dict(options, transfer=transfer_id, stripe=i,
+                 stripes=len(ranges), first=first, count=count,
+                 total=total_packets,
+                 file_path=source.path if source else None,
+                 segment_size=source.segment_size if source else None,
+                 checksum=source.checksum() if source else None)
+            for i, (first, count) in enumerate(ranges)]
+    print(f"Transfer {transfer_id}: {total_packets} packets in "
+          f"{len(jobs)} stripes")
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(send_stripe, jobs))
+    elapsed = time.time() - start
+
+    stats = transfer_stats(
+        total_packets, elapsed,
+        *(sum(result[key] for result in results)
+          for key in ("acks_received", "packets_sent", "bytes_sent",
+                      "retransmits", "fast_retransmits", "timeouts")))
+    stats["stripes"] = results
+    acks_received = stats["acks_received"]
+    packets_sent = stats["packets_sent"]
+    bytes_sent = stats["bytes_sent"]
+    print(" ---- ACKS RECEIVED, PACKETS SENT, GOOD-PUT ----")
+    print(f"Number of ACKS received: {acks_received}")
+    print(f"Packets sent: {packets_sent}")
+    print(f"Goodput: {acks_received / packets_sent}")
+    for result in results:
+        print(f"Stripe {result['stripe']}: packets {result['first']} to "
+              f"{result['first'] + result['count'] - 1} in "
+              f"{result['elapsed']:.3f}s, window {result['win_size']}, "
+              f"fast retransmits {result['fast_retransmits']}, "
+              f"RTT {result['rtt']}")
+        if result["rtt_histogram"]:
+            print(f"Stripe {result['stripe']} RTT: {result['rtt_histogram']}")
+    print(f"Throughput: {bytes_sent / elapsed:.0f} bytes/sec on the wire "
+          f"in {elapsed:.3f}s, {total_packets / elapsed:.0f} packets/sec")
+    if source is not None:
+        print(f"File: {source.size / elapsed:.0f} bytes/sec, "
+              f"sha256 {source.checksum()}")
+    return stats
+
+
+def transfer_stats(total_packets, elapsed, acks_received, packets_sent,
+                   bytes_sent, retransmits, fast_retransmits, timeouts):
+    """
+    Args:
+        total_packets (int): Packets of the transfer
+        elapsed (float): Seconds from the end of the handshake to the end
+        acks_received (int): Packets ACKed
+        packets_sent (int): Packets sent, resends included, FINs not
+        bytes_sent (int): Bytes the client put on the wire
+        retransmits (int): Packets queued to be sent again
+        fast_retransmits (int): Losses found by duplicate ACKs
+        timeouts (int): Retransmission timeouts
+    Returns: dict of the stats of a transfer, with the rates worked out
+    """
+    return {"packets": total_packets, "elapsed": elapsed,
+            "acks_received": acks_received, "packets_sent": packets_sent,
+            "goodput": acks_received / packets_sent if packets_sent else 0.0,
+            "bytes_sent": bytes_sent,
+            "bytes_per_sec": bytes_sent / elapsed if elapsed else 0.0,
+            "packets_per_sec": total_packets / elapsed if elapsed else 0.0,
+            "retransmits": retransmits, "fast_retransmits": fast_retransmits,
+            "timeouts": timeouts}
+
+
+def runner(transport="tcp", mtu=DEFAULT_MTU,
+           congestion_control=DEFAULT_ALGORITHM, pacing=None,
+           pacing_rate=None, file_path=None,
+           segment_size=DEFAULT_SEGMENT_SIZE, streams=1, repeat=1,
+           stripes=1, host=None, port=None, arq=DEFAULT_STRATEGY,
+           trace="off", trace_file="client.trace",
+           trace_capacity=DEFAULT_CAPACITY, metrics=None,
+           metrics_interval=DEFAULT_INTERVAL, total_packets=None,
+           max_window=DEFAULT_MAX_WINDOW, capture=None):
+    """
+    Sends a transfer and prints its stats
+    Args: see main, total_packets is asked for when it is None and no
+    file is sent
+    Returns: dict of the stats of the transfer, see transfer_stats
+    """
+    if streams * repeat > MAX_STREAMS:
+        raise ValueError(f"A connection has at most {MAX_STREAMS} streams")
+    if file_path and streams * repeat > 1:
+        raise ValueError("A file is sent on a single stream")
+    if stripes > 1 and streams * repeat > 1:
+        raise ValueError("Each stripe is sent on a single stream")
+    if stripes > 1 and transport != "tcp":
+        raise ValueError("Stripes are put back together by the asyncio "
+                         "server, which runs over TCP")
+    source = None
+    if file_path:
+        source = FileSource(file_path, segment_size)
+        total_packets = source.total_segments
+        print(f"Sending {file_path}: {source.size} bytes in "
+              f"{total_packets} segments")
+    elif total_packets is None:
+        # SET WINDOW
+        total_packets = int(input(
+            "Enter the number of packets you want to send: "))  # take int input
+    if stripes > 1:
+        stats = run_stripes(
+            total_packets, stripes, source, transport=transport, mtu=mtu,
+            congestion_control=congestion_control, pacing=pacing,
+            pacing_rate=pacing_rate, arq=arq, host=host, port=port,
+            trace=trace, trace_file=trace_file, trace_capacity=trace_capacity,
+            metrics=metrics, metrics_interval=metrics_interval,
+            max_window=max_window, capture=capture)
+        if source is not None:
+            source.close()
+        return stats
+    # the packets are split evenly between the streams
+    split = [total_packets // streams + (i < total_packets % streams)
+             for i in range(streams)]
+    tracer = None
+    if trace != "off":
+        tracer = Tracer(trace, trace_capacity)
+        dump_on_signal(tracer, trace_file)
+    recorder = None
+    if metrics:
+        recorder = MetricsRecorder(metrics, SENDER_COLUMNS, metrics_interval)
+    wire = None
+    if capture:
+        wire = WireCapture(capture, transport)
+    client = Client(split[0], transport=transport, mtu=mtu,
+                    congestion_control=congestion_control, pacing=pacing,
+                    pacing_rate=pacing_rate, source=source,
+                    max_streams=streams, arq=arq, tracer=tracer,
+                    metrics=recorder, max_window=max_window, capture=wire)
+    if host:
+        client.ip = host
+    if port:
+        client.port = port
     print(f"Window Size is {client.win_size}")
 
     client.handshake()      # perform handshake and set RTT
-    window_size_graph = {}
-
-    while not client.fin:
-        # print(f"{client.packets}")
-        client.send_window()
-        # allow time for packets to be sent
-        # time.sleep(client.rtt)
-
-        # handle acks
-        acks = client.receive_acks()
-        print("OUT OF RECEIVE_ACKS()")
-        acks.sort()
-        print(f"Length of ACK list: {len(acks)}")
-        print(f"Acks to mark received: {acks}")
-        for i in range(len(acks)):
-            client.mark_ack_received(acks[i])
-            if acks[i] % 1000 == 0:
-                window_size_graph[acks[i]] = client.win_size
-        client.update_win_size()
-        print(f"Number of ACKS received: {client.acks_received}")
-    # subtracting 1 bc of FIN ack
+    start = time.time()
+    for round_num in range(repeat):
+        # later rounds run on the window the earlier ones built up
+        round_start = time.time()
+        for i, count in enumerate(split):
+            if round_num or i:
+                client.open_stream(count)
+        client.run()
+        if repeat > 1:
+            print(f"Round {round_num + 1}: {time.time() - round_start:.3f}s, "
+                  f"window {client.win_size}")
+    elapsed = time.time() - start
+    # subtracting one FIN ack per stream
+    fins = len(client.streams)
     print(" ---- ACKS RECEIVED, PACKETS SENT, GOOD-PUT ----")
     print(f"Number of ACKS received: {client.acks_received}")
-    print(f"Packets sent: {client.packets_sent - 1}")
-    print(f"Goodput: {client.acks_received/(client.packets_sent - 1)}")
+    print(f"Packets sent: {client.packets_sent - fins}")
+    print(f"Goodput: {client.acks_received/(client.packets_sent - fins)}")
+    if len(client.streams) > 1:
+        for stream in client.streams.values():
+            print(f"Stream: {stream}")
+    print(f"RTT: {client.rtt_estimator}")
+    print(f"Congestion control: {client.cc}, "
+          f"fast retransmits {client.fast_retransmits}, "
+          f"ARQ {client.arq.name}")
+    print(f"Pacing: {client.pacer}")
+    windows = [stream for stream in client.streams.values()
+               if stream.rwnd is not None]
+    if windows:
+        print(f"Flow control: rwnd {windows[-1].rwnd} "
+              f"(min {min(stream.min_rwnd for stream in windows)}), "
+              f"{client.zero_window_probes} zero-window probes")
+    print(f"send() calls: {client.send_buffer.send_calls} "
+          f"for {client.send_buffer.bytes_sent} bytes")
+    print(f"Throughput: {client.send_buffer.bytes_sent / elapsed:.0f} "
+          f"bytes/sec on the wire in {elapsed:.3f}s")
+    if source is not None:
+        print(f"File: {source.size / elapsed:.0f} bytes/sec, "
+              f"sha256 {source.checksum()}")
+        source.close()
+    if transport == "udp":
+        print(f"UDP: {client.client_socket}")
+    if tracer is not None:
+        tracer.dump(trace_file)
+        print(f"Trace: {tracer}, written to {trace_file}")
+    if recorder is not None:
+        # the last, partial interval
+        client.sample_metrics(client.clock())
+        recorder.close()
+        print(f"Metrics: {recorder}")
+    if wire is not None:
+        wire.close()
+        print(f"Capture: {wire}")
 
     client.client_socket.close()  # close the connection
+    return transfer_stats(
+        total_packets * repeat, elapsed, client.acks_received,
+        client.packets_sent - fins, client.send_buffer.bytes_sent,
+        client.packets_dropped_counter, client.fast_retransmits,
+        client.rtt_estimator.timeouts)
 
-    # TODO: Move to another function
-    win_size_x = window_size_graph.keys()
-    win_size_y = window_size_graph.values()
-    plt.plot(win_size_x, win_size_y)
 
-    plt.xlabel('Segments Sent')
-    plt.ylabel('Window Size')
-    plt.title('Client Window Size Over Time')
-    plt.savefig("Sophia-Sorensen-Channon-Zuo-Client-Window-Size.jpg")
-
-    seg_dropped_x = client.packets_dropped_dict.keys()
-    seg_dropped_y = client.packets_dropped_dict.values()
-    plt.xlabel('Segments Sent')
-    plt.ylabel('Segements Dropped')
-    plt.plot(seg_dropped_x, seg_dropped_y)
-    plt.title('Segments Dropped Over Time')
-    plt.savefig("Sophia-Sorensen-Channon-Zuo-SEGMENTS-Dropped.jpg")
+def main(arq=DEFAULT_STRATEGY):
+    """
+    Runs the client from the command line
+    Args: arq (str): ARQ strategy used when --arq is not given
+    """
+    parser = argparse.ArgumentParser(description="Sliding window client")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="tcp")
+    parser.add_argument("--mtu", type=int, default=DEFAULT_MTU,
+                        help="largest UDP packet, frames are packed up to it")
+    parser.add_argument("--cc", choices=sorted(ALGORITHMS),
+                        default=DEFAULT_ALGORITHM,
+                        help="congestion control algorithm")
+    parser.add_argument("--arq", choices=sorted(STRATEGIES), default=arq,
+                        help="Selective Repeat (sr) or Go-Back-N (gbn)")
+    parser.add_argument("--pacing", choices=PACING_MODES, default=None,
+                        help="spread each window over the RTT (cwnd) or "
+                             "send at a fixed --pace-rate (rate) "
+                             "(default: cwnd for bbr, off otherwise)")
+    parser.add_argument("--pace-rate", type=float, default=None,
+                        help="packets per second for --pacing rate")
+    parser.add_argument("--file", default=None,
+                        help="file to send instead of empty packets")
+    parser.add_argument("--segment-size", type=int,
+                        default=DEFAULT_SEGMENT_SIZE,
+                        help="bytes of the file carried by each packet")
+    parser.add_argument("--streams", type=int, default=1,
+                        help="streams the packets are split between, "
+                             "multiplexed on one connection")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="send the packets this many times over the "
+                             "same connection, in new streams each time")
+    parser.add_argument("--stripes", type=int, default=1,
+                        help="cut the packets into stripes sent by this many "
+                             "processes over their own connections "
+                             "(needs async_server.py)")
+    parser.add_argument("--host", default=None,
+                        help="server address (default: the IP set in Client)")
+    parser.add_argument("--port", type=int, default=None,
+                        help="server port (default: 12344)")
+    parser.add_argument("--trace", choices=LEVELS, default="off",
+                        help="record events (losses and window changes) or "
+                             "packets (every packet too) in a ring buffer")
+    parser.add_argument("--trace-file", default="client.trace",
+                        help="where the trace is written at the end, or on "
+                             "SIGUSR1 (stripes add .<stripe>)")
+    parser.add_argument("--trace-capacity", type=int,
+                        default=DEFAULT_CAPACITY,
+                        help="events kept, older ones are overwritten")
+    parser.add_argument("--metrics", default=None,
+                        help="file to write the window, RTT and throughput "
+                             "to every interval, CSV if it ends in .csv "
+                             "(stripes add .<stripe> before the extension)")
+    parser.add_argument("--metrics-interval", type=float,
+                        default=DEFAULT_INTERVAL,
+                        help="seconds between rows of --metrics")
+    parser.add_argument("--packets", type=int, default=None,
+                        help="packets to send (default: ask, unless --file)")
+    parser.add_argument("--max-window", type=int, default=DEFAULT_MAX_WINDOW,
+                        help="largest congestion window in packets")
+    parser.add_argument("--stats", default=None,
+                        help="file to write the stats of the transfer to, "
+                             "as JSON")
+    parser.add_argument("--capture", default=None,
+                        help="file to record the bytes sent and their "
+                             "timing to, for replay_capture.py (stripes "
+                             "add .<stripe>)")
+    args = parser.parse_args()
+    stats = runner(transport=args.transport, mtu=args.mtu,
+                   congestion_control=args.cc, pacing=args.pacing,
+                   pacing_rate=args.pace_rate, file_path=args.file,
+                   segment_size=args.segment_size, streams=args.streams,
+                   repeat=args.repeat, stripes=args.stripes, host=args.host,
+                   port=args.port, arq=args.arq, trace=args.trace,
+                   trace_file=args.trace_file,
+                   trace_capacity=args.trace_capacity, metrics=args.metrics,
+                   metrics_interval=args.metrics_interval,
+                   total_packets=args.packets, max_window=args.max_window,
+                   capture=args.capture)
+    if args.stats:
+        with open(args.stats, "w") as f:
+            json.dump(dict(stats, arq=args.arq, cc=args.cc), f, indent=1)
 
 
 if __name__ == '__main__':
-    runner()
+    main()
@@ -0,0 +1,441 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Congestion control
+"""
+Congestion control algorithms for the client's sending window.
+Every algorithm keeps a congestion window (cwnd) in packets and reacts
+to four events from the client:
+    on_ack(acked, cumulative, now): a batch of ACKs arrived
+    on_loss(now): a packet was found lost by fast retransmit
+    on_timeout(now): a retransmission timer ran out
+    on_rtt_sample(rtt, now): a valid RTT sample was taken
+and window() gives the number of packets the client may have in its
+window. Loss detection (timers, duplicate ACKs) stays in the client.
+
+The algorithms are picked by name with get_algorithm:
+    aimd     the client's original policy
+    newreno  slow start, congestion avoidance and fast retransmit
+             with NewReno recovery (RFC 6582), the default
+    cubic    CUBIC window growth (RFC 8312)
+    bbr      a simple BBR-style model of bottleneck bandwidth and
+             minimum RTT. It sets the window from its pacing rate, so
+             the client paces it unless told otherwise.
+"""
+
+import math
+from collections import deque
+
+DEFAULT_MAX_CWND = 2**16
+
+
+class CongestionControl:
+    """
+    Base class with the state every algorithm shares. Events it does not
+    care about are ignored.
+    Args:
+        initial_cwnd (int): Window at the start of the transfer in packets
+        max_cwnd (int): Largest window in packets
+    """
+
+    name = None
+    # whether the client retransmits on duplicate ACKs before the timer runs out
+    fast_retransmit = True
+    # whether the client paces by default, for algorithms that need their
+    # pacing_rate followed
+    paced = False
+
+    def __init__(self, initial_cwnd=1, max_cwnd=DEFAULT_MAX_CWND):
+        self.cwnd = float(initial_cwnd)
+        self.ssthresh = float(max_cwnd)
+        self.min_cwnd = 1
+        self.max_cwnd = max_cwnd
+        self.in_recovery = False
+        self.srtt = None
+        self.min_rtt = float("inf")
+        self.pacing_rate = None  # packets per second, None to send at once
+
+        self.losses = 0
+        self.timeouts = 0
+
+    def window(self):
+        """
+        Returns: The window in whole packets, between min_cwnd and max_cwnd
+        """
+        return int(max(self.min_cwnd, min(self.cwnd, self.max_cwnd)))
+
+    def on_ack(self, acked, cumulative, now):
+        """
+        Handles a batch of ACKs
+        Args:
+            acked (int): Packets ACKed for the first time, SACKed included
+            cumulative (int): How far the start of the window moved
+            now (float): Current time
+        """
+
+    def on_loss(self, now):
+        """
+        Handles a loss found by duplicate ACKs. The client is in
+        recovery until on_recovery_end.
+        Args: now (float): Current time
+        """
+        self.losses += 1
+        self.in_recovery = True
+
+    def on_recovery_end(self, now):
+        """
+        Handles the end of recovery, every packet sent before the loss
+        has been ACKed
+        Args: now (float): Current time
+        """
+        self.in_recovery = False
+
+    def on_timeout(self, now):
+        """
+        Handles a retransmission timeout
+        Args: now (float): Current time
+        """
+        self.timeouts += 1
+        self.in_recovery = False
+
+    def on_rtt_sample(self, rtt, now):
+        """
+        Handles a valid RTT sample
+        Args:
+            rtt (float): Seconds between sending a packet and its ACK
+            now (float): Current time
+        """
+        self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+        self.min_rtt = min(self.min_rtt, rtt)
+
+    def __str__(self):
+        return (f"{self.name}: cwnd {self.cwnd:.1f}, "
+                f"ssthresh {self.ssthresh:.1f}, losses {self.losses}, "
+                f"timeouts {self.timeouts}")
+
+
+class Aimd(CongestionControl):
+    """
+    The client's original policy. The window doubles on every batch of
+    ACKs until the first timeout. After that it grows by one per batch,
+    and is halved by a batch that does not move the start of the window
+    since the last timeout. A timeout also halves it at once, so a window
+    that doubled past the link does not stay there until the next ACKs.
+    """
+
+    name = "aimd"
+    fast_retransmit = False
+
+    def __init__(self, initial_cwnd=1, max_cwnd=DEFAULT_MAX_CWND):
+        super().__init__(initial_cwnd, max_cwnd)
+        self.loss_seen = False  # set by the first loss and never cleared
+        self.loss_in_window = False  # cleared when the window start moves
+
+    def on_ack(self, acked, cumulative, now):
+        if cumulative:
+            self.loss_in_window = False
+        if self.cwnd > self.max_cwnd:
+            self.cwnd = self.max_cwnd
+        elif not self.loss_seen:
+            # slow start
+            self.cwnd *= 2
+        elif not self.loss_in_window:
+            # additive increase
+            self.cwnd += 1
+        else:
+            # multiplicative decrease
+            self.cwnd = math.ceil(self.cwnd / 2)
+
+    def on_loss(self, now):
+        super().on_loss(now)
+        self.loss_seen = self.loss_in_window = True
+
+    def on_timeout(self, now):
+        super().on_timeout(now)
+        self.loss_seen = self.loss_in_window = True
+        self.cwnd = max(self.min_cwnd, math.ceil(self.cwnd / 2))
+
+
+class NewReno(CongestionControl):
+    """
+    Slow start up to ssthresh, then one packet more per window of ACKs.
+    A loss found by duplicate ACKs halves the window and holds it until
+    recovery ends. A timeout also drops the window back to one packet.
+    """
+
+    name = "newreno"
+
+    def on_ack(self, acked, cumulative, now):
+        if self.in_recovery or not acked:
+            return
+        if self.cwnd < self.ssthresh:
+            self.cwnd = min(self.cwnd + acked, self.ssthresh + acked / self.cwnd)
+        else:
+            self.cwnd += acked / self.cwnd
+
+    def on_loss(self, now):
+        super().on_loss(now)
+        self.ssthresh = max(self.cwnd / 2, 2.0)
+        self.cwnd = self.ssthresh
+
+    def on_timeout(self, now):
+        super().on_timeout(now)
+        self.ssthresh = max(self.cwnd / 2, 2.0)
+        self.cwnd = 1.0
+
+
+class Cubic(CongestionControl):
+    """
+    CUBIC grows the window as a cubic function of the time since the
+    last loss. It climbs fast back towards the window where the loss
+    happened (w_max), levels off around it, then probes past it. The
+    window never grows slower than Reno would (TCP-friendly region).
+    """
+
+    name = "cubic"
+    C = 0.4
+    BETA = 0.7
+
+    def __init__(self, initial_cwnd=1, max_cwnd=DEFAULT_MAX_CWND):
+        super().__init__(initial_cwnd, max_cwnd)
+        self.w_max = 0.0
+        self.epoch_start = None
+        self.k = 0.0
+        self.origin = 0.0
+        self.w_est = 0.0  # the window Reno would have
+
+    def on_ack(self, acked, cumulative, now):
+        if self.in_recovery or not acked:
+            return
+        if self.cwnd < self.ssthresh:
+            self.cwnd += acked
+            return
+        if self.epoch_start is None:
+            self.epoch_start = now
+            if self.cwnd < self.w_max:
+                self.k = ((self.w_max - self.cwnd) / self.C) ** (1 / 3)
+                self.origin = self.w_max
+            else:
+                self.k = 0.0
+                self.origin = self.cwnd
+            self.w_est = self.cwnd
+        rtt = self.min_rtt if self.min_rtt != float("inf") else 0.0
+        t = now - self.epoch_start + rtt
+        target = self.origin + self.C * (t - self.k) ** 3
+        if target > self.cwnd:
+            # at most 1.5 times the window per RTT
+            self.cwnd += min(target - self.cwnd, self.cwnd / 2) * acked / self.cwnd
+        else:
+            self.cwnd += 0.01 * acked / self.cwnd
+        self.w_est += 3 * (1 - self.BETA) / (1 + self.BETA) * acked / self.cwnd
+        self.cwnd = max(self.cwnd, self.w_est)
+
+    def reduce(self):
+        """
+        Remembers where the loss happened and starts a new epoch
+        """
+        self.epoch_start = None
+        if self.cwnd < self.w_max:
+            # fast convergence: leave room for newer flows
+            self.w_max = self.cwnd * (1 + self.BETA) / 2
+        else:
+            self.w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * self.BETA, 2.0)
+
+    def on_loss(self, now):
+        super().on_loss(now)
+        self.reduce()
+        self.cwnd = self.ssthresh
+
+    def on_timeout(self, now):
+        super().on_timeout(now)
+        self.reduce()
+        self.cwnd = 1.0
+
+
+class Bbr(CongestionControl):
+    """
+    Model based control in the style of BBR. The bottleneck bandwidth is
+    the highest delivery rate seen over the last few rounds and the
+    propagation delay is the lowest RTT seen. The window is a multiple of
+    their product (the bandwidth-delay product) instead of reacting to
+    each loss. A round is one smoothed RTT. The startup phase doubles the
+    window until the bandwidth stops growing, then drains the queue it
+    built and cycles its pacing gain to keep probing for more bandwidth.
+    ACKs that arrive in bursts (the server delays and batches them) add
+    their excess over the model to the window, as in BBRv2, so a small
+    window is not stuck waiting on delayed ACKs. A timeout drops the
+    window to MIN_CWND until a round of delivery rate samples taken after
+    it is in.
+    """
+
+    name = "bbr"
+    paced = True
+    STARTUP_GAIN = 2 / math.log(2)
+    CWND_GAIN = 2.0
+    PROBE_GAINS = (1.25, 0.75, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0)
+    BW_ROUNDS = 10  # rounds the bandwidth max filter remembers
+    MIN_RTT_WINDOW = 10.0  # seconds a minimum RTT sample stays valid
+    MIN_CWND = 4
+
+    def __init__(self, initial_cwnd=1, max_cwnd=DEFAULT_MAX_CWND):
+        super().__init__(initial_cwnd, max_cwnd)
+        self.state = "startup"
+        self.pacing_gain = self.STARTUP_GAIN
+        self.btl_bw = 0.0  # packets per second
+        self.bw_samples = deque()  # (round, delivery rate)
+        self.min_rtt_time = 0.0
+        self.delivered = 0
+        self.round = 0
+        self.round_start = None
+        self.round_delivered = 0
+        self.full_bw = 0.0
+        self.full_bw_rounds = 0
+        self.cycle_index = 0
+        self.ack_epoch_start = None
+        self.ack_epoch_acked = 0
+        self.extra_acked = 0.0
+        self.extra_acked_samples = deque()  # (round, packets ACKed early)
+        self.timeout_round = None  # round the window is held down in
+
+    def bdp(self):
+        """
+        Returns: The bandwidth-delay product in packets, or None before
+        the first estimate
+        """
+        if not self.btl_bw or self.min_rtt == float("inf"):
+            return None
+        return self.btl_bw * self.min_rtt
+
+    def on_rtt_sample(self, rtt, now):
+        if rtt <= self.min_rtt or now - self.min_rtt_time > self.MIN_RTT_WINDOW:
+            self.min_rtt = rtt
+            self.min_rtt_time = now
+        self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+
+    def on_ack(self, acked, cumulative, now):
+        self.delivered += acked
+        if self.round_start is None:
+            self.round_start = now
+            self.round_delivered = self.delivered
+        # a round is how long a packet takes to be ACKed now, so the
+        # filters remember several real round trips
+        round_length = self.srtt
+        if round_length and now - self.round_start >= round_length:
+            self.end_round(now)
+        self.update_extra_acked(acked, now)
+        bdp = self.bdp()
+        if self.timeout_round == self.round:
+            # held at MIN_CWND since the timeout
+            pass
+        elif self.state == "startup" or bdp is None:
+            # grow like slow start until the model has an estimate
+            self.cwnd += acked
+        else:
+            self.cwnd = max(self.MIN_CWND,
+                            self.CWND_GAIN * bdp + self.extra_acked)
+        if self.btl_bw:
+            self.pacing_rate = self.pacing_gain * self.btl_bw
+
+    def update_extra_acked(self, acked, now):
+        """
+        Measures how many more packets were ACKed since the start of the
+        current ACK burst than the bottleneck rate explains
+        Args:
+            acked (int): Packets ACKed in this batch
+            now (float): Current time
+        """
+        if not self.btl_bw:
+            return
+        expected = 0.0
+        if self.ack_epoch_start is not None:
+            expected = self.btl_bw * (now - self.ack_epoch_start)
+        if self.ack_epoch_start is None or self.ack_epoch_acked <= expected:
+            # ACKs are not ahead of the model, start a new burst
+            self.ack_epoch_start = now
+            self.ack_epoch_acked = 0
+            expected = 0.0
+        self.ack_epoch_acked += acked
+        extra = min(self.ack_epoch_acked - expected, self.cwnd)
+        samples = self.extra_acked_samples
+        if samples and samples[-1][0] == self.round:
+            if extra > samples[-1][1]:
+                samples[-1] = (self.round, extra)
+        else:
+            samples.append((self.round, extra))
+        while samples[0][0] <= self.round - self.BW_ROUNDS:
+            samples.popleft()
+        self.extra_acked = max(sample for _, sample in samples)
+
+    def end_round(self, now):
+        """
+        Takes a delivery rate sample for the round that just ended and
+        moves the state machine on
+        """
+        rate = (self.delivered - self.round_delivered) / (now - self.round_start)
+        self.round += 1
+        self.round_start = now
+        self.round_delivered = self.delivered
+        self.bw_samples.append((self.round, rate))
+        while self.bw_samples[0][0] <= self.round - self.BW_ROUNDS:
+            self.bw_samples.popleft()
+        self.btl_bw = max(sample for _, sample in self.bw_samples)
+
+        if self.state == "startup":
+            # the pipe is full once three rounds add less than 25%
+            if self.btl_bw >= self.full_bw * 1.25:
+                self.full_bw = self.btl_bw
+                self.full_bw_rounds = 0
+            else:
+                self.full_bw_rounds += 1
+                if self.full_bw_rounds >= 3:
+                    self.state = "drain"
+                    self.pacing_gain = 1 / self.STARTUP_GAIN
+        elif self.state == "drain":
+            self.state = "probe_bw"
+            self.cycle_index = 0
+            self.pacing_gain = self.PROBE_GAINS[0]
+        else:
+            self.cycle_index = (self.cycle_index + 1) % len(self.PROBE_GAINS)
+            self.pacing_gain = self.PROBE_GAINS[self.cycle_index]
+
+    def on_loss(self, now):
+        # the model, not the loss, sets the window
+        super().on_loss(now)
+
+    def on_timeout(self, now):
+        super().on_timeout(now)
+        self.cwnd = self.MIN_CWND
+        # the next round starts with the next ACK, so its rate sample is
+        # taken after the timeout
+        self.round_start = None
+        self.timeout_round = self.round
+
+    def __str__(self):
+        return (f"{self.name}: cwnd {self.cwnd:.1f}, state {self.state}, "
+                f"bottleneck {self.btl_bw:.0f} pkt/s, "
+                f"min RTT {self.min_rtt * 1000:.2f}ms, losses {self.losses}, "
+                f"timeouts {self.timeouts}")
+
+
+ALGORITHMS = {
+    Aimd.name: Aimd,
+    NewReno.name: NewReno,
+    Cubic.name: Cubic,
+    Bbr.name: Bbr,
+}
+
+DEFAULT_ALGORITHM = NewReno.name
+
+
+def get_algorithm(name, initial_cwnd=1, max_cwnd=DEFAULT_MAX_CWND):
+    """
+    Returns a congestion control instance
+    Args:
+        name (str): Name of the algorithm
+        initial_cwnd (int): Window at the start of the transfer
+        max_cwnd (int): Largest window
+    Returns: A CongestionControl object
+    """
+    try:
+        return ALGORITHMS[name](initial_cwnd, max_cwnd)
+    except KeyError:
+        raise ValueError(f"Unknown congestion control: {name}") from None
@@ -0,0 +1,157 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# File transfer
+"""
+Application data for the transfer. The client sends a real file cut into
+fixed-size segments, one per sequence number (the last one may be
+shorter). FileSource maps the file into memory and hands out each
+segment as a memoryview slice, so no segment is copied before it is
+encoded into the send buffer. FileSink preallocates the output file at
+its final size and maps it, so each segment is written straight to its
+offset. Segments arriving out of order cost nothing extra and a segment
+arriving twice is written once.
+
+Both ends compute a SHA-256 of the whole file so the transfer can be
+checked end to end. A FileSource can also hand out only a stripe of the
+file (see striping.py), numbered from 0 like a file of its own.
+"""
+
+import hashlib
+import math
+import mmap
+import os
+
+DEFAULT_SEGMENT_SIZE = 1024
+MAX_SEGMENT_SIZE = 2**16 - 1  # the length field of a frame is 16 bits
+
+
+def checksum(data):
+    """
+    Args: data (bytes-like): Contents to hash
+    Returns: Hex SHA-256 of data
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def segment_count(size, segment_size):
+    """
+    Args:
+        size (int): File size in bytes
+        segment_size (int): Bytes per segment
+    Returns: Number of segments the file is cut into
+    """
+    return math.ceil(size / segment_size)
+
+
+class FileSource:
+    """
+    Read-only memory map of the file being sent
+    Args:
+        path (str): File to send
+        segment_size (int): Bytes per segment
+        first (int): Segment the source starts at, to send a stripe
+        count (int): Segments of the stripe, None for the rest of the file
+    """
+
+    def __init__(self, path, segment_size=DEFAULT_SEGMENT_SIZE, first=0,
+                 count=None):
+        if not 0 < segment_size <= MAX_SEGMENT_SIZE:
+            raise ValueError(f"Segment size must be 1 to {MAX_SEGMENT_SIZE}")
+        self.path = path
+        self.segment_size = segment_size
+        self.size = os.path.getsize(path)
+        self.file = open(path, "rb")
+        if self.size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+        else:
+            # an empty file cannot be mapped
+            self.map = None
+            self.view = memoryview(b"")
+        self.first = first
+        self.total_segments = segment_count(self.size, segment_size) - first
+        if count is not None:
+            self.total_segments = min(count, self.total_segments)
+        self.digest = None  # checksum of the whole file, once computed
+
+    def segment(self, seq_num):
+        """
+        Args: seq_num (int): Sequence number of the segment
+        Returns: memoryview of the segment's bytes in the map
+        """
+        start = (self.first + seq_num) * self.segment_size
+        return self.view[start:start + self.segment_size]
+
+    def checksum(self):
+        """
+        Returns: Hex SHA-256 of the whole file, even for a stripe
+        """
+        if self.digest is None:
+            self.digest = checksum(self.view)
+        return self.digest
+
+    def close(self):
+        self.view.release()
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+
+class FileSink:
+    """
+    Writable memory map of the file being received, preallocated to its
+    final size
+    Args:
+        path (str): File to write
+        size (int): Size of the file in bytes
+        segment_size (int): Bytes per segment
+    """
+
+    def __init__(self, path, size, segment_size=DEFAULT_SEGMENT_SIZE):
+        if not 0 < segment_size <= MAX_SEGMENT_SIZE:
+            raise ValueError(f"Segment size must be 1 to {MAX_SEGMENT_SIZE}")
+        self.path = path
+        self.size = size
+        self.segment_size = segment_size
+        self.total_segments = segment_count(size, segment_size)
+        self.file = open(path, "w+b")
+        self.file.truncate(size)
+        if size:
+            self.map = mmap.mmap(self.file.fileno(), size)
+            self.view = memoryview(self.map)
+        else:
+            self.map = None
+            self.view = memoryview(bytearray())
+        self.written = bytearray(self.total_segments)  # 1 per segment stored
+        self.bytes_written = 0
+
+    def write(self, seq_num, payload):
+        """
+        Copies a segment to its place in the file
+        Args:
+            seq_num (int): Sequence number of the segment
+            payload (bytes-like): Data of the segment
+        Returns: False if the segment does not belong to the file or was
+        already written
+        """
+        start = seq_num * self.segment_size
+        end = start + len(payload)
+        if seq_num >= self.total_segments or end > self.size \
+                or self.written[seq_num]:
+            return False
+        self.view[start:end] = payload
+        self.written[seq_num] = 1
+        self.bytes_written += len(payload)
+        return True
+
+    def checksum(self):
+        return checksum(self.view)
+
+    def close(self):
+        """
+        Writes the map back to the file and closes it
+        """
+        self.view.release()
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+        self.file.close()
@@ -0,0 +1,100 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Frame parser
+"""
+Incremental frame parser shared by the client and server programs.
+Bytes are read with recv_into straight into a preallocated bytearray.
+Complete frames are decoded with the connection's codec and any partial
+frame left at the end of a read is kept for the next one, so a sequence
+number split across two reads is still parsed as one number.
+"""
+
+DEFAULT_BUFFER_SIZE = 2**19  # 512 KiB, a full 2^16 window of binary frames
+
+
+class FrameParser:
+    """
+    Reads frames from a socket into a reusable buffer
+    """
+
+    def __init__(self, codec, buffer_size=DEFAULT_BUFFER_SIZE, min_room=1):
+        self.codec = codec
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # first byte that has not been parsed yet
+        self.end = 0  # one past the last byte received
+        # free bytes needed before a read, a datagram must fit in one piece
+        self.min_room = min_room
+        self.closed = False
+
+    def pending(self):
+        """
+        Returns the number of bytes held over from a partial frame
+        Returns: An int
+        """
+        return self.end - self.start
+
+    def make_room(self):
+        """
+        Moves the partial frame at the end of the buffer to the front.
+        The buffer is doubled until min_room bytes are free after it.
+        """
+        pending = self.end - self.start
+        if self.start:
+            self.view[:pending] = self.view[self.start:self.end]
+            self.start = 0
+            self.end = pending
+        if len(self.buffer) - self.end < self.min_room:
+            capacity = len(self.buffer)
+            while capacity - self.end < self.min_room:
+                capacity *= 2
+            self.buffer = self.buffer + bytearray(capacity - len(self.buffer))
+            self.view = memoryview(self.buffer)
+
+    def read(self, sock):
+        """
+        Receives as many bytes as fit in the buffer
+        Args: sock (socket): Connected socket to read from
+        Returns: Number of bytes read. 0 means the peer closed the connection.
+        """
+        self.make_room()
+        try:
+            num_bytes = sock.recv_into(self.view[self.end:])
+        except ConnectionResetError:
+            # peer closed with data still unread on its side
+            num_bytes = 0
+        if not num_bytes:
+            self.closed = True
+        self.end += num_bytes
+        return num_bytes
+
+    def feed(self, data):
+        """
+        Adds bytes that were received some other way
+        Args: data (bytes-like): Bytes to parse
+        """
+        data = memoryview(data).cast("B")
+        while len(data):
+            self.make_room()
+            chunk = min(len(data), len(self.buffer) - self.end)
+            self.view[self.end:self.end + chunk] = data[:chunk]
+            self.end += chunk
+            data = data[chunk:]
+
+    def frames(self):
+        """
+        Yields every complete frame received so far as
+        (kind, stream, seq, payload) tuples. Payloads point into the
+        buffer and are only valid until the next read.
+        """
+        frames, consumed = self.codec.decode(self.view[self.start:self.end])
+        self.start += consumed
+        yield from frames
+
+    def raw_frames(self):
+        """
+        Yields every complete frame received so far as (kind, raw bytes)
+        tuples, for code that forwards frames instead of reading them
+        """
+        frames, consumed = self.codec.split(self.view[self.start:self.end])
+        self.start += consumed
+        yield from frames
@@ -0,0 +1,438 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Load generator
+"""
+Synthetic load for the asyncio server (async_server.py). Thousands of
+lightweight senders run as coroutines of one event loop in one process.
+Each one opens its own connection and speaks the client's protocol:
+handshake offer, bin1 data frames kept within its window and the
+server's receive window, then a FIN and the wait for the FIN ACK. The
+senders do no retransmission, TCP does not lose anything.
+
+The load rises in steps, one per --rate: connections arrive at that
+rate, Poisson (exponential gaps) or evenly spaced, --connections of them
+per step. For every step it reports
+    connect   seconds until the kernel finished the TCP handshake,
+              i.e. the connection made it into the listen backlog
+    accept    seconds until the handshake reply, i.e. until the server
+              accepted the connection and read the offer
+    goodput   bytes per second of each connection, from the reply to
+              the FIN ACK
+    complete  seconds from the connect to the FIN ACK
+and how many connections failed or timed out and how many were open at
+once. Transfer sizes are fixed or drawn from an exponential or Pareto
+distribution around --packets. How the senders read their ACKs is set
+with --ack-mode: eager reads them as they come, slow sleeps
+--ack-delay seconds before each read so the server's replies back up.
+
+Run: python load_generator.py --rates 100 500 2000 --connections 1000
+     [--host 127.0.0.1 --port 12344 | --start-server] [--packets 100]
+     [--sizes fixed|exponential|pareto] [--window 64] [--segment 0]
+     [--ack-mode eager|slow] [--ack-delay 0.01] [--arrivals poisson|uniform]
+     [--timeout 30] [--seed 1] [--output load_results.csv]
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import random
+import tempfile
+
+import wire_format
+from bench_transfer import HOST, free_port, start, wait_for, reap, tail
+from metrics import LatencyHistogram
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+DEFAULT_PACKETS = 100
+DEFAULT_WINDOW = 64
+PARETO_SHAPE = 1.5  # heavy tailed, with a finite mean
+
+
+def fixed_size(rng, mean):
+    return mean
+
+
+def exponential_size(rng, mean):
+    return max(1, round(rng.expovariate(1 / mean)))
+
+
+def pareto_size(rng, mean):
+    # scale picked so that the mean of the distribution is mean
+    scale = mean * (PARETO_SHAPE - 1) / PARETO_SHAPE
+    return max(1, round(scale * rng.paretovariate(PARETO_SHAPE)))
+
+
+SIZES = {
+    "fixed": fixed_size,
+    "exponential": exponential_size,
+    "pareto": pareto_size,
+}
+ACK_MODES = ("eager", "slow")
+ARRIVALS = ("poisson", "uniform")
+
+COLUMNS = ("rate", "connections", "packets", "window", "ack_mode",
+           "offered_rate", "completed", "failed", "max_open",
+           "connect_p50", "connect_p99", "accept_p50", "accept_p99",
+           "accept_p999", "complete_p50", "complete_p99", "complete_p999",
+           "goodput_p50", "goodput_p1", "wall_time")
+
+
+class Sender:
+    """
+    One synthetic client: a single connection and a single transfer
+    Args:
+        host (str): Server address
+        port (int): Server port
+        packets (int): Packets to send
+        window (int): Most packets in flight
+        segment (int): Payload bytes per packet
+        ack_mode (str): eager or slow, see ACK_MODES
+        ack_delay (float): Seconds slept before each read in slow mode
+    """
+
+    def __init__(self, host, port, packets, window=DEFAULT_WINDOW, segment=0,
+                 ack_mode="eager", ack_delay=0.01):
+        self.host = host
+        self.port = port
+        self.packets = packets
+        self.window = window
+        self.segment = segment
+        self.ack_mode = ack_mode
+        self.ack_delay = ack_delay
+        self.codec = None
+        self.pending = b""  # start of a frame split across reads
+        self.cum_ack = 0
+        self.receive_window = window
+        self.fin_acked = False
+
+        self.started = None
+        self.connected = None
+        self.accepted = None
+        self.completed = None
+
+    async def run(self):
+        """
+        Connects, sends every packet and the FIN and waits for the FIN ACK
+        """
+        loop = asyncio.get_running_loop()
+        self.started = loop.time()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            self.connected = loop.time()
+            options = {"segment": self.segment} if self.segment else {}
+            writer.write(wire_format.handshake_offer(
+                (wire_format.BinaryCodec.name,), **options))
+            reply = await reader.read(1024)
+            if not reply:
+                raise ConnectionError("Server closed the connection")
+            self.accepted = loop.time()
+            name = wire_format.parse_accept(reply)
+            if name != wire_format.BinaryCodec.name:
+                raise ValueError(f"The server picked {name}, the load "
+                                 f"generator only speaks bin1")
+            self.codec = wire_format.get_codec(name, wire_format.KIND_ACK)
+
+            next_seq = 0
+            while self.cum_ack < self.packets:
+                end = min(self.packets,
+                          self.cum_ack + min(self.window, self.receive_window))
+                if next_seq < end:
+                    writer.write(self.data_frames(next_seq, end))
+                    next_seq = end
+                    await writer.drain()
+                await self.read_acks(reader)
+            writer.write(self.codec.encode_fin())
+            while not self.fin_acked:
+                await self.read_acks(reader)
+            self.completed = loop.time()
+        finally:
+            writer.close()
+
+    def data_frames(self, start, end):
+        """
+        Args:
+            start (int): First sequence number
+            end (int): Sequence number past the last
+        Returns: The data frames of the packets in one buffer
+        """
+        payload = bytes(self.segment)
+        frame_size = self.codec.max_frame_size + self.segment
+        buffer = bytearray(frame_size * (end - start))
+        offset = 0
+        for seq in range(start, end):
+            offset = self.codec.pack_data(buffer, offset, seq, payload)
+        return buffer
+
+    async def read_acks(self, reader):
+        """
+        Reads what the server sent and moves the window. Slow mode sleeps
+        first, as a client busy elsewhere would.
+        """
+        if self.ack_mode == "slow":
+            await asyncio.sleep(self.ack_delay)
+        data = await reader.read(2**16)
+        if not data:
+            raise ConnectionError("Server closed the connection")
+        data = self.pending + data
+        frames, consumed = self.codec.decode(data)
+        for kind, _, seq, payload in frames:
+            if kind == wire_format.KIND_SACK:
+                _, window, _ = self.codec.decode_sack(payload)
+                if seq >= self.cum_ack:
+                    self.cum_ack = seq
+                    # at 0 nothing is sent until a window update comes
+                    self.receive_window = window
+            elif kind == wire_format.KIND_FIN:
+                self.fin_acked = True
+        self.pending = bytes(data[consumed:])
+
+    def goodput(self):
+        """
+        Returns: Bytes per second sent from the handshake reply to the
+        FIN ACK
+        """
+        sent = self.packets * (self.codec.max_frame_size + self.segment)
+        return sent / max(self.completed - self.accepted, 1e-9)
+
+
+class LoadStep:
+    """
+    Runs one step of the load: connections arriving at a rate
+    Args:
+        rate (float): Connections started per second
+        connections (int): Connections started in the step
+        packets (int): Packets per transfer, the mean of sizes
+        sizes (function): Draws a transfer size, see SIZES
+        rng (random.Random): Source of the sizes and arrival gaps
+        arrivals (str): poisson or uniform, see ARRIVALS
+        timeout (float): Seconds a connection may take before it fails
+        sender_options: host, port and the rest of Sender's arguments
+    """
+
+    def __init__(self, rate, connections, packets, sizes, rng,
+                 arrivals="poisson", timeout=30.0, **sender_options):
+        self.rate = rate
+        self.connections = connections
+        self.packets = packets
+        self.sizes = sizes
+        self.rng = rng
+        self.arrivals = arrivals
+        self.timeout = timeout
+        self.sender_options = sender_options
+
+        self.connect = LatencyHistogram()
+        self.accept = LatencyHistogram()
+        self.complete = LatencyHistogram()
+        self.goodputs = []
+        self.completed = 0
+        self.failed = 0
+        self.errors = {}  # error name to count
+        self.open = 0
+        self.max_open = 0
+        self.last_arrival = 0.0
+        self.wall_time = 0.0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        tasks = []
+        arrival = begin
+        for _ in range(self.connections):
+            if self.arrivals == "poisson":
+                arrival += self.rng.expovariate(self.rate)
+            else:
+                arrival += 1 / self.rate
+            delay = arrival - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sender = Sender(packets=self.sizes(self.rng, self.packets),
+                            **self.sender_options)
+            tasks.append(asyncio.ensure_future(self.run_sender(sender)))
+        self.last_arrival = loop.time() - begin
+        await asyncio.gather(*tasks)
+        self.wall_time = loop.time() - begin
+
+    async def run_sender(self, sender):
+        self.open += 1
+        self.max_open = max(self.max_open, self.open)
+        try:
+            await asyncio.wait_for(sender.run(), self.timeout)
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            self.failed += 1
+            name = type(e).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+        else:
+            self.completed += 1
+            self.complete.record(sender.completed - sender.started)
+            self.goodputs.append(sender.goodput())
+        finally:
+            self.open -= 1
+        if sender.connected is not None:
+            self.connect.record(sender.connected - sender.started)
+        if sender.accepted is not None:
+            self.accept.record(sender.accepted - sender.started)
+
+    def offered_rate(self):
+        """
+        Returns: Connections started per second, as they really arrived
+        """
+        return self.connections / max(self.last_arrival, 1e-9)
+
+    def result(self):
+        """
+        Returns: dict of COLUMNS but the configuration ones
+        """
+        goodputs = sorted(self.goodputs)
+        row = {"offered_rate": self.offered_rate(),
+               "completed": self.completed, "failed": self.failed,
+               "max_open": self.max_open, "wall_time": self.wall_time,
+               "goodput_p50": percentile(goodputs, 50),
+               "goodput_p1": percentile(goodputs, 1)}
+        row["connect_p50"], row["connect_p99"] = \
+            self.connect.percentiles(50, 99)
+        row["accept_p50"], row["accept_p99"], row["accept_p999"] = \
+            self.accept.percentiles(50, 99, 99.9)
+        row["complete_p50"], row["complete_p99"], row["complete_p999"] = \
+            self.complete.percentiles(50, 99, 99.9)
+        return row
+
+    def __str__(self):
+        line = (f"{self.rate:g}/s offered ({self.offered_rate():.0f}/s real): "
+                f"{self.completed} completed, {self.failed} failed, "
+                f"{self.max_open} open at most, {self.wall_time:.2f}s\n"
+                f"  connect  {self.connect}\n"
+                f"  accept   {self.accept}\n"
+                f"  complete {self.complete}")
+        if self.goodputs:
+            goodputs = sorted(self.goodputs)
+            line += (f"\n  goodput  p50 {percentile(goodputs, 50) / 1e3:.1f}"
+                     f"KB/s, p1 {percentile(goodputs, 1) / 1e3:.1f}KB/s "
+                     f"per connection")
+        if self.errors:
+            line += "\n  errors   " + ", ".join(
+                f"{name} {count}" for name, count in sorted(self.errors.items()))
+        return line
+
+
+def percentile(values, percent):
+    """
+    Args:
+        values (list): Sorted values
+        percent (float): Percentile wanted
+    Returns: The value that percent of the values are at or below, None
+    if there are none
+    """
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+def raise_file_limit():
+    """
+    Raises the limit of open files to the hard limit, every connection
+    needs one
+    Returns: The limit now in force, None if it cannot be read
+    """
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic load generator for the asyncio server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=12344)
+    parser.add_argument("--start-server", action="store_true",
+                        help="start async_server.py on a free port and "
+                             "stop it at the end")
+    parser.add_argument("--rates", type=float, nargs="+", default=[100.0],
+                        help="connections per second, one step each")
+    parser.add_argument("--connections", type=int, default=1000,
+                        help="connections started in each step")
+    parser.add_argument("--arrivals", choices=ARRIVALS, default="poisson")
+    parser.add_argument("--packets", type=int, default=DEFAULT_PACKETS,
+                        help="packets per transfer, the mean if --sizes is "
+                             "not fixed")
+    parser.add_argument("--sizes", choices=SIZES, default="fixed")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help="most packets in flight per connection")
+    parser.add_argument("--segment", type=int, default=0,
+                        help="payload bytes per packet")
+    parser.add_argument("--ack-mode", choices=ACK_MODES, default="eager")
+    parser.add_argument("--ack-delay", type=float, default=0.01,
+                        help="seconds slept before each read with "
+                             "--ack-mode slow")
+    parser.add_argument("--timeout", type=float, default=30.0,
+                        help="seconds a connection may take")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None,
+                        help="CSV file, one line per step")
+    args = parser.parse_args()
+    if min(args.rates) <= 0 or args.connections < 1 or args.packets < 1 \
+            or args.window < 1:
+        parser.error("rates, connections, packets and window must be positive")
+
+    limit = raise_file_limit()
+    if limit is not None and limit < args.connections + 16:
+        print(f"WARNING: {limit} open files allowed, fewer than "
+              f"--connections; connections may fail with EMFILE")
+
+    server = None
+    workdir = tempfile.mkdtemp(prefix="load_")
+    if args.start_server:
+        args.host, args.port = HOST, free_port()
+        log_path = os.path.join(workdir, "server.log")
+        server = start("async_server.py",
+                       ["--host", args.host, "--port", str(args.port),
+                        "--idle-timeout", str(args.timeout)], log_path)
+        if not wait_for(server, log_path, "Listening on"):
+            print(tail(log_path))
+            raise SystemExit("async_server.py did not start")
+
+    rng = random.Random(args.seed)
+    writer = None
+    if args.output:
+        output = open(args.output, "w", newline="")
+        writer = csv.DictWriter(output, COLUMNS)
+        writer.writeheader()
+    try:
+        for rate in args.rates:
+            step = LoadStep(rate, args.connections, args.packets,
+                            SIZES[args.sizes], rng, args.arrivals,
+                            args.timeout, host=args.host, port=args.port,
+                            window=args.window, segment=args.segment,
+                            ack_mode=args.ack_mode, ack_delay=args.ack_delay)
+            asyncio.run(step.run())
+            print(step, flush=True)
+            if writer is not None:
+                row = step.result()
+                row.update(rate=rate, connections=args.connections,
+                           packets=args.packets, window=args.window,
+                           ack_mode=args.ack_mode)
+                writer.writerow({name: f"{value:.6g}"
+                                 if isinstance(value, float) else value
+                                 for name, value in row.items()})
+                output.flush()
+    finally:
+        if writer is not None:
+            output.close()
+        if server is not None:
+            server.terminate()
+            reap(server, 5.0)
+            print(f"Server log: {os.path.join(workdir, 'server.log')}")
+
+
+if __name__ == '__main__':
+    main()
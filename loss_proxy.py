@@ -0,0 +1,397 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Loss proxy
+"""
+Link emulator that sits between the client and the server.
+Both programs run over TCP, so nothing is ever really lost between them.
+The proxy accepts the client's connection, opens its own connection to
+the server and forwards the handshake untouched. After that it cuts both
+byte streams into frames and applies a LinkProfile to every frame:
+drop, duplicate, delay with jitter, reorder and a bandwidth cap. Every
+random choice comes from a seeded random.Random, one per direction of
+every connection, so the same seed gives the same losses on every run
+and a connection's losses do not depend on the traffic of the others.
+A link holds at most MAX_QUEUED bytes of frames; past that the proxy
+stops reading from the sender, and it never reads faster than the
+receiver takes the bytes, so a slow reader cannot make it buffer
+without end.
+
+It can run standalone:
+    python loss_proxy.py --listen 12345 --server 127.0.0.1:12344 --drop 0.01
+or in-process with LossProxy.start() on a running event loop, or
+start_in_thread() from blocking code.
+"""
+
+import argparse
+import asyncio
+import heapq
+import random
+import threading
+
+import wire_format
+from frame_parser import FrameParser
+
+JITTER_DISTRIBUTIONS = ("uniform", "normal", "exponential")
+MAX_QUEUED = 2**22  # bytes of frames a link holds before it stops reading
+
+
+class LinkProfile:
+    """
+    Impairments applied to every frame going one way over the link
+    Args:
+        drop (float): Probability a frame is lost
+        duplicate (float): Probability a frame is delivered twice
+        delay (float): Fixed one-way delay in seconds
+        jitter (float): Spread of the random extra delay in seconds
+        jitter_distribution (str): "uniform", "normal" or "exponential"
+        reorder (float): Probability a frame is held back by reorder_delay
+        and overtaken by the frames behind it
+        reorder_delay (float): Extra delay of reordered frames in seconds
+        bandwidth (float): Link rate in bytes per second, None for no cap
+    """
+
+    def __init__(self, drop=0.0, duplicate=0.0, delay=0.0, jitter=0.0,
+                 jitter_distribution="uniform", reorder=0.0,
+                 reorder_delay=0.01, bandwidth=None):
+        if jitter_distribution not in JITTER_DISTRIBUTIONS:
+            raise ValueError(f"Unknown jitter distribution: {jitter_distribution}")
+        for name, value in (("drop", drop), ("duplicate", duplicate),
+                            ("reorder", reorder)):
+            if not 0.0 <= value <= 1.0:
+                raise ValueError(f"{name} must be a probability")
+        self.drop = drop
+        self.duplicate = duplicate
+        self.delay = delay
+        self.jitter = jitter
+        self.jitter_distribution = jitter_distribution
+        self.reorder = reorder
+        self.reorder_delay = reorder_delay
+        self.bandwidth = bandwidth
+
+    def sample_jitter(self, rng):
+        """
+        Args: rng (random.Random): Seeded random generator
+        Returns: Extra delay in seconds, never negative
+        """
+        if not self.jitter:
+            return 0.0
+        if self.jitter_distribution == "uniform":
+            return rng.uniform(0.0, self.jitter)
+        if self.jitter_distribution == "normal":
+            return abs(rng.gauss(0.0, self.jitter))
+        return rng.expovariate(1.0 / self.jitter)
+
+
+class LinkStats:
+    """
+    Counters for one direction of the link
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.reordered = 0
+        self.bytes_delivered = 0
+
+    def __str__(self):
+        return (f"frames {self.frames}, dropped {self.dropped}, "
+                f"duplicated {self.duplicated}, reordered {self.reordered}, "
+                f"bytes delivered {self.bytes_delivered}")
+
+
+class Link:
+    """
+    One direction of an emulated link. Frames are scheduled on a heap by
+    delivery time and written out in batches when they are due.
+    """
+
+    def __init__(self, profile, rng, writer, stats, loop):
+        self.profile = profile
+        self.rng = rng
+        self.writer = writer
+        self.stats = stats
+        self.loop = loop
+        self.parser = None  # set once the handshake picks the wire format
+        self.queue = []
+        self.queued_bytes = 0
+        self.room = asyncio.Event()  # set while under MAX_QUEUED
+        self.room.set()
+        self.counter = 0  # keeps heap order stable for equal times
+        self.link_free = 0.0  # when the bandwidth cap lets the next frame out
+        self.in_order_time = 0.0  # frames that are not reordered stay FIFO
+        self.timer = None
+
+    def schedule(self, frame, now):
+        """
+        Decides the fate of one frame and queues its copies
+        Args:
+            frame (bytes): Raw frame
+            now (float): Current loop time
+        """
+        profile = self.profile
+        rng = self.rng
+        self.stats.frames += 1
+        if profile.drop and rng.random() < profile.drop:
+            self.stats.dropped += 1
+            return
+        copies = 1
+        if profile.duplicate and rng.random() < profile.duplicate:
+            self.stats.duplicated += 1
+            copies = 2
+        for _ in range(copies):
+            departure = now
+            if profile.bandwidth:
+                # serialization delay at the bottleneck
+                departure = max(now, self.link_free) + len(frame) / profile.bandwidth
+                self.link_free = departure
+            deliver_at = departure + profile.delay + profile.sample_jitter(rng)
+            if profile.reorder and rng.random() < profile.reorder:
+                self.stats.reordered += 1
+                deliver_at += profile.reorder_delay
+            else:
+                deliver_at = max(deliver_at, self.in_order_time)
+                self.in_order_time = deliver_at
+            heapq.heappush(self.queue, (deliver_at, self.counter, frame))
+            self.counter += 1
+            self.queued_bytes += len(frame)
+        if self.queued_bytes >= MAX_QUEUED:
+            self.room.clear()
+
+    def forward(self, data):
+        """
+        Queues every complete frame in data
+        Args: data (bytes): Bytes read from the sending side
+        """
+        now = self.loop.time()
+        self.parser.feed(data)
+        for _, frame in self.parser.raw_frames():
+            self.schedule(frame, now)
+        self.arm()
+
+    def arm(self):
+        """
+        Wakes up when the next frame is due
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.queue:
+            self.timer = self.loop.call_at(self.queue[0][0], self.deliver)
+
+    def deliver(self):
+        """
+        Writes every frame that is due in one write
+        """
+        self.timer = None
+        now = self.loop.time()
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            due.append(heapq.heappop(self.queue)[2])
+        if due:
+            data = b"".join(due)
+            self.queued_bytes -= len(data)
+            if self.queued_bytes < MAX_QUEUED:
+                self.room.set()
+            if not self.writer.is_closing():
+                self.stats.bytes_delivered += len(data)
+                self.writer.write(data)
+        self.arm()
+
+    async def wait_for_room(self):
+        """
+        Waits until the receiver has taken what was written to it and the
+        link has room for more frames
+        """
+        await self.writer.drain()
+        await self.room.wait()
+
+    async def drain(self):
+        """
+        Waits until every queued frame has been delivered
+        """
+        while self.queue and not self.writer.is_closing():
+            await asyncio.sleep(max(0.0, self.queue[-1][0] - self.loop.time()))
+
+
+class LossProxy:
+    """
+    TCP proxy that impairs the frames between a client and a server
+    Args:
+        server_host (str): Address of the real server
+        server_port (int): Port of the real server
+        listen_host (str): Address the proxy listens on
+        listen_port (int): Port the proxy listens on, 0 picks a free one
+        forward (LinkProfile): Impairments for client to server frames
+        reverse (LinkProfile): Impairments for server to client frames (ACKs)
+        seed (int): Seed of the random generators, each direction of
+        every connection gets its own one derived from it
+    """
+
+    def __init__(self, server_host, server_port, listen_host="127.0.0.1",
+                 listen_port=0, forward=None, reverse=None, seed=0):
+        self.server_host = server_host
+        self.server_port = server_port
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.forward = forward if forward else LinkProfile()
+        self.reverse = reverse if reverse else LinkProfile()
+        self.seed = seed
+        self.connections = 0
+        self.forward_stats = LinkStats()
+        self.reverse_stats = LinkStats()
+        self.server = None
+        self.loop = None
+
+    async def start(self):
+        """
+        Starts listening. listen_port is set to the real port afterwards.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(
+            self.handle_client, self.listen_host, self.listen_port)
+        self.listen_port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle_client(self, client_reader, client_writer):
+        index = self.connections
+        self.connections += 1
+        server_reader, server_writer = await asyncio.open_connection(
+            self.server_host, self.server_port)
+        to_server = Link(self.forward, self.link_rng(index, "forward"),
+                         server_writer, self.forward_stats, self.loop)
+        to_client = Link(self.reverse, self.link_rng(index, "reverse"),
+                         client_writer, self.reverse_stats, self.loop)
+        try:
+            # the handshake goes through untouched and picks the wire format
+            offer = await client_reader.read(1024)
+            server_writer.write(offer)
+            reply = await server_reader.read(1024)
+            client_writer.write(reply)
+            name = wire_format.parse_accept(reply)
+            to_server.parser = FrameParser(
+                wire_format.get_codec(name, wire_format.KIND_DATA))
+            to_client.parser = FrameParser(
+                wire_format.get_codec(name, wire_format.KIND_ACK))
+            await asyncio.gather(
+                self.pump(client_reader, to_server),
+                self.pump(server_reader, to_client))
+        except ConnectionError:
+            pass
+        finally:
+            for writer in (client_writer, server_writer):
+                writer.close()
+
+    def link_rng(self, index, direction):
+        """
+        Args:
+            index (int): Number of the connection, in the order accepted
+            direction (str): "forward" or "reverse"
+        Returns: random.Random for one direction of one connection
+        """
+        return random.Random(f"{self.seed}:{index}:{direction}")
+
+    async def pump(self, reader, link):
+        """
+        Forwards one direction until the sender closes it
+        """
+        while True:
+            await link.wait_for_room()
+            data = await reader.read(2**16)
+            if not data:
+                break
+            link.forward(data)
+        await link.drain()
+        if not link.writer.is_closing() and link.writer.can_write_eof():
+            link.writer.write_eof()
+
+    def start_in_thread(self):
+        """
+        Runs the proxy on its own event loop in a daemon thread
+        Returns: The port the proxy listens on
+        """
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self.listen_port
+
+    def __str__(self):
+        return (f"client -> server: {self.forward_stats}\n"
+                f"server -> client: {self.reverse_stats}")
+
+
+def add_profile_args(parser, prefix, help_prefix):
+    parser.add_argument(f"--{prefix}drop", type=float, default=0.0,
+                        help=f"{help_prefix} drop probability")
+    parser.add_argument(f"--{prefix}duplicate", type=float, default=0.0,
+                        help=f"{help_prefix} duplicate probability")
+    parser.add_argument(f"--{prefix}delay", type=float, default=0.0,
+                        help=f"{help_prefix} one-way delay in seconds")
+    parser.add_argument(f"--{prefix}jitter", type=float, default=0.0,
+                        help=f"{help_prefix} jitter in seconds")
+    parser.add_argument(f"--{prefix}jitter-distribution", default="uniform",
+                        choices=JITTER_DISTRIBUTIONS)
+    parser.add_argument(f"--{prefix}reorder", type=float, default=0.0,
+                        help=f"{help_prefix} reorder probability")
+    parser.add_argument(f"--{prefix}reorder-delay", type=float, default=0.01)
+    parser.add_argument(f"--{prefix}bandwidth", type=float, default=None,
+                        help=f"{help_prefix} bandwidth cap in bytes/sec")
+
+
+def profile_from_args(args, prefix):
+    prefix = prefix.replace("-", "_")
+    return LinkProfile(
+        drop=getattr(args, f"{prefix}drop"),
+        duplicate=getattr(args, f"{prefix}duplicate"),
+        delay=getattr(args, f"{prefix}delay"),
+        jitter=getattr(args, f"{prefix}jitter"),
+        jitter_distribution=getattr(args, f"{prefix}jitter_distribution"),
+        reorder=getattr(args, f"{prefix}reorder"),
+        reorder_delay=getattr(args, f"{prefix}reorder_delay"),
+        bandwidth=getattr(args, f"{prefix}bandwidth"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loss/delay/reorder proxy")
+    parser.add_argument("--listen", type=int, default=12345,
+                        help="port the client connects to")
+    parser.add_argument("--listen-host", default="0.0.0.0")
+    parser.add_argument("--server", default="127.0.0.1:12344",
+                        help="host:port of the real server")
+    parser.add_argument("--seed", type=int, default=0)
+    add_profile_args(parser, "", "data")
+    add_profile_args(parser, "ack-", "ACK")
+    args = parser.parse_args()
+
+    host, _, port = args.server.rpartition(":")
+    proxy = LossProxy(host, int(port), args.listen_host, args.listen,
+                      profile_from_args(args, ""),
+                      profile_from_args(args, "ack-"), args.seed)
+
+    async def serve():
+        await proxy.start()
+        print(f"Proxy listening on {args.listen_host}:{proxy.listen_port}, "
+              f"forwarding to {args.server}")
+        async with proxy.server:
+            await proxy.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    print(proxy)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Metrics
+"""
+Time series of a transfer. A MetricsRecorder writes one row of values
+every `interval` seconds while the transfer runs, straight to a file,
+so nothing is held back in memory and no sample is thrown away:
+    client  time, cwnd, packets in flight, SRTT, RTO, RTT percentiles
+            (p50, p99, p999) of the interval, ACKs per second, bytes per
+            second on the wire and retransmits
+    server  time, packets received, packets in order, receive window,
+            packets and file bytes per second, drops and ACKs sent
+A path ending in .csv is written as CSV, any other path as the compact
+binary format below. load reads both back, and plot_metrics.py draws
+the charts from them afterwards.
+
+Binary format, little-endian:
+    header  magic b"SWMT", version (uint16), number of columns (uint16)
+    names   for every column, its length (uint8) and its ASCII name
+    rows    time as a float64, then a float32 per other column
+
+RTT samples go into a LatencyHistogram, HDR style: values are kept in
+buckets whose width doubles with every power of two, each power split
+into SUB_BUCKETS linear steps, so every percentile is within 1/SUB_BUCKETS
+of the truth whatever the range, in a fixed amount of memory.
+"""
+
+import csv
+import os
+import struct
+from array import array
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS  # linear steps per power of two
+MAX_VALUE_BITS = 40  # values up to 2^40 microseconds, about 12 days
+
+DEFAULT_INTERVAL = 0.1  # seconds between rows
+
+SENDER_COLUMNS = ("time", "cwnd", "in_flight", "srtt", "rto", "rtt_p50",
+                  "rtt_p99", "rtt_p999", "rtt_samples", "acked_per_sec",
+                  "bytes_per_sec", "retransmits")
+RECEIVER_COLUMNS = ("time", "packets", "in_order", "receive_window",
+                    "packets_per_sec", "file_bytes_per_sec", "drops",
+                    "acks_sent")
+
+FILE_HEADER = struct.Struct("<4sHH")
+MAGIC = b"SWMT"
+VERSION = 1
+
+
+class LatencyHistogram:
+    """
+    HDR style histogram of latencies, with microsecond resolution
+    """
+
+    def __init__(self):
+        # values below 2 * SUB_BUCKETS have a bucket each, every power of
+        # two above that has SUB_BUCKETS buckets
+        size = (MAX_VALUE_BITS - SUB_BUCKET_BITS + 1) * SUB_BUCKETS
+        self.counts = array("Q", bytes(8 * size))
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def index(micros):
+        """
+        Args: micros (int): Value in microseconds
+        Returns: Index of the value's bucket
+        """
+        if micros < 2 * SUB_BUCKETS:
+            return micros
+        shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+        return shift * SUB_BUCKETS + (micros >> shift)
+
+    @staticmethod
+    def lowest(index):
+        """
+        Args: index (int): Index of a bucket
+        Returns: Smallest value in microseconds that goes in the bucket
+        """
+        if index < 2 * SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return (index - shift * SUB_BUCKETS) << shift
+
+    def record(self, seconds):
+        """
+        Adds a value
+        Args: seconds (float): Latency to add
+        """
+        micros = min(max(0, int(seconds * 1e6)), (1 << MAX_VALUE_BITS) - 1)
+        self.counts[self.index(micros)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """
+        Args: percent (float): Percentile wanted, e.g. 99.9
+        Returns: The value in seconds that percent of the values are at
+        or below, None if the histogram is empty
+        """
+        return self.percentiles(percent)[0]
+
+    def percentiles(self, *percents):
+        """
+        Finds several percentiles in one pass over the buckets
+        Args: percents (float): Percentiles wanted, lowest first
+        Returns: List of their values in seconds, None for each if the
+        histogram is empty
+        """
+        if not self.count:
+            return [None] * len(percents)
+        ranks = [max(1, -(-self.count * percent // 100)) for percent in percents]
+        values = []
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while len(values) < len(ranks) and seen >= ranks[len(values)]:
+                # the middle of the bucket, clamped to what was recorded
+                value = (self.lowest(index) + self.lowest(index + 1) - 1) / 2e6
+                values.append(min(max(value, self.min), self.max))
+            if len(values) == len(ranks):
+                break
+        return values + [self.max] * (len(ranks) - len(values))
+
+    def mean(self):
+        """
+        Returns: Mean in seconds, None if the histogram is empty
+        """
+        return self.total / self.count if self.count else None
+
+    def reset(self):
+        """
+        Empties the histogram
+        """
+        if self.count:
+            self.counts = array("Q", bytes(8 * len(self.counts)))
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def __str__(self):
+        if not self.count:
+            return "no samples"
+        p50, p99, p999 = (value * 1000
+                          for value in self.percentiles(50, 99, 99.9))
+        return (f"p50 {p50:.2f}ms, p99 {p99:.2f}ms, p999 {p999:.2f}ms, "
+                f"max {self.max * 1000:.2f}ms, {self.count} samples")
+
+
+class MetricsRecorder:
+    """
+    Writes a row of values every interval seconds to a CSV or binary file
+    Args:
+        path (str): File to write, CSV if it ends in .csv
+        columns (tuple): Names of the values of each row, time first
+        interval (float): Seconds between rows
+    """
+
+    def __init__(self, path, columns, interval=DEFAULT_INTERVAL):
+        if interval <= 0:
+            raise ValueError("The metrics interval must be positive")
+        self.path = path
+        self.columns = columns
+        self.interval = interval
+        self.started = None  # time of the first call to due
+        self.last_sample = None
+        self.next_sample = None
+        self.previous = {}  # counters at the last row, see delta
+        self.rows = 0
+        # RTT samples of the whole run and of the current interval
+        self.rtt = LatencyHistogram()
+        self.interval_rtt = LatencyHistogram()
+        self.csv = path.endswith(".csv")
+        if self.csv:
+            self.file = open(path, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(columns)
+        else:
+            self.file = open(path, "wb")
+            self.row = row_struct(len(columns))
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, len(columns)))
+            for name in columns:
+                encoded = name.encode()
+                self.file.write(bytes((len(encoded),)) + encoded)
+
+    def due(self, now):
+        """
+        Args: now (float): Current time
+        Returns: True if a row should be written
+        """
+        if self.started is None:
+            self.started = self.last_sample = now
+            self.next_sample = now + self.interval
+        return now >= self.next_sample
+
+    def record_rtt(self, seconds):
+        """
+        Adds an RTT sample
+        Args: seconds (float): RTT sample
+        """
+        self.rtt.record(seconds)
+        self.interval_rtt.record(seconds)
+
+    def elapsed(self, now):
+        """
+        Args: now (float): Current time
+        Returns: Seconds since the last row, or since the start
+        """
+        return now - self.last_sample
+
+    def delta(self, name, value):
+        """
+        Args:
+            name (str): Name of a counter
+            value (float): Value of the counter now
+        Returns: How much the counter grew since the last row
+        """
+        grown = value - self.previous.get(name, 0)
+        self.previous[name] = value
+        return grown
+
+    def write(self, now, values):
+        """
+        Writes a row and starts the next interval
+        Args:
+            now (float): Current time
+            values (tuple): Values of every column but time, in order
+        """
+        row = (now - self.started,) + tuple(values)
+        if self.csv:
+            self.writer.writerow(f"{value:.6g}" for value in row)
+        else:
+            self.file.write(self.row.pack(*row))
+        self.rows += 1
+        self.last_sample = now
+        self.next_sample = max(self.next_sample + self.interval, now)
+        self.interval_rtt.reset()
+
+    def close(self):
+        self.file.close()
+
+    def __str__(self):
+        line = f"{self.rows} rows in {self.path}"
+        if self.rtt.count:
+            line += f", RTT {self.rtt}"
+        return line
+
+
+def load(path):
+    """
+    Reads a file written by a MetricsRecorder
+    Args: path (str): CSV or binary metrics file
+    Returns: (tuple of column names, list of rows of floats)
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            columns = tuple(next(reader))
+            return columns, [tuple(map(float, row)) for row in reader]
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f"{path} is not a metrics file")
+    magic, version, count = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} metrics file")
+    offset = FILE_HEADER.size
+    columns = []
+    for _ in range(count):
+        length = data[offset]
+        columns.append(data[offset + 1:offset + 1 + length].decode())
+        offset += 1 + length
+    row = row_struct(count)
+    # a file still being written may end in part of a row
+    end = offset + (len(data) - offset) // row.size * row.size
+    return tuple(columns), list(row.iter_unpack(data[offset:end]))
+
+
+def row_struct(columns):
+    """
+    Args: columns (int): Number of columns, time included
+    Returns: struct.Struct of a binary row
+    """
+    return struct.Struct(f"<d{columns - 1}f")
+
+
+def numbered_path(path, number):
+    """
+    Args:
+        path (str): Metrics file
+        number (int): Run or stripe the file is for
+    Returns: The path with the number before its extension, so the format
+    stays the same
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.{number}{ext}"
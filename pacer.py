@@ -0,0 +1,129 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Pacer
+"""
+Token bucket that spaces packets out over the RTT.
+Without pacing the whole window leaves in one burst, which overflows
+the queue at the bottleneck and loses packets in bursts. Tokens fill at
+the pacing rate (packets per second) and each packet sent takes one.
+The bucket holds at most one quantum of tokens, so after an idle spell
+the sender still only bursts one quantum. Packets are released a
+quantum at a time (about a millisecond of sending by default), so each
+send() call still carries many packets.
+
+The rate is either fixed or follows the congestion window:
+    rate = gain * cwnd / SRTT
+with a gain of 2 in slow start and 1.2 afterwards, as in Linux. An
+algorithm with its own pacing rate (BBR) is used as is.
+"""
+
+PACING_MODES = ("off", "cwnd", "rate")
+SLOW_START_GAIN = 2.0
+CONGESTION_AVOIDANCE_GAIN = 1.2
+
+
+class Pacer:
+    """
+    Token bucket for packets
+    Args:
+        rate (float): Packets per second, None to send without pacing
+        quantum_time (float): Seconds of sending released at once
+        min_quantum (int): Fewest packets released at once
+    """
+
+    def __init__(self, rate=None, quantum_time=0.001, min_quantum=2):
+        self.rate = rate
+        self.quantum_time = quantum_time
+        self.min_quantum = min_quantum
+        self.tokens = float(min_quantum)
+        self.last_refill = None
+
+        self.packets_paced = 0
+        self.waits = 0  # rounds cut short because the bucket ran dry
+        self.max_rate = 0.0
+
+    def set_rate(self, rate, now):
+        """
+        Changes the pacing rate. Tokens already earned are kept.
+        Args:
+            rate (float): Packets per second, None to stop pacing
+            now (float): Current time
+        """
+        self.refill(now)
+        self.rate = rate
+        if rate:
+            self.max_rate = max(self.max_rate, rate)
+
+    def quantum(self):
+        """
+        Returns: Packets released at once, and the size of the bucket
+        """
+        return max(self.min_quantum, int(self.rate * self.quantum_time))
+
+    def refill(self, now):
+        """
+        Adds the tokens earned since the last refill
+        Args: now (float): Current time
+        """
+        if self.rate and self.last_refill is not None:
+            self.tokens = min(self.tokens + (now - self.last_refill) * self.rate,
+                              float(self.quantum()))
+        self.last_refill = now
+
+    def available(self, now):
+        """
+        Args: now (float): Current time
+        Returns: Number of packets that may be sent right now
+        """
+        if not self.rate:
+            return float("inf")
+        self.refill(now)
+        return int(self.tokens)
+
+    def consume(self, count, wanted=0):
+        """
+        Takes the tokens of the packets that were sent
+        Args:
+            count (int): Packets sent
+            wanted (int): Packets that were ready to go, more than count
+            means the pacer held some back
+        """
+        if not self.rate:
+            return
+        self.tokens -= count
+        self.packets_paced += count
+        if wanted > count:
+            self.waits += 1
+
+    def time_until_ready(self, now):
+        """
+        Args: now (float): Current time
+        Returns: Seconds until a full quantum can be sent, 0 if unpaced
+        """
+        if not self.rate:
+            return 0.0
+        self.refill(now)
+        missing = self.quantum() - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def __str__(self):
+        if not self.max_rate:
+            return "off"
+        rate = f"{self.rate:.0f}" if self.rate else "-"
+        return (f"rate {rate} pkt/s (max {self.max_rate:.0f}), "
+                f"{self.packets_paced} packets paced, "
+                f"{self.waits} rounds held back")
+
+
+def cwnd_rate(cwnd, srtt, slow_start):
+    """
+    Pacing rate that sends one window per SRTT with some headroom
+    Args:
+        cwnd (float): Congestion window in packets
+        srtt (float): Smoothed RTT in seconds
+        slow_start (bool): Whether the window is still in slow start
+    Returns: Packets per second, None without an RTT estimate
+    """
+    if not srtt:
+        return None
+    gain = SLOW_START_GAIN if slow_start else CONGESTION_AVOIDANCE_GAIN
+    return gain * cwnd / srtt
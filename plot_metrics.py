@@ -0,0 +1,74 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Plot metrics
+"""
+Draws the charts of one or more metrics files written with --metrics
+(see metrics.py), one chart per column against time. Several files are
+drawn on the same charts, e.g. to compare the runs of a simulator sweep.
+matplotlib is only imported here, when a chart is drawn, so the client
+and the servers start without it.
+
+Run: python plot_metrics.py client.csv [more files] [--columns cwnd srtt]
+     [--output client.png]
+"""
+
+import argparse
+import os
+
+import metrics
+
+
+def plot(paths, columns=None, output=None):
+    """
+    Draws the charts and saves them to an image
+    Args:
+        paths (list): Metrics files, CSV or binary
+        columns (list): Columns to draw, defaults to every column of the
+        first file but time
+        output (str): Image to write, defaults to the first file's name
+        with .png
+    Returns: Path of the image written
+    """
+    import matplotlib
+    matplotlib.use("Agg")  # draw to a file, no display needed
+    import matplotlib.pyplot as plt
+
+    runs = [(path, *metrics.load(path)) for path in paths]
+    if columns is None:
+        columns = [name for name in runs[0][1] if name != "time"]
+    for path, names, _ in runs:
+        missing = [name for name in columns if name not in names]
+        if missing:
+            raise ValueError(f"{path} has no column {', '.join(missing)}")
+    figure, axes = plt.subplots(len(columns), 1, sharex=True, squeeze=False,
+                                figsize=(10, 2.5 * len(columns)))
+    for path, names, rows in runs:
+        times = [row[names.index("time")] for row in rows]
+        for axis, name in zip(axes[:, 0], columns):
+            index = names.index(name)
+            axis.plot(times, [row[index] for row in rows],
+                      label=os.path.basename(path))
+            axis.set_ylabel(name)
+    axes[-1, 0].set_xlabel("time (s)")
+    if len(runs) > 1:
+        axes[0, 0].legend()
+    figure.tight_layout()
+    if output is None:
+        output = os.path.splitext(paths[0])[0] + ".png"
+    figure.savefig(output)
+    plt.close(figure)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plots metrics files")
+    parser.add_argument("paths", nargs="+", help="metrics files")
+    parser.add_argument("--columns", nargs="+", default=None,
+                        help="columns to draw (default: all but time)")
+    parser.add_argument("--output", default=None,
+                        help="image to write (default: first file with .png)")
+    args = parser.parse_args()
+    print(f"Wrote {plot(args.paths, args.columns, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Receive window
+"""
+Fixed-capacity circular bitmap that tracks which packets the server has
+received. Sequence numbers are mapped onto the bitmap modulo its capacity,
+so memory depends on the window and not on how many packets the transfer
+has in total. Bits are stored in 64-bit words and the start of the window
+moves forward a whole word at a time when every packet in it has arrived.
+"""
+
+from array import array
+
+DEFAULT_CAPACITY = 2**18  # a few times the client's 2^16 max window
+WORD_BITS = 64
+FULL_WORD = 2**WORD_BITS - 1
+
+
+class ReceiveWindow:
+    """
+    Bitmap of received packets from win_start to win_start + capacity
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        # round up to a power of two so a slot is seq & mask
+        capacity = max(capacity, WORD_BITS)
+        self.capacity = 1 << (capacity - 1).bit_length()
+        self.mask = self.capacity - 1
+        self.words = array("Q", bytes(self.capacity // 8))
+        self.win_start = 0
+        self.highest = -1  # highest sequence number marked so far
+
+    def in_window(self, seq_num):
+        """
+        Checks whether a sequence number has a slot in the bitmap
+        Args: seq_num (int): Sequence number of the packet
+        Returns: True if the packet can be marked
+        """
+        return 0 <= seq_num - self.win_start < self.capacity
+
+    def mark(self, seq_num):
+        """
+        Marks a packet as received
+        Args: seq_num (int): Sequence number of the packet
+        Returns: False if the packet is too far past win_start to be
+        buffered, True otherwise (including duplicates)
+        """
+        offset = seq_num - self.win_start
+        if offset < 0:
+            return True
+        if offset >= self.capacity:
+            return False
+        slot = seq_num & self.mask
+        self.words[slot >> 6] |= 1 << (slot & 63)
+        if seq_num > self.highest:
+            self.highest = seq_num
+        return True
+
+    def is_received(self, seq_num):
+        """
+        Checks whether a packet has been received
+        Args: seq_num (int): Sequence number of the packet
+        Returns: True if the packet has been received
+        """
+        if seq_num < self.win_start:
+            return True
+        if seq_num - self.win_start >= self.capacity:
+            return False
+        slot = seq_num & self.mask
+        return bool(self.words[slot >> 6] >> (slot & 63) & 1)
+
+    def __getitem__(self, seq_num):
+        return self.is_received(seq_num)
+
+    def advance(self):
+        """
+        Moves win_start past every packet received in order and clears
+        their bits so the slots can be reused
+        Returns: The new win_start
+        """
+        words = self.words
+        mask = self.mask
+        start = self.win_start
+        while True:
+            index = (start & mask) >> 6
+            offset = start & 63
+            word = words[index] >> offset
+            if word == FULL_WORD >> offset:
+                # every packet left in this word has arrived
+                words[index] &= (1 << offset) - 1
+                start += WORD_BITS - offset
+                continue
+            # count the trailing ones
+            run = ((~word) & (word + 1)).bit_length() - 1
+            if run:
+                words[index] &= ~(((1 << run) - 1) << offset) & FULL_WORD
+                start += run
+            break
+        self.win_start = start
+        return start
+
+    def received_ranges(self, max_ranges):
+        """
+        Finds the runs of received packets past win_start (SACK blocks)
+        Args: max_ranges (int): Most ranges to return
+        Returns: List of (start, end) ranges, end exclusive, lowest first
+        """
+        words = self.words
+        mask = self.mask
+        ranges = []
+        seq_num = self.win_start
+        end = self.highest + 1
+        run_start = None
+        while seq_num < end and len(ranges) < max_ranges:
+            slot = seq_num & mask
+            offset = slot & 63
+            bits = min(WORD_BITS - offset, end - seq_num)
+            all_bits = (1 << bits) - 1
+            word = (words[slot >> 6] >> offset) & all_bits
+            if run_start is None:
+                if not word:
+                    seq_num += bits
+                    continue
+                # skip the trailing zeros to the start of the run
+                seq_num += (word & -word).bit_length() - 1
+                run_start = seq_num
+            elif word == all_bits:
+                seq_num += bits
+            else:
+                # count the trailing ones to the end of the run
+                seq_num += ((~word) & (word + 1)).bit_length() - 1
+                ranges.append((run_start, seq_num))
+                run_start = None
+        if run_start is not None and len(ranges) < max_ranges:
+            ranges.append((run_start, end))
+        return ranges
@@ -0,0 +1,564 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Receiver session
+"""
+Receive side of one Selective Repeat connection.
+ReceiverSession holds everything the server keeps per client: the wire
+format, the frame parser, the receive windows, the ACK state and the
+statistics. It does no socket I/O itself. Bytes go in through
+session.parser and the ACKs to send come back as bytes, so the same
+logic runs under the blocking Server, under the asyncio server and in
+the simulator (simulator.py), which also replaces the clock.
+When the client sends a file and an output path is set, each segment is
+written straight to its offset in a memory-mapped output file.
+
+A connection can carry several streams (see send_stream.py). Each one
+gets a ReceiveStream with its own receive window, cumulative ACK and
+FIN; a stream is opened by its first packet. The client says in the
+handshake how many streams it keeps open at once and the budget below
+is split evenly between them. The file, if any, is sent on stream 0.
+
+A connection can also be one stripe of a striped transfer (see
+striping.py). Sessions given the same transfers dict put the stripes of
+a transfer back together in one output file.
+
+Flow control: the session holds at most recv_budget bytes for its
+client. Packets take up room from the moment they arrive until the
+application has read them in order, so the receive window advertised in
+every SACK is
+    window = consumed + budget_packets - win_start
+where consumed is how far the application has read. Packets past the
+window are dropped and answered with an ACK right away, which is how the
+client's zero-window probes learn that the window opened again. By
+default the application reads everything as soon as it is in order, so
+the window only closes when read_rate (packets per second) is set lower
+than the client sends. ASCII ACKs have no room for a window, so an ASCII
+client is not told about it and only sees the drops.
+
+Nothing is printed per packet. With a tracer, packets received, dropped
+and ACKed are recorded as typed events instead (see tracing.py), and
+with a MetricsRecorder a row of counters and rates is written at a
+fixed interval (see metrics.py).
+"""
+
+import time
+
+import wire_format
+from ack_policy import AckPolicy
+from file_transfer import FileSink
+from frame_parser import FrameParser, DEFAULT_BUFFER_SIZE
+from receive_window import ReceiveWindow, DEFAULT_CAPACITY
+from send_stream import MAX_STREAMS
+from striping import join_stripe
+from tracing import (EVENTS, PACKETS, ADVANCE, RECEIVE, DUPLICATE, DROP,
+                     ACK_SENT, DROP_WINDOW, DROP_BUFFER, DROP_STREAM, hook)
+
+DEFAULT_RECV_BUDGET = 2**23  # bytes of buffered packets per client
+MAX_WIN_SIZE = 2**16  # packets of the window until the handshake sizes it
+# seconds to wait for the end of an offer sent without one (older clients)
+OFFER_GRACE = 0.1
+
+
+class ReceiveStream:
+    """
+    Receive window and ACK state of one stream
+    Args:
+        stream_id (int): Id carried in every frame of the stream
+        budget_packets (int): Packets the stream may hold
+    """
+
+    def __init__(self, stream_id, budget_packets):
+        self.stream_id = stream_id
+        self.win_start = 0
+        # circular bitmap of received packets, one slot per packet of budget
+        self.packet_buffer = ReceiveWindow(budget_packets)
+        self.budget_packets = budget_packets
+        self.win_size = budget_packets  # receive window last advertised
+        self.consumed = 0  # packets the application has read
+        self.read_credit = 0.0
+        self.last_read = None
+        self.ack_pending = False  # packets arrived since the last ACK
+        self.acks_pending = []  # packets to ACK one by one in ASCII
+        self.duplicates = 0  # duplicate packets since the last ACK
+        self.fin = False
+        self.fin_pending = False  # a FIN arrived that has not been ACKed yet
+
+
+class ReceiverSession:
+    """
+    Receive windows, ACK state and stats of one connection
+    """
+
+    def __init__(self, recv_buffer_size=DEFAULT_BUFFER_SIZE,
+                 buffer_capacity=DEFAULT_CAPACITY, ack_policy=None,
+                 max_sack_blocks=64, output_path=None,
+                 recv_budget=DEFAULT_RECV_BUDGET, read_rate=None,
+                 transfers=None, clock=time.time, tracer=None, metrics=None):
+        # every timer reads this clock, the simulator passes a virtual one
+        self.clock = clock
+        # structured trace (see tracing.py), a hook is None below its level
+        self.tracer = tracer
+        self.trace = hook(tracer, EVENTS)
+        self.trace_packets = hook(tracer, PACKETS)
+        # time series of the connection, a MetricsRecorder or None
+        self.metrics = metrics
+        self.pkt_counter = 0
+        # one receive window per stream, opened by its first packet
+        self.streams = {}
+        self.max_streams = 1  # streams open at once, from the handshake
+        self.buffer_capacity = buffer_capacity
+
+        # flow control: packets of a stream that fit in the budget, set
+        # once the handshake says how big a packet is
+        self.recv_budget = recv_budget
+        self.budget_packets = min(buffer_capacity, MAX_WIN_SIZE)
+        self.read_rate = read_rate  # None reads packets as soon as they are in order
+        self.window_drops = 0  # packets dropped past the receive window
+        self.zero_windows = 0  # ACKs sent with a zero window
+        self.stream_drops = 0  # packets of streams past max_streams
+
+        # Wire formats the server accepts in the handshake
+        self.wire_formats = wire_format.SUPPORTED_FORMATS
+        self.codec = wire_format.get_codec("ascii")
+        self.parser = FrameParser(self.codec, recv_buffer_size)
+        self.offer = b""  # start of a handshake offer split across reads
+
+        # ACKs are coalesced into a cumulative ACK plus SACK blocks
+        self.ack_policy = ack_policy if ack_policy else AckPolicy()
+        self.max_sack_blocks = max_sack_blocks
+        self.acks_sent = 0
+
+        self.fin = False  # every stream opened so far is done
+        self.fin_pending = False  # a FIN arrived that has not been ACKed yet
+
+        # file being received, opened when the client's offer says its size
+        self.output_path = output_path
+        self.sink = None
+        self.expected_checksum = None
+        self.bytes_received = 0
+        # striped transfers in progress, shared with the other sessions of
+        # the server. None if the server does not take striped transfers.
+        self.transfers = transfers
+        self.stripe = None  # the stripe this connection carries
+
+        self.start = 0
+
+    def receive_offer(self, data, complete=False):
+        """
+        Collects the client's handshake offer, which a stream transport
+        may deliver over several reads, and accepts it once it is whole.
+        Bytes after the offer are the first packets and go to the parser.
+        Args:
+            data (bytes-like): Bytes received since the last call
+            complete (bool): Take what has arrived as the whole offer,
+            for an offer that has no end marker
+        Returns: bytes of the handshake reply, or None while the offer is
+        still coming
+        """
+        self.offer += bytes(data)
+        found = wire_format.split_offer(self.offer)
+        if found is None:
+            if not complete and len(self.offer) < wire_format.MAX_OFFER_SIZE:
+                return None
+            found = self.offer, b""
+        offer, rest = found
+        self.offer = b""
+        reply = self.accept_offer(offer)
+        if rest:
+            self.parser.feed(rest)
+        return reply
+
+    def accept_offer(self, offer):
+        """
+        Picks the wire format from the client's handshake message
+        Args: offer (bytes): Handshake message from the client
+        Returns: bytes of the handshake reply to send back
+        """
+        offer = bytes(offer).rstrip(wire_format.OFFER_END)
+        print(f"From Client: {offer.decode()}")
+        self.codec = wire_format.get_codec(
+            wire_format.parse_offer(offer, self.wire_formats))
+        print(f"Wire format: {self.codec.name}")
+        self.parser.codec = self.codec
+        options = wire_format.parse_options(offer)
+        reply_options = {}
+        if "transfer" in options and self.transfers is not None:
+            self.stripe = join_stripe(
+                self.transfers, options,
+                self.output_path if self.codec.supports_payload else None)
+            if self.stripe is not None:
+                self.stripe.session = self
+                reply_options["stripe"] = self.stripe.index
+                if self.stripe.transfer.sink is not None:
+                    # segments go to their offset in the whole file
+                    self.sink = self.stripe
+                print(f"Stripe {self.stripe.index} of transfer "
+                      f"{self.stripe.transfer.transfer_id}")
+        elif "size" in options and self.output_path and \
+                self.codec.supports_payload:
+            self.sink = FileSink(self.output_path, int(options["size"]),
+                                 int(options["segment"]))
+            self.expected_checksum = options.get("checksum")
+            print(f"Receiving {self.sink.size} bytes into {self.output_path}")
+        if "streams" in options and self.codec.supports_streams:
+            self.max_streams = max(1, min(int(options["streams"]), MAX_STREAMS))
+            reply_options["streams"] = self.max_streams
+        # a packet costs its frame, plus its segment when a file is sent
+        packet_size = self.codec.max_frame_size + int(options.get("segment", 0))
+        self.budget_packets = max(1, min(
+            self.recv_budget // self.max_streams // packet_size,
+            self.buffer_capacity))
+        print(f"Receive window: {self.budget_packets} packets "
+              f"({self.recv_budget} byte budget, {self.max_streams} streams)")
+        self.start = self.clock()
+        return wire_format.handshake_accept(self.codec.name, **reply_options)
+
+    def get_stream(self, stream_id):
+        """
+        Finds a stream, opening it on its first packet
+        Args: stream_id (int): Id of the stream
+        Returns: The ReceiveStream, None if max_streams are already open
+        """
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            open_streams = sum(not other.fin for other in self.streams.values())
+            if open_streams >= self.max_streams:
+                self.stream_drops += 1
+                return None
+            stream = self.streams[stream_id] = ReceiveStream(
+                stream_id, self.budget_packets)
+        return stream
+
+    def win_end(self, stream=None):
+        """
+        Returns window end
+        Args: stream (ReceiveStream): Stream to check, defaults to stream 0
+        Returns:
+            int: End index of window
+        """
+        if stream is None:
+            stream = self.get_stream(0)
+        return stream.win_start + stream.win_size - 1
+
+    def read(self, stream, now):
+        """
+        Lets the application read the packets received in order. Without
+        a read_rate everything in order is read at once.
+        Args:
+            stream (ReceiveStream): Stream to read
+            now (float): Current time
+        """
+        if self.read_rate is None:
+            stream.consumed = stream.win_start
+            return
+        if stream.last_read is not None:
+            stream.read_credit += (now - stream.last_read) * self.read_rate
+        stream.last_read = now
+        count = min(int(stream.read_credit), stream.win_start - stream.consumed)
+        stream.consumed += count
+        stream.read_credit -= count
+        if stream.consumed == stream.win_start:
+            # an idle reader does not save up reads
+            stream.read_credit = min(stream.read_credit, 1.0)
+
+    def receive_window(self, stream, now):
+        """
+        Args:
+            stream (ReceiveStream): Stream to check
+            now (float): Current time
+        Returns: Packets past win_start the stream can still take
+        """
+        self.read(stream, now)
+        return max(0, stream.consumed + stream.budget_packets - stream.win_start)
+
+    def window_update_due(self, now, stream=None):
+        """
+        A window that closed because the application read slowly is
+        advertised again once it has opened by half the budget, without
+        waiting for the client to probe
+        Args:
+            now (float): Current time
+            stream (ReceiveStream): Stream to check, defaults to all of them
+        Returns: True if an ACK should be sent for the window alone
+        """
+        if not self.codec.supports_sack:
+            return False
+        if stream is None:
+            return any(self.window_update_due(now, other)
+                       for other in self.streams.values())
+        if stream.fin or stream.win_size >= stream.budget_packets:
+            return False
+        opened = self.receive_window(stream, now) - stream.win_size
+        return opened >= max(1, stream.budget_packets // 2)
+
+    def time_until_window_update(self, now):
+        """
+        Args: now (float): Current time
+        Returns: Seconds until the application has read enough for a
+        window update, or None if none is coming
+        """
+        if self.read_rate is None or not self.codec.supports_sack:
+            return None
+        timeouts = []
+        for stream in self.streams.values():
+            if stream.fin or stream.win_size >= stream.budget_packets:
+                continue
+            self.read(stream, now)
+            wanted = stream.win_size + max(1, stream.budget_packets // 2) \
+                - (stream.consumed + stream.budget_packets - stream.win_start)
+            if stream.consumed + wanted > stream.win_start:
+                # not enough has arrived in order to open the window that far
+                continue
+            timeouts.append(max(0.0, (wanted - stream.read_credit)
+                                / self.read_rate))
+        return min(timeouts) if timeouts else None
+
+    def time_until_reply(self, now):
+        """
+        Args: now (float): Current time
+        Returns: Seconds until an ACK or a window update is due, or None
+        """
+        timeouts = [t for t in (self.ack_policy.time_until_due(now),
+                                self.time_until_window_update(now))
+                    if t is not None]
+        return min(timeouts) if timeouts else None
+
+    def update_win_size(self, stream=None):
+        """
+        Moves the start of the window past the packets received in order.
+        Their slots in the buffer are freed for packets further ahead.
+        Updates: start of window
+        Assumption: window size on server side doesn't need to
+        follow AIMD because we can't assume client's loss
+        Args: stream (ReceiveStream): Stream of the packet just received,
+        defaults to stream 0
+        """
+        if stream is None:
+            stream = self.get_stream(0)
+        # update the start of the window
+        old_win_start = stream.win_start
+        stream.win_start = stream.packet_buffer.advance()
+        if stream.win_start != old_win_start and self.trace_packets:
+            self.trace_packets(ADVANCE, stream.stream_id, stream.win_start)
+
+    def mark_packet_received(self, seq_num, stream=None):
+        """
+        Marks the packet received
+        Args:
+            seq_num (int): Sequence number of the packet
+            stream (ReceiveStream): Stream of the packet, defaults to stream 0
+        Returns:
+            bool: False if the packet is too far ahead of the window to be
+            buffered. It is dropped and will be resent by the client.
+            Duplicates return True so that they are ACKed again.
+        """
+        if stream is None:
+            stream = self.get_stream(0)
+        if stream.packet_buffer.is_received(seq_num):
+            if self.trace_packets:
+                self.trace_packets(DUPLICATE, stream.stream_id, seq_num)
+            stream.duplicates += 1
+            return True
+        if seq_num >= stream.consumed + stream.budget_packets:
+            if self.trace:
+                self.trace(DROP, stream.stream_id, seq_num, DROP_WINDOW)
+            self.window_drops += 1
+            return False
+        # Mark the received packet in the buffer as received
+        if not stream.packet_buffer.mark(seq_num):
+            if self.trace:
+                self.trace(DROP, stream.stream_id, seq_num, DROP_BUFFER)
+            return False
+        if self.trace_packets:
+            self.trace_packets(RECEIVE, stream.stream_id, seq_num)
+        return True
+
+    def receive_packets(self):
+        """
+        Parses the packets. Packets can be received in a concatenated order
+        and must be separated for the packets to be processed individually.
+        A packet cut off at the end of the last read stays in the parser
+        until the rest of it arrives.
+        Returns: List of (stream, sequence number) of the packets received
+        """
+        pkt_received = []
+        sink = self.sink
+        streams = self.streams
+        for kind, stream_id, seq, payload in self.parser.frames():
+            stream = streams.get(stream_id) or self.get_stream(stream_id)
+            if stream is None:
+                # over the limit of streams open at once
+                if self.trace:
+                    self.trace(DROP, stream_id, seq, DROP_STREAM)
+                continue
+            if kind == wire_format.KIND_FIN:
+                stream.fin = True
+                stream.fin_pending = True
+                self.fin_pending = True
+            elif kind == wire_format.KIND_DATA:
+                pkt_received.append((stream, seq))
+                # the payload points into the parser's buffer, so it is
+                # written out now; packets past the window will be sent again
+                if sink is not None and len(payload) and not stream_id and \
+                        stream.packet_buffer.in_window(seq) and \
+                        seq < stream.consumed + stream.budget_packets:
+                    if sink.write(seq, payload):
+                        self.bytes_received += len(payload)
+        self.fin = bool(self.streams) and \
+            all(stream.fin for stream in self.streams.values())
+        self.pkt_counter += len(pkt_received)
+        return pkt_received
+
+    def process_packets(self):
+        """
+        Marks every packet in the parser as received and queues its ACK
+        """
+        ack = self.receive_packets()
+        now = self.clock()
+        for stream in self.streams.values():
+            self.read(stream, now)
+        for stream, i in ack:
+            out_of_order = i != stream.win_start
+            if self.mark_packet_received(i, stream):
+                self.update_win_size(stream)
+                self.queue_ack(stream, i, out_of_order)
+            elif self.codec.supports_sack:
+                # a zero-window probe or a packet sent past the window,
+                # tell the client about the window right away
+                stream.ack_pending = True
+                self.ack_policy.on_packet(now, True)
+        if self.metrics is not None and self.metrics.due(now):
+            self.sample_metrics(now)
+
+    def sample_metrics(self, now):
+        """
+        Writes a row of metrics, see metrics.RECEIVER_COLUMNS
+        Args: now (float): Current time
+        """
+        metrics = self.metrics
+        elapsed = metrics.elapsed(now)
+        per_sec = 1 / elapsed if elapsed > 0 else 0.0
+        streams = self.streams.values()
+        metrics.write(now, (
+            self.pkt_counter,
+            sum(stream.win_start for stream in streams),
+            sum(stream.win_size for stream in streams if not stream.fin),
+            metrics.delta("packets", self.pkt_counter) * per_sec,
+            metrics.delta("bytes", self.bytes_received) * per_sec,
+            metrics.delta("drops", self.window_drops + self.stream_drops),
+            metrics.delta("acks", self.acks_sent)))
+
+    def queue_ack(self, stream, seq_num, out_of_order):
+        """
+        Records a packet that needs to be ACKed. The ACK is built by
+        build_acks once the ACK policy says one is due.
+        Args:
+            stream (ReceiveStream): Stream of the packet
+            seq_num (int): Sequence number of the packet
+            out_of_order (bool): True if it was not the next expected packet
+        """
+        self.ack_policy.on_packet(self.clock(), out_of_order)
+        stream.ack_pending = True
+        if not self.codec.supports_sack:
+            stream.acks_pending.append(seq_num)
+
+    def build_acks(self):
+        """
+        Builds one cumulative ACK with SACK blocks per stream for every
+        packet queued since the last ACK, and for every stream whose
+        window opened again. ASCII has no SACK frame so each packet is
+        ACKed on its own.
+        Returns: bytes to send, empty if nothing is waiting for an ACK
+        """
+        now = self.clock()
+        due = [stream for stream in self.streams.values()
+               if stream.ack_pending or self.window_update_due(now, stream)]
+        if not due:
+            return b""
+        messages = []
+        for stream in due:
+            if self.codec.supports_sack:
+                blocks = stream.packet_buffer.received_ranges(
+                    self.max_sack_blocks)
+                stream.win_size = self.receive_window(stream, now)
+                if not stream.win_size:
+                    self.zero_windows += 1
+                if self.trace_packets:
+                    self.trace_packets(ACK_SENT, stream.stream_id,
+                                       stream.win_start, stream.win_size)
+                messages.append(self.codec.encode_sack(
+                    stream.win_start, blocks, stream.duplicates,
+                    stream.win_size, stream.stream_id))
+            else:
+                if self.trace_packets:
+                    self.trace_packets(ACK_SENT, stream.stream_id,
+                                       stream.win_start, 0)
+                messages.extend(self.codec.encode_ack(i)
+                                for i in stream.acks_pending)
+                stream.acks_pending = []
+            stream.ack_pending = False
+            stream.duplicates = 0
+            self.acks_sent += 1
+        self.ack_policy.reset()
+        return b"".join(messages)
+
+    def build_fin(self):
+        """
+        Builds the FIN ACK of every stream the client is done sending on
+        Returns: bytes to send
+        """
+        messages = []
+        for stream in self.streams.values():
+            if stream.fin_pending:
+                messages.append(self.codec.encode_fin(stream.stream_id))
+                stream.fin_pending = False
+        self.fin_pending = False
+        return b"".join(messages)
+
+    def finish(self):
+        """
+        Closes the output file and checks it against the client's checksum
+        A stripe reports to its transfer instead, which checks the file
+        once every stripe has ended.
+        Returns: A line describing the result, None if no file was received
+        """
+        if self.stripe is not None:
+            result = self.stripe.finish()
+            if self.stripe.transfer.ended():
+                self.transfers.pop(self.stripe.transfer.transfer_id, None)
+            self.stripe = None
+            self.sink = None
+            return result
+        if self.sink is None:
+            return None
+        elapsed = self.clock() - self.start
+        stream = self.streams.get(0)
+        complete = stream is not None and \
+            stream.win_start >= self.sink.total_segments
+        digest = self.sink.checksum()
+        self.sink.close()
+        self.sink = None
+        if not complete:
+            result = "INCOMPLETE"
+        elif self.expected_checksum is None:
+            result = "not checked"
+        elif digest == self.expected_checksum:
+            result = "OK"
+        else:
+            result = "MISMATCH"
+        rate = self.bytes_received / elapsed if elapsed > 0 else 0.0
+        return (f"File {self.output_path}: {self.bytes_received} bytes in "
+                f"{elapsed:.3f}s ({rate:.0f} bytes/sec), "
+                f"sha256 {digest}, checksum {result}")
+
+    def replies(self, now):
+        """
+        Collects everything that should be sent back right now: the ACKs
+        if the ACK policy says they are due, and the FIN ACK if a FIN came in
+        Args: now (float): Current time
+        Returns: bytes to send, possibly empty
+        """
+        if self.fin_pending:
+            return self.build_acks() + self.build_fin()
+        if self.ack_policy.due(now) or self.window_update_due(now):
+            return self.build_acks()
+        return b""
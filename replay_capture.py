@@ -0,0 +1,247 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Replay capture
+"""
+Replays a capture of the client (see wire_capture.py) against a server,
+so the server's receive path (receive_packets, mark_packet_received,
+update_win_size) can be profiled on the arrival pattern of a real
+transfer, without running the client or doing its work. The replay
+sends the recorded handshake offer, waits for the reply and then sends
+every recorded chunk of bytes
+    --speed 1    at the pace they were captured (the default)
+    --speed N    N times faster
+    --speed 0    as fast as possible
+The ACKs of the server are read and counted but do not change anything,
+the replay ends at the server's FIN ACK, or --linger seconds after the
+last send if none comes. Replays run over TCP. Captures over UDP replay
+over TCP too, the bytes are the same frames.
+
+To profile the server, run it under cProfile and replay against it:
+    python -m cProfile -o server.prof server_Sophia_Sorensen_Channon_Zuo.py
+        --host 127.0.0.1 --port 12344
+
+Run: python replay_capture.py client.wire [--host 127.0.0.1] [--port 12344]
+     [--speed 1] [--linger 5] [--start-server]
+"""
+
+import argparse
+import os
+import select
+import socket
+import tempfile
+import time
+
+import wire_format
+from bench_transfer import HOST, free_port, start, wait_for, reap, tail
+from wire_capture import OFFER, REPLY, SEND, load, wire_format_of
+
+DEFAULT_LINGER = 5.0  # seconds to wait for the FIN ACK after the last send
+READ_SIZE = 2**16
+
+
+class Replay:
+    """
+    Sends the records of a capture over one connection
+    Args:
+        records (list): Records of the capture, see wire_capture.load
+        speed (float): How many times faster than captured, 0 for as
+        fast as possible
+        linger (float): Seconds to wait for the FIN ACK after the last send
+        clock (function): Returns the current time in seconds
+    """
+
+    def __init__(self, records, speed=1.0, linger=DEFAULT_LINGER,
+                 clock=time.monotonic):
+        if speed < 0:
+            raise ValueError("The replay speed cannot be negative")
+        self.offer = next(data for _, kind, data in records if kind == OFFER)
+        self.format = wire_format_of(records)
+        self.reply_time = next(when for when, kind, _ in records
+                               if kind == REPLY)
+        self.sends = [(when, data) for when, kind, data in records
+                      if kind == SEND]
+        self.speed = speed
+        self.linger = linger
+        self.clock = clock
+        self.sock = None
+        self.codec = None
+        self.pending = b""  # start of a frame split across reads
+
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.acks = 0
+        self.fin_acked = False
+        self.closed = False
+        self.max_late = 0.0
+        self.elapsed = 0.0
+
+    def connect(self, address):
+        """
+        Opens the connection and replays the handshake
+        Args: address (tuple): (host, port) of the server
+        """
+        self.sock = socket.create_connection(address)
+        self.sock.sendall(self.offer)
+        reply = self.sock.recv(1024)
+        if not reply:
+            raise ConnectionError("Server closed the connection")
+        name = wire_format.parse_accept(reply)
+        if name != self.format:
+            raise ValueError(f"The server picked {name}, the capture is in "
+                             f"{self.format}")
+        self.codec = wire_format.get_codec(name, wire_format.KIND_ACK)
+        # sends and reads are interleaved so a full socket never stalls both
+        self.sock.setblocking(False)
+
+    def run(self):
+        """
+        Sends every recorded chunk on time and waits for the FIN ACK.
+        The time taken runs to the FIN ACK, or to the last send without one.
+        """
+        start = self.clock()
+        for when, data in self.sends:
+            if self.speed:
+                due = start + (when - self.reply_time) / self.speed
+                self.wait(due)
+                self.max_late = max(self.max_late, self.clock() - due)
+            self.send(data)
+        last_send = self.clock()
+        if self.wait(last_send + self.linger):
+            # the server has taken every packet
+            last_send = self.clock()
+        self.elapsed = last_send - start
+
+    def wait(self, until):
+        """
+        Reads what the server sends until a time
+        Args: until (float): Clock time to stop at
+        Returns: False if the time came, True if the FIN ACK came or the
+        server closed the connection first
+        """
+        while not self.fin_acked and not self.closed:
+            timeout = until - self.clock()
+            if timeout <= 0:
+                return False
+            readable, _, _ = select.select([self.sock], [], [], timeout)
+            if readable:
+                self.read()
+        return True
+
+    def send(self, data):
+        """
+        Sends a chunk, reading the server's ACKs whenever the socket is full
+        Args: data (bytes): The chunk
+        """
+        view = memoryview(data)
+        while view:
+            readable, writable, _ = select.select([self.sock], [self.sock],
+                                                  [])
+            if readable:
+                self.read()
+            if writable:
+                try:
+                    sent = self.sock.send(view)
+                except BlockingIOError:
+                    continue
+                view = view[sent:]
+                self.bytes_sent += sent
+
+    def read(self):
+        """
+        Reads and counts the server's ACKs, noting its FIN ACK
+        """
+        try:
+            data = self.sock.recv(READ_SIZE)
+        except BlockingIOError:
+            return
+        if not data:
+            self.closed = True
+            return
+        self.bytes_received += len(data)
+        data = self.pending + data
+        frames, consumed = self.codec.decode(data)
+        for kind, _, _, _ in frames:
+            if kind == wire_format.KIND_FIN:
+                self.fin_acked = True
+            else:
+                self.acks += 1
+        self.pending = bytes(data[consumed:])
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+
+    def captured_time(self):
+        """
+        Returns: Seconds from the handshake reply to the last send, as
+        captured
+        """
+        if not self.sends:
+            return 0.0
+        return self.sends[-1][0] - self.reply_time
+
+    def __str__(self):
+        captured = self.captured_time()
+        line = (f"{len(self.sends)} sends, {self.bytes_sent} bytes in "
+                f"{self.elapsed:.3f}s (captured in {captured:.3f}s, "
+                f"{captured / max(self.elapsed, 1e-9):.1f}x), "
+                f"{self.bytes_sent / max(self.elapsed, 1e-9):.0f} bytes/sec, "
+                f"{self.acks} ACK frames")
+        if self.speed:
+            line += f", late by up to {self.max_late * 1000:.2f}ms"
+        if self.fin_acked:
+            line += ", FIN ACKed"
+        elif self.closed:
+            line += ", server closed the connection"
+        else:
+            line += ", no FIN ACK"
+        return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays a wire capture against a server")
+    parser.add_argument("path", help="capture file written by the client's "
+                                     "--capture")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=12344)
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="times faster than captured, 0 for as fast as "
+                             "possible")
+    parser.add_argument("--linger", type=float, default=DEFAULT_LINGER,
+                        help="seconds to wait for the FIN ACK after the "
+                             "last send")
+    parser.add_argument("--start-server", action="store_true",
+                        help="start server_Sophia_Sorensen_Channon_Zuo.py "
+                             "on a free port and show its stats")
+    args = parser.parse_args()
+
+    transport, records = load(args.path)
+    replay = Replay(records, args.speed, args.linger)
+    print(f"Replaying {args.path}: {transport} capture, {replay.format}, "
+          f"{len(replay.sends)} sends")
+
+    server = None
+    if args.start_server:
+        args.host, args.port = HOST, free_port()
+        log_path = os.path.join(tempfile.mkdtemp(prefix="replay_"),
+                                "server.log")
+        server = start("server_Sophia_Sorensen_Channon_Zuo.py",
+                       ["--host", args.host, "--port", str(args.port)],
+                       log_path)
+        if not wait_for(server, log_path, "Listening on"):
+            print(tail(log_path))
+            raise SystemExit("The server did not start")
+    try:
+        replay.connect((args.host, args.port))
+        replay.run()
+    finally:
+        replay.close()
+        if server is not None:
+            reap(server, 10.0)
+    print(f"Replay: {replay}")
+    if server is not None:
+        print(f"Server log ({log_path}):")
+        print(tail(log_path, 8))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Retransmission timer
+"""
+Retransmission timers for the packets in flight.
+Every sent packet gets a deadline on a min-heap. An ACK cancels the
+timer in O(1) by forgetting the packet's deadline; its heap entry is left
+behind and skipped when it reaches the top (lazy deletion). Checking for
+timeouts only looks at the deadlines that have passed, so it costs the
+number of losses and not the size of the window.
+A deadline is checked again when it is reached: expired is given the
+current RTO, and a packet sent less than that long ago is pushed back to
+its send time plus the RTO. A backed off RTO so stretches the timers
+already running, without touching the rest of the heap.
+"""
+
+import heapq
+
+
+class RetransmitTimer:
+    """
+    Min-heap of (deadline, sequence number) with lazy deletion
+    """
+
+    def __init__(self):
+        self.heap = []
+        # live timers: sequence number -> (deadline, time it was sent)
+        self.deadlines = {}
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, seq_num):
+        return seq_num in self.deadlines
+
+    def schedule(self, seq_num, sent_time, timeout):
+        """
+        Starts (or restarts) the timer for a packet
+        Args:
+            seq_num (int): Sequence number of the packet
+            sent_time (float): Time the packet was sent
+            timeout (float): Seconds after sent_time the packet times out,
+            the RTO when it was sent
+        """
+        deadline = sent_time + timeout
+        self.deadlines[seq_num] = (deadline, sent_time)
+        heapq.heappush(self.heap, (deadline, seq_num))
+        # drop stale entries once they make up most of the heap
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self.compact()
+
+    def cancel(self, seq_num):
+        """
+        Stops the timer for a packet
+        Args: seq_num (int): Sequence number of the packet
+        Returns: True if the packet had a timer running
+        """
+        return self.deadlines.pop(seq_num, None) is not None
+
+    def compact(self):
+        """
+        Rebuilds the heap from the live timers only
+        """
+        self.heap = [(deadline, seq_num)
+                     for seq_num, (deadline, _) in self.deadlines.items()]
+        heapq.heapify(self.heap)
+
+    def next_deadline(self):
+        """
+        Returns: The earliest live deadline, or None if no timer is running
+        """
+        heap = self.heap
+        deadlines = self.deadlines
+        while heap:
+            deadline, seq_num = heap[0]
+            live = deadlines.get(seq_num)
+            if live is not None and live[0] == deadline:
+                return deadline
+            heapq.heappop(heap)
+        return None
+
+    def expired(self, now, timeout=None):
+        """
+        Removes and returns the packets whose deadline has passed
+        Args:
+            now (float): Current time
+            timeout (float): Current RTO. A packet sent less than this
+            long ago has its timer moved to its send time plus timeout
+            instead of timing out. None keeps every deadline as scheduled.
+        Returns: List of sequence numbers that timed out, earliest first
+        """
+        heap = self.heap
+        deadlines = self.deadlines
+        timed_out = []
+        while heap and heap[0][0] <= now:
+            deadline, seq_num = heapq.heappop(heap)
+            live = deadlines.get(seq_num)
+            if live is None or live[0] != deadline:
+                continue
+            if timeout is not None and live[1] + timeout > now:
+                # the RTO was backed off since the packet was sent
+                deadline = live[1] + timeout
+                deadlines[seq_num] = (deadline, live[1])
+                heapq.heappush(heap, (deadline, seq_num))
+                continue
+            del deadlines[seq_num]
+            timed_out.append(seq_num)
+        return timed_out
@@ -0,0 +1,91 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# RTT estimator
+"""
+Retransmission timeout (RTO) estimation following RFC 6298.
+SRTT and RTTVAR are smoothed from every valid RTT sample and the RTO is
+SRTT + 4 * RTTVAR, kept between a minimum and maximum. Each timeout
+doubles the RTO until a new valid sample arrives.
+
+Karn's algorithm: an ACK for a packet that was sent more than once does
+not say which copy it acknowledges, so it is not used as a sample.
+The server ACKs every copy it receives, so a second ACK for the same
+packet means a retransmit was not needed and it is counted as spurious.
+"""
+
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+
+
+class RttEstimator:
+    """
+    Smoothed RTT, RTT variance and RTO with exponential backoff
+    """
+
+    def __init__(self, initial_rto=1.0, min_rto=0.2, max_rto=60.0,
+                 granularity=0.001):
+        if not 0 < min_rto <= max_rto:
+            raise ValueError("min_rto must be positive and at most max_rto")
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.granularity = granularity  # clock granularity G in RFC 6298
+        self.srtt = None
+        self.rttvar = None
+        self.min_rtt = float("inf")
+        self.rto = min(max(initial_rto, min_rto), max_rto)
+
+        self.samples = 0
+        self.karn_skipped = 0
+        self.timeouts = 0
+        self.spurious_retransmits = 0
+
+    def on_sample(self, rtt):
+        """
+        Updates SRTT, RTTVAR and the RTO with a valid RTT sample
+        Args: rtt (float): Seconds between sending a packet and its ACK
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+        self.min_rtt = min(self.min_rtt, rtt)
+        self.samples += 1
+        rto = self.srtt + max(self.granularity, K * self.rttvar)
+        self.rto = min(max(rto, self.min_rto), self.max_rto)
+
+    def on_ack(self, time_since_sent, retransmitted):
+        """
+        Handles the first ACK for a packet
+        Args:
+            time_since_sent (float): Seconds since the packet was last sent
+            retransmitted (bool): Whether the packet was sent more than once
+        """
+        if not retransmitted:
+            self.on_sample(time_since_sent)
+            return
+        # Karn's algorithm: the sample is ambiguous, keep the backed off RTO
+        self.karn_skipped += 1
+
+    def on_duplicate_ack(self, count=1):
+        """
+        Counts ACKs for packets that were already ACKed. The server got
+        two copies, so one retransmit was spurious.
+        Args: count (int): Number of duplicate packets reported
+        """
+        self.spurious_retransmits += count
+
+    def on_timeout(self):
+        """
+        Doubles the RTO after a retransmission timeout
+        """
+        self.timeouts += 1
+        self.rto = min(self.rto * 2, self.max_rto)
+
+    def __str__(self):
+        srtt = "-" if self.srtt is None else f"{self.srtt * 1000:.2f}ms"
+        return (f"SRTT {srtt}, RTO {self.rto * 1000:.2f}ms, "
+                f"samples {self.samples}, Karn skipped {self.karn_skipped}, "
+                f"timeouts {self.timeouts}, "
+                f"spurious retransmits {self.spurious_retransmits}")
@@ -0,0 +1,106 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Send buffer
+"""
+Batches outgoing frames so that a whole window goes out in a few send()
+calls instead of one per packet. Frames are encoded straight into a
+preallocated bytearray and flushed through a memoryview. A short write
+leaves the rest of the bytes in the buffer for the next flush, so on a
+non-blocking socket a full kernel buffer (backpressure) never loses data.
+"""
+
+from wire_capture import SEND
+
+DEFAULT_CAPACITY = 2**19  # 512 KiB, a full 2^16 window of binary frames
+
+
+class SendBuffer:
+    """
+    Preallocated buffer of encoded frames waiting to be sent
+    """
+
+    def __init__(self, codec, capacity=DEFAULT_CAPACITY):
+        self.codec = codec
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # first byte not yet sent
+        self.end = 0  # one past the last byte encoded
+        self.bytes_sent = 0
+        self.send_calls = 0
+        self.capture = None  # WireCapture of what is sent, or None
+
+    def pending(self):
+        """
+        Returns: Number of encoded bytes that have not been sent
+        """
+        return self.end - self.start
+
+    def make_room(self, size):
+        """
+        Makes sure size more bytes fit after end. Bytes already sent are
+        dropped first and the buffer is doubled if that is not enough.
+        Args: size (int): Number of bytes about to be added
+        """
+        if self.end + size <= len(self.buffer):
+            return
+        pending = self.end - self.start
+        if self.start:
+            self.view[:pending] = self.view[self.start:self.end]
+            self.start = 0
+            self.end = pending
+        if self.end + size > len(self.buffer):
+            capacity = len(self.buffer)
+            while self.end + size > capacity:
+                capacity *= 2
+            self.buffer = self.buffer + bytearray(capacity - len(self.buffer))
+            self.view = memoryview(self.buffer)
+
+    def add(self, frame):
+        """
+        Adds an encoded frame
+        Args: frame (bytes-like): Frame to send
+        """
+        size = len(frame)
+        self.make_room(size)
+        self.view[self.end:self.end + size] = frame
+        self.end += size
+
+    def add_data(self, seq_num, payload=b"", stream=0):
+        """
+        Encodes a data segment into the buffer
+        Args:
+            seq_num (int): Sequence number of the segment
+            payload (bytes-like): Data of the segment
+            stream (int): Stream the segment belongs to
+        """
+        self.make_room(self.codec.max_frame_size + len(payload))
+        self.end = self.codec.pack_data(self.buffer, self.end, seq_num,
+                                        payload, stream)
+
+    def add_fin(self, stream=0):
+        """
+        Encodes a FIN into the buffer
+        Args: stream (int): Stream that is done
+        """
+        self.add(self.codec.encode_fin(stream))
+
+    def flush(self, sock):
+        """
+        Sends the pending bytes. A blocking socket waits until the kernel
+        takes all of them. A non-blocking socket sends what fits and
+        keeps the rest for the next flush.
+        Args: sock (socket): Connected socket to send on
+        Returns: True if every pending byte was sent
+        """
+        while self.start < self.end:
+            try:
+                sent = sock.send(self.view[self.start:self.end])
+            except (BlockingIOError, InterruptedError):
+                return False
+            self.send_calls += 1
+            self.bytes_sent += sent
+            if self.capture is not None:
+                self.capture.record(
+                    SEND, self.view[self.start:self.start + sent])
+            self.start += sent
+        self.start = self.end = 0
+        return True
@@ -0,0 +1,166 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Send stream
+"""
+Sender state of one stream of a multiplexed connection.
+Every stream has its own sequence space, window, retransmission timers,
+receive window and FIN, so a loss on one stream never holds up another.
+The congestion window, RTT estimate and pacer belong to the connection
+and are shared by all of its streams (see Client), so a stream opened
+on a connection that is already running starts with the window the
+earlier streams grew instead of from one packet.
+
+fair_shares splits the room left in the congestion window between the
+streams that have new packets to send (max-min fairness).
+"""
+
+import time
+
+from retransmit_timer import RetransmitTimer
+from sender_table import SenderTable
+
+MAX_STREAMS = 256  # the stream id is one byte on the wire
+
+
+class SendStream:
+    """
+    One sequence space of packets, the last index is its FIN
+    Args:
+        stream_id (int): Id carried in every frame of the stream
+        total_packets (int): Number of packets to send
+        source (FileSource): File the packets carry, None for empty packets
+        now (float): Time the stream is opened, defaults to time.time()
+    """
+
+    def __init__(self, stream_id, total_packets, source=None, now=None):
+        if not 0 <= stream_id < MAX_STREAMS:
+            raise ValueError(f"Stream id must be 0 to {MAX_STREAMS - 1}")
+        self.stream_id = stream_id
+        self.source = source
+        if source is not None and source.total_segments != total_packets:
+            raise ValueError("total_packets must match the file's segments")
+        # one slot per packet in the window, the last index is the FIN
+        self.packets = SenderTable(total_packets)
+        self.win_start = 0
+        self.next_seq = 0  # first packet that has never been sent
+        # deadlines of packets in flight and packets waiting to be resent
+        self.timer = RetransmitTimer()
+        self.retransmit_queue = []
+        self.recovery_point = None  # recovery ends once this packet is ACKed
+        # packets the server has past the first hole that Go-Back-N does
+        # not take as ACKed (see arq_strategy.py)
+        self.sacked_past_hole = 0
+        # first packet Go-Back-N went back to since the last timeout or
+        # fast retransmit
+        self.go_back = None
+
+        # flow control: the server's receive window from its SACKs. Packets
+        # are only sent below rwnd_edge, the highest cumulative ACK plus
+        # window seen. None until the server advertises one (never in ASCII).
+        self.rwnd = None
+        self.rwnd_edge = None
+        self.min_rwnd = None
+        # persist timer: while the window is closed and nothing is in
+        # flight, a probe makes the server send its window again
+        self.probe_deadline = None
+        self.probe_backoff = 0
+
+        self.fin = False  # the server ACKed the FIN
+        self.opened = time.time() if now is None else now
+        self.finished = None  # time the last packet and the FIN were ACKed
+
+    def __len__(self):
+        return len(self.packets)
+
+    def win_end(self, win_size):
+        """
+        Returns the end of the stream's sliding window
+        Args: win_size (int): Congestion window of the connection
+        Returns: An int one past the last packet that may be sent
+        """
+        win_end = self.win_start + win_size
+        fin_index = self.packets.fin_index
+        if self.rwnd_edge is not None and self.rwnd_edge < fin_index:
+            # never more than the server can buffer, the FIN is not held back
+            win_end = min(win_end, self.rwnd_edge)
+        if win_end >= fin_index:
+            return len(self.packets)
+        return win_end
+
+    def outstanding(self):
+        """
+        Returns: Packets of the window taken up between the start of the
+        window and the first packet never sent
+        """
+        return max(0, self.next_seq - self.win_start)
+
+    def update_receive_window(self, cum_ack, window):
+        """
+        Records the window the server advertised. ACKs can arrive out of
+        order over UDP, so the right edge only moves forward.
+        Args:
+            cum_ack (int): Cumulative ACK of the SACK frame
+            window (int): Packets past cum_ack the server can take
+        """
+        edge = cum_ack + window
+        if self.rwnd_edge is None or edge >= self.rwnd_edge:
+            self.rwnd_edge = edge
+            self.rwnd = window
+        if self.min_rwnd is None or window < self.min_rwnd:
+            self.min_rwnd = window
+
+    def window_closed(self):
+        """
+        Returns: True if the receive window keeps new packets from going
+        out while none are outstanding, so no ACK is coming to open it
+        """
+        return (self.rwnd_edge is not None
+                and self.rwnd_edge <= self.next_seq < self.packets.fin_index
+                and self.win_start >= self.next_seq)
+
+    def done(self):
+        """
+        The FIN can be ACKed before packets lost ahead of it are resent,
+        so the stream is only over once every packet is ACKed as well.
+        Returns: True when every packet and the FIN are ACKed
+        """
+        return self.fin and self.win_start >= len(self.packets)
+
+    def __str__(self):
+        elapsed = (self.finished or time.time()) - self.opened
+        state = "done" if self.finished else f"at {self.win_start}"
+        return (f"stream {self.stream_id}: {self.packets.total_packets} "
+                f"packets, {state} in {elapsed:.3f}s")
+
+
+def fair_shares(room, demands, first=0):
+    """
+    Splits room between streams max-min fairly: every stream gets an
+    equal share, and what a stream does not need goes to the others.
+    Args:
+        room (int): Packets that may be sent in total
+        demands (list): Packets each stream has ready to send
+        first (int): Stream index that gets the leftover packets first,
+        rotated by the caller so no stream is always favoured
+    Returns: List of packets each stream may send, in the order of demands
+    """
+    count = len(demands)
+    shares = [0] * count
+    if room <= 0 or not count:
+        return shares
+    order = [(first + i) % count for i in range(count)]
+    # serve the smallest demands first, they free room for the rest
+    waiting = sorted((i for i in order if demands[i] > 0),
+                     key=lambda i: demands[i])
+    while waiting and room > 0:
+        share = room // len(waiting)
+        if not share:
+            # fewer packets than streams, one each in round-robin order
+            for i in sorted(waiting, key=order.index)[:room]:
+                shares[i] += 1
+            break
+        for i in waiting:
+            give = min(share, demands[i] - shares[i])
+            shares[i] += give
+            room -= give
+        waiting = [i for i in waiting if shares[i] < demands[i]]
+    return shares
@@ -0,0 +1,279 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Sender table
+"""
+Struct-of-arrays state for the packets the client is sending.
+Instead of one Packet object per packet, the sent flag, ACKed flag, send
+time and retransmit count of each packet live in compact arrays. The
+arrays are a ring indexed by sequence number modulo the capacity, so
+only the packets from win_start to the end of the window take up memory.
+The ring starts small and doubles when the window outgrows it.
+
+Packet is kept as a thin view over one slot for code that still wants
+an object per packet.
+"""
+
+import time
+from array import array
+
+INITIAL_CAPACITY = 64
+
+
+class Packet:
+    """
+    View of one packet's slot in a SenderTable. Packets before the start
+    of the window have had their slot reused and only report received.
+    """
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def sequence_num(self):
+        if self.index == self.table.fin_index:
+            return "FIN"
+        return self.index
+
+    @property
+    def received(self):
+        return self.table.is_acked(self.index)
+
+    @received.setter
+    def received(self, value):
+        if value:
+            self.table.mark_acked(self.index)
+        else:
+            self.table.acked[self.table.slot(self.index)] = 0
+
+    @property
+    def sent(self):
+        return self.table.is_sent(self.index)
+
+    @sent.setter
+    def sent(self, value):
+        self.table.sent[self.table.slot(self.index)] = 1 if value else 0
+
+    @property
+    def start(self):
+        return self.table.sent_time[self.table.slot(self.index)]
+
+    def start_timer(self):
+        """
+        Starts the timer for packet's rtt
+        """
+        if not self.received:
+            self.table.sent_time[self.table.slot(self.index)] = time.time()
+        else:
+            print(
+                f"Not starting packet {self.sequence_num}'s time because it has been ACKed already.")
+
+    def get_time_since_sent(self):
+        """
+        Returns the rtt of the packet
+        Returns: An integer representing the rtt of the packet
+        """
+        return self.table.time_since_sent(self.index)
+
+    def __str__(self):
+        return str(self.sequence_num)
+
+    def __repr__(self):
+        return str(self.sequence_num) + " " + str(self.received)
+
+
+class SenderTable:
+    """
+    Ring of per-packet sender state covering the current window.
+    The last index (total_packets) is the FIN.
+    """
+
+    def __init__(self, total_packets, capacity=INITIAL_CAPACITY):
+        self.total_packets = total_packets
+        self.fin_index = total_packets
+        self.base = 0  # every packet before base has been ACKed
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        """
+        Creates empty arrays for a ring of the given capacity
+        Args: capacity (int): Number of slots, rounded up to a power of two
+        """
+        self.capacity = 1 << (max(capacity, 1) - 1).bit_length()
+        self.mask = self.capacity - 1
+        self.sent = bytearray(self.capacity)
+        self.acked = bytearray(self.capacity)
+        self.sent_time = array("d", bytes(8 * self.capacity))
+        self.retransmits = array("I", bytes(4 * self.capacity))
+
+    def __len__(self):
+        return self.total_packets + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Packet(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("packet index out of range")
+        return Packet(self, index)
+
+    def slot(self, seq_num):
+        """
+        Returns the ring slot of a packet in the window
+        Args: seq_num (int): Sequence number of the packet
+        Returns: An int index into the arrays
+        """
+        if not 0 <= seq_num - self.base < self.capacity:
+            raise IndexError(f"packet {seq_num} is outside the sender window")
+        return seq_num & self.mask
+
+    def reserve(self, win_end):
+        """
+        Makes sure every packet up to win_end has a slot. The ring doubles
+        until it covers base to win_end.
+        Args: win_end (int): End of the sliding window (exclusive)
+        """
+        needed = win_end - self.base
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        old = (self.mask, self.sent, self.acked, self.sent_time,
+               self.retransmits)
+        old_mask, old_sent, old_acked, old_sent_time, old_retransmits = old
+        old_capacity = self.capacity
+        self.allocate(capacity)
+        for seq_num in range(self.base, self.base + old_capacity):
+            old_slot = seq_num & old_mask
+            new_slot = seq_num & self.mask
+            self.sent[new_slot] = old_sent[old_slot]
+            self.acked[new_slot] = old_acked[old_slot]
+            self.sent_time[new_slot] = old_sent_time[old_slot]
+            self.retransmits[new_slot] = old_retransmits[old_slot]
+
+    def is_acked(self, seq_num):
+        """
+        Args: seq_num (int): Sequence number of the packet
+        Returns: True if the packet has been ACKed
+        """
+        if seq_num < self.base:
+            return True
+        if seq_num - self.base >= self.capacity:
+            return False
+        return bool(self.acked[seq_num & self.mask])
+
+    def is_sent(self, seq_num):
+        """
+        Args: seq_num (int): Sequence number of the packet
+        Returns: True if the packet is in flight or has been ACKed
+        """
+        if seq_num < self.base:
+            return True
+        if seq_num - self.base >= self.capacity:
+            return False
+        return bool(self.sent[seq_num & self.mask])
+
+    def mark_sent(self, seq_num, now=None):
+        """
+        Marks a packet as sent and starts its timer
+        Args:
+            seq_num (int): Sequence number of the packet
+            now (float): Send time, defaults to time.time()
+        """
+        slot = self.slot(seq_num)
+        self.sent[slot] = 1
+        self.sent_time[slot] = time.time() if now is None else now
+
+    def mark_timed_out(self, seq_num):
+        """
+        Queues a packet to be sent again and counts the retransmit
+        Args: seq_num (int): Sequence number of the packet
+        """
+        slot = self.slot(seq_num)
+        self.sent[slot] = 0
+        self.retransmits[slot] += 1
+
+    def mark_acked(self, seq_num):
+        """
+        Marks a packet as ACKed
+        Args: seq_num (int): Sequence number of the packet
+        Returns: True if this is the first ACK for the packet
+        """
+        if seq_num < self.base or seq_num - self.base >= self.capacity:
+            return False
+        slot = seq_num & self.mask
+        if self.acked[slot]:
+            return False
+        self.acked[slot] = 1
+        return True
+
+    def mark_acked_range(self, start, end):
+        """
+        Marks every packet from start to end as ACKed
+        Args:
+            start (int): First sequence number of the range
+            end (int): One past the last sequence number of the range
+        Returns: List of the packets that had not been ACKed before
+        """
+        start = max(start, self.base)
+        end = min(end, self.base + self.capacity, len(self))
+        acked = self.acked
+        mask = self.mask
+        newly_acked = []
+        for seq_num in range(start, end):
+            slot = seq_num & mask
+            if not acked[slot]:
+                acked[slot] = 1
+                newly_acked.append(seq_num)
+        return newly_acked
+
+    def acked_past_base(self):
+        """
+        Returns: Number of packets past base that have been ACKed. Slots
+        before base are cleared by advance, so this is every ACKed slot.
+        """
+        return self.acked.count(1)
+
+    def time_since_sent(self, seq_num, now=None):
+        """
+        Args:
+            seq_num (int): Sequence number of the packet
+            now (float): Current time, defaults to time.time()
+        Returns: Seconds since the packet was last sent
+        """
+        if now is None:
+            now = time.time()
+        return now - self.sent_time[self.slot(seq_num)]
+
+    def retransmit_count(self, seq_num):
+        """
+        Args: seq_num (int): Sequence number of the packet
+        Returns: Number of times the packet timed out and was queued again
+        """
+        if seq_num < self.base:
+            return 0
+        return self.retransmits[self.slot(seq_num)]
+
+    def advance(self):
+        """
+        Moves base past every packet ACKed in order and clears their
+        slots so they can be reused by packets further ahead
+        Returns: The new base
+        """
+        base = self.base
+        while base < len(self):
+            slot = base & self.mask
+            end = self.acked.find(0, slot)
+            if end == -1:
+                end = self.capacity
+            run = min(end - slot, len(self) - base)
+            if not run:
+                break
+            zeros = bytes(run)
+            self.acked[slot:slot + run] = zeros
+            self.sent[slot:slot + run] = zeros
+            self.retransmits[slot:slot + run] = array("I", bytes(4 * run))
+            base += run
+        self.base = base
+        return base
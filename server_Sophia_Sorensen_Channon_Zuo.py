@@ -1,34 +1,50 @@
 # Selective Repeat ARQ - Server Side Code
 
+import argparse
 import socket
 import time
-import matplotlib.pyplot as plt
 
+from frame_parser import DEFAULT_BUFFER_SIZE
+from metrics import MetricsRecorder, RECEIVER_COLUMNS, DEFAULT_INTERVAL
+from receive_window import DEFAULT_CAPACITY
+from receiver_session import (ReceiverSession, DEFAULT_RECV_BUDGET,
+                              OFFER_GRACE)
+from tracing import (LEVELS, DEFAULT_CAPACITY as TRACE_CAPACITY, Tracer,
+                     dump_on_signal)
+from udp_transport import UdpSocket, DEFAULT_MTU, MAX_DATAGRAM, TRANSPORTS
 
-class Server:
+
+class Server(ReceiverSession):
     """ 
-    Server object that simulates the actions of a server
+    Server object that simulates the actions of a server. The receive
+    logic lives in ReceiverSession, Server adds the socket it runs on.
     """
 
-    def __init__(self):
+    def __init__(self, recv_buffer_size=DEFAULT_BUFFER_SIZE,
+                 buffer_capacity=DEFAULT_CAPACITY, ack_policy=None,
+                 max_sack_blocks=64, transport="tcp", mtu=DEFAULT_MTU,
+                 linger=2.0, output_path=None, recv_budget=DEFAULT_RECV_BUDGET,
+                 read_rate=None, tracer=None, metrics=None):
+        super().__init__(recv_buffer_size, buffer_capacity, ack_policy,
+                         max_sack_blocks, output_path, recv_budget, read_rate,
+                         tracer=tracer, metrics=metrics)
         self.host = socket.gethostname()
         print(self.host)
         self.ip = socket.gethostbyname(self.host)
         self.port = 12344
-        self.socket = socket.socket(
-            socket.AF_INET, socket.SOCK_STREAM)  # get instance
-
-        self.win_size = 4
-        self.win_start = 0
-        self.pkt_counter = 0
-        self.packet_buffer = [False for i in range(
-            self.win_start, self.win_size)]
-        self.MAX_WIN_SIZE = 2**16  # 2^16 max window size
-
-        self.pkt_received_dict = {}
-        self.fin = False
-
-        self.start = 0
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}")
+        self.transport = transport
+        # UDP never says the client is gone, so after the FIN the server
+        # stops once the client has been quiet for linger seconds
+        self.linger = linger
+        if transport == "udp":
+            self.socket = UdpSocket(mtu)
+            # a datagram is read whole or not at all
+            self.parser.min_room = MAX_DATAGRAM
+        else:
+            self.socket = socket.socket(
+                socket.AF_INET, socket.SOCK_STREAM)  # get instance
 
     def handshake(self):
         """
@@ -39,132 +55,178 @@ class Server:
         """
         self.socket.settimeout(20)
         self.socket.bind((self.ip, self.port))
+        self.port = self.socket.getsockname()[1]  # if port 0 picked one
+
+        if self.transport == "udp":
+            print(f"Listening on {self.ip}:{self.port}", flush=True)
+            # the first datagram is the offer, its sender is the client
+            offer, self.address = self.socket.recvfrom(1024)
+            self.socket.connect(self.address)
+            self.conn = self.socket
+            print("Connection from: ", str(self.address))
+            reply = self.accept_offer(offer)
+            # answer the offer again if the client did not get the reply
+            self.conn.handshake_reply = reply
+            self.conn.codec = self.codec
+            self.conn.send(reply)
+            return
 
         # configure how many client the server can listen simultaneously
         self.socket.listen(5)
+        print(f"Listening on {self.ip}:{self.port}", flush=True)
         self.conn, self.address = self.socket.accept()  # accept new connection
 
         # print data
         print("Connection from: ", str(self.address))
-        print(f"From Client: {self.conn.recv(1024).decode()}")
-        self.conn.send(b"Success")
-        self.start = time.time()
-
-    def win_end(self):
+        # the offer may come in pieces, an older client's has no end marker
+        reply = self.receive_offer(self.conn.recv(1024))
+        while reply is None:
+            self.conn.settimeout(OFFER_GRACE)
+            try:
+                data = self.conn.recv(1024)
+            except socket.timeout:
+                data = b""
+            reply = self.receive_offer(data, complete=not data)
+        self.conn.settimeout(None)
+        self.conn.send(reply)
+        # packets that came in with the offer
+        self.process_packets()
+        if self.fin_pending:
+            self.send_acks()
+            self.send_fin()
+
+    def send_acks(self):
         """
-        Returns window end
-        Returns:
-            int: End index of window
+        Sends one cumulative ACK with SACK blocks for every packet queued
+        since the last ACK. ASCII has no SACK frame so each packet is
+        ACKed on its own, in a single send.
         """
-        return self.win_start + self.win_size - 1
+        msg = self.build_acks()
+        if msg:
+            self.conn.sendall(msg)
 
-    def update_win_size(self, seq_num):
-        """
-        Maintains the buffer when new packets arrive and marks
-        the packets as received
-        Updates: start of window and buffer list
-        Assumption: window size on server side doesn't need to 
-        follow AIMD because we can't assume client's loss
-        """
-        # update the start of the window
-        while self.packet_buffer[self.win_start]:
-            print(
-                f"Index {self.win_start} is {self.packet_buffer[self.win_start]}")
-            print("incrementing window start")
-            self.win_start += 1
-            print(f"New window start is {self.win_start}")
-            print(f"list size is {len(self.packet_buffer)}")
-            if self.win_start >= len(self.packet_buffer):
-                self.packet_buffer.append(False)
-
-        # add space to window
-        pkts_to_add = self.win_end() - len(self.packet_buffer)
-        if pkts_to_add > 0:
-            for i in range(pkts_to_add):
-                self.packet_buffer.append(False)
-
-    def mark_packet_received(self, seq_num):
-        """
-        Marks the packet received
-        Args:
-            seq_num (int): Sequence number of the packet
-        """
-        buff_size = len(self.packet_buffer)
-        # if the sequence number is out of order,
-        # create space for other packets to arrive later
-        if seq_num >= buff_size - 1:
-            print(f"Adding space to the buffer")
-            for i in range(buff_size, seq_num + 1):
-                self.packet_buffer.append(False)
-
-        # Mark the received packet in the buffer as received
-        print(f"---------- MARKING PACKET {seq_num} AS RECEIVED -----------")
-        self.packet_buffer[seq_num] = True
-        if seq_num % 1000 == 0:
-            self.pkt_received_dict[seq_num] = time.time() - self.start
-
-    def receive_packets(self, data):
+    def send_fin(self):
         """
-        Parses the packets. Packets can be received in a concatenated order
-        and must be separated for the packets to be processed individually
+        Sends the FIN ACK once the client is done sending packets
         """
-        # receive data stream. it won't accept data packet greater than 1024 bytes
-        pkt_received = data.split(",")
-        pkt_received = [x for x in pkt_received if len(
-            x) != 0]     # remove empty list items
-        try:
-            pkt_received.remove("FIN")
-        except ValueError:
-            print(f"Client is not done sending packets")
-        else:
-            self.fin = True
-        print(f"-------------- RECEIVED PACKET {pkt_received} --------------")
-        self.pkt_counter += len(pkt_received)
-        return [int(i) for i in pkt_received]
-
-    def send_ack(self, ack):
-        """
-        Sends an ACK for the packet received
-        """
-        print(f"-------------- SENDING ACK {ack} --------------\n\n")
-        self.conn.send(ack.encode())
-
-
-def server_program():
-    server = Server()
+        self.conn.sendall(self.build_fin())
+
+
+def server_program(transport="tcp", mtu=DEFAULT_MTU, output_path=None,
+                   recv_budget=DEFAULT_RECV_BUDGET, read_rate=None,
+                   trace="off", trace_file="server.trace",
+                   trace_capacity=TRACE_CAPACITY, metrics=None,
+                   metrics_interval=DEFAULT_INTERVAL, host=None, port=None):
+    tracer = None
+    if trace != "off":
+        tracer = Tracer(trace, trace_capacity)
+        dump_on_signal(tracer, trace_file)
+    recorder = None
+    if metrics:
+        recorder = MetricsRecorder(metrics, RECEIVER_COLUMNS, metrics_interval)
+    server = Server(transport=transport, mtu=mtu, output_path=output_path,
+                    recv_budget=recv_budget, read_rate=read_rate,
+                    tracer=tracer, metrics=recorder)
+    if host:
+        server.ip = host
+    if port is not None:
+        server.port = port
     print(f"Server IP: {server.ip}")
 
-    start = time.time()
     server.handshake()
-    rtt = time.time() - start
-
-    while not server.fin:
-        data = server.conn.recv(1024).decode()
-        if not data and rtt < time.time() - start:
-            print("Closing socket, no packets being sent")
-            server.conn.close()
-        elif data:
-            # create 1:1 ack for packet received
-            ack = server.receive_packets(data)
-            print(f"Acks to send: {ack}")
-            for i in ack:
-                server.mark_packet_received(i)
-                server.update_win_size(i)
-                server.send_ack(str(i) + ",")
-            if server.fin:
-                server.send_ack("FIN,")
+
+    # keep answering until the client closes the connection, it may still
+    # resend packets after the FIN if their timers ran out
+    last_received = time.time()
+    try:
+        while True:
+            now = time.time()
+            if server.ack_policy.due(now) or server.window_update_due(now):
+                server.send_acks()
+            # wake up when the delayed ACK timer fires or the window opens
+            timeout = server.time_until_reply(time.time())
+            if server.transport == "udp" and server.fin:
+                timeout = min(timeout, server.linger) if timeout is not None \
+                    else server.linger
+            server.conn.settimeout(timeout)
+            try:
+                num_bytes = server.parser.read(server.conn)
+            except (socket.timeout, BlockingIOError):
+                # a timeout of 0 (a reply came due since the check above)
+                # makes the socket non-blocking, the loop sends it
+                if server.transport == "udp" and server.fin and \
+                        time.time() - last_received >= server.linger:
+                    print("Closing socket, client has gone quiet")
+                    break
+                continue
+            if not num_bytes:
+                print("Closing socket, no packets being sent")
+                break
+            last_received = time.time()
+            server.process_packets()
+            if server.fin_pending:
+                server.send_acks()
+                server.send_fin()
+    except (BrokenPipeError, ConnectionResetError, ConnectionRefusedError):
+        print("Client closed the connection")
+    server.conn.close()
+    print(f"ACKs sent: {server.acks_sent} for {server.pkt_counter} packets")
+    print(f"Receive window: {server.budget_packets} packets, "
+          f"{server.zero_windows} zero-window ACKs, "
+          f"{server.window_drops} packets dropped past the window")
+    file_result = server.finish()
+    if file_result:
+        print(file_result)
+    if server.transport == "udp":
+        print(f"UDP: {server.conn}")
     print(f"Server IP: {server.ip}")
     print(f"Client IP: {server.address}")
-
-    serv_pkt_recv_x = server.pkt_received_dict.keys()
-    serv_pkt_recv_y = server.pkt_received_dict.values()
-    plt.plot(serv_pkt_recv_x, serv_pkt_recv_y)
-
-    plt.xlabel('Segments Received')
-    plt.ylabel('Time in Seconds')
-    plt.title('Segments Over Time')
-    plt.savefig("Sophia-Sorensen-Channon-Zuo-Server-Segments-Received.jpg")
+    if tracer is not None:
+        tracer.dump(trace_file)
+        print(f"Trace: {tracer}, written to {trace_file}")
+    if recorder is not None:
+        # the last, partial interval
+        server.sample_metrics(time.time())
+        recorder.close()
+        print(f"Metrics: {recorder}")
 
 
 if __name__ == '__main__':
-    server_program()
+    parser = argparse.ArgumentParser(description="Selective Repeat server")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="tcp")
+    parser.add_argument("--mtu", type=int, default=DEFAULT_MTU,
+                        help="largest UDP packet, frames are packed up to it")
+    parser.add_argument("--output", default=None,
+                        help="where to write a file sent by the client, "
+                             "not kept unless given")
+    parser.add_argument("--recv-budget", type=int, default=DEFAULT_RECV_BUDGET,
+                        help="bytes of packets buffered for the client, "
+                             "sets the receive window")
+    parser.add_argument("--read-rate", type=float, default=None,
+                        help="packets per second the application reads, "
+                             "to test a slow receiver (default: no limit)")
+    parser.add_argument("--trace", choices=LEVELS, default="off",
+                        help="record events (drops) or packets (every "
+                             "packet and ACK too) in a ring buffer")
+    parser.add_argument("--trace-file", default="server.trace",
+                        help="where the trace is written at the end, or on "
+                             "SIGUSR1")
+    parser.add_argument("--trace-capacity", type=int,
+                        default=TRACE_CAPACITY,
+                        help="events kept, older ones are overwritten")
+    parser.add_argument("--metrics", default=None,
+                        help="file to write packet counts, the receive "
+                             "window and rates to every interval, CSV if "
+                             "it ends in .csv")
+    parser.add_argument("--metrics-interval", type=float,
+                        default=DEFAULT_INTERVAL,
+                        help="seconds between rows of --metrics")
+    parser.add_argument("--host", default=None,
+                        help="address to listen on (default: this host's IP)")
+    parser.add_argument("--port", type=int, default=None,
+                        help="port to listen on (default: 12344, 0 for any)")
+    args = parser.parse_args()
+    server_program(args.transport, args.mtu, args.output, args.recv_budget,
+                   args.read_rate, args.trace, args.trace_file,
+                   args.trace_capacity, args.metrics, args.metrics_interval,
+                   args.host, args.port)
@@ -0,0 +1,614 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Simulator
+"""
+Discrete-event simulator that runs the real Client and ReceiverSession
+in virtual time. No socket is opened and nothing sleeps: both ends read
+a VirtualClock that the event loop moves straight to the next event,
+and their frames travel over two SimLinks, an in-memory model of the
+path with a bandwidth, a one-way delay, random loss and a drop-tail
+queue. The client's socket is a SimSocket. The server side feeds
+arriving datagrams to the session's parser like the asyncio server
+does, so Client.send_window, receive_acks and update_win_size and the
+session's mark_packet_received and update_win_size run unchanged.
+A run of a million packets takes seconds however long it would take
+on the simulated path, so parameter sweeps are cheap.
+
+Frames are packed into datagrams like UdpSocket does (see
+udp_transport.py), so a lost datagram loses whole frames. The
+handshake is never lost. The same seed gives the same losses.
+With --trace the client and the session record their events into one
+ring buffer stamped with the virtual time (see tracing.py), and with
+--metrics the client writes its metrics in virtual time (see metrics.py).
+A run whose goodput is below --warn-goodput is flagged after its line,
+most often a sign the algorithm or the ARQ strategy does not suit the
+path rather than a slow path.
+
+Run: python simulator.py --packets 1000000 --cc newreno cubic --arq sr gbn
+     --loss 0 0.001 0.01 [--bandwidth BYTES/S ...] [--delay S ...]
+Every option that takes several values is swept: one run per
+combination, one line per run.
+"""
+
+import argparse
+import collections
+import contextlib
+import heapq
+import itertools
+import math
+import os
+import random
+import time
+
+from arq_strategy import STRATEGIES, DEFAULT_STRATEGY
+from client_Sophia_Sorensen_Channon_Zuo import Client
+from congestion_control import ALGORITHMS, DEFAULT_ALGORITHM
+from pacer import PACING_MODES
+from metrics import (MetricsRecorder, SENDER_COLUMNS, DEFAULT_INTERVAL,
+                     numbered_path)
+from receiver_session import ReceiverSession, DEFAULT_RECV_BUDGET
+from tracing import LEVELS, DEFAULT_CAPACITY, Tracer
+from udp_transport import DEFAULT_MTU, IP_UDP_OVERHEAD, MAX_DATAGRAM
+
+DEFAULT_BANDWIDTH = 12.5e6  # bytes per second, 100 Mbit/s
+DEFAULT_DELAY = 0.01  # one-way, so the RTT is 20ms
+LOW_GOODPUT = 0.5  # runs below it are flagged
+
+
+class VirtualClock:
+    """
+    Clock of the simulation, only moved by the event loop. Calling it
+    returns the virtual time, like time.time().
+    Args: start (float): Time the simulation starts at. Not 0, so no
+    timestamp reads as false.
+    """
+
+    def __init__(self, start=1.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class SimLink:
+    """
+    One direction of the simulated path. Datagrams wait in a drop-tail
+    queue for a bottleneck of bandwidth bytes per second, then take
+    delay seconds to arrive. Each datagram is lost with probability
+    loss after it went through the bottleneck.
+    Args:
+        sim (Simulator): Event loop the arrivals are scheduled on
+        deliver (callable): Called with each datagram when it arrives
+        bandwidth (float): Bytes per second, None for no limit
+        delay (float): One-way delay in seconds
+        loss (float): Chance that a datagram is lost
+        queue_limit (int): Bytes the queue holds, None for no limit
+        mtu (int): Largest IP packet, frames are packed up to it
+        rng (random.Random): Source of the losses
+    """
+
+    def __init__(self, sim, deliver, bandwidth=DEFAULT_BANDWIDTH,
+                 delay=DEFAULT_DELAY, loss=0.0, queue_limit=None,
+                 mtu=DEFAULT_MTU, rng=None):
+        self.sim = sim
+        self.deliver = deliver
+        self.bandwidth = bandwidth
+        self.delay = delay
+        self.loss = loss
+        self.queue_limit = queue_limit
+        self.max_payload = mtu - IP_UDP_OVERHEAD
+        self.rng = rng if rng else random.Random()
+        self.codec = None  # frames are not cut until the handshake is done
+        self.busy_until = 0.0  # when the bottleneck has sent its queue
+
+        self.datagrams_sent = 0
+        self.datagrams_lost = 0
+        self.queue_drops = 0
+        self.bytes_sent = 0
+
+    def transit(self, size):
+        """
+        Puts a datagram through the bottleneck
+        Args: size (int): Bytes of the datagram, without IP and UDP headers
+        Returns: Time it arrives, None if the queue was full
+        """
+        now = self.sim.clock.now
+        start = max(now, self.busy_until)
+        size += IP_UDP_OVERHEAD
+        if self.bandwidth:
+            if self.queue_limit is not None and \
+                    (start - now) * self.bandwidth + size > self.queue_limit:
+                return None
+            self.busy_until = start + size / self.bandwidth
+        else:
+            self.busy_until = start
+        return self.busy_until + self.delay
+
+    def send_datagram(self, datagram):
+        """
+        Sends one datagram, which may be dropped by the queue or lost
+        Args: datagram (bytes): Datagram to send
+        """
+        self.datagrams_sent += 1
+        self.bytes_sent += len(datagram)
+        arrival = self.transit(len(datagram))
+        if arrival is None:
+            self.queue_drops += 1
+        elif self.loss and self.rng.random() < self.loss:
+            self.datagrams_lost += 1
+        else:
+            self.sim.schedule(arrival, self.deliver, datagram)
+
+    def send(self, data):
+        """
+        Sends data as datagrams of whole frames, each at most max_payload
+        bytes. Before the handshake picks a codec, data goes out as one
+        datagram.
+        Args: data (bytes-like): Encoded frames
+        Returns: Number of bytes sent, always all of them
+        """
+        view = memoryview(data).cast("B")
+        if self.codec is None:
+            self.send_datagram(bytes(view))
+            return len(view)
+        fit = self.codec.fit
+        max_payload = self.max_payload
+        sent = 0
+        while sent < len(view):
+            size = fit(view[sent:], max_payload)
+            self.send_datagram(bytes(view[sent:sent + size]))
+            sent += size
+        return sent
+
+    def __str__(self):
+        return (f"datagrams sent {self.datagrams_sent}, lost "
+                f"{self.datagrams_lost}, queue drops {self.queue_drops}")
+
+
+class SimSocket:
+    """
+    The client's end of the simulated path, with the socket calls the
+    Client makes. Sending never blocks, a full queue drops instead.
+    Args: link (SimLink): Link the client sends on
+    """
+
+    def __init__(self, link):
+        self.link = link
+        self.inbox = collections.deque()  # datagrams that arrived
+        self.max_payload = link.max_payload
+        self.handshake_retries = 0
+
+    @property
+    def codec(self):
+        return self.link.codec
+
+    @codec.setter
+    def codec(self, codec):
+        self.link.codec = codec
+
+    def deliver(self, datagram):
+        self.inbox.append(datagram)
+
+    def send(self, data):
+        return self.link.send(data)
+
+    sendall = send
+
+    def recv_into(self, buffer):
+        """
+        Copies the datagrams that arrived into buffer, as many as fit
+        Args: buffer (memoryview): Free space of the parser's buffer
+        Returns: Number of bytes copied
+        Raises: BlockingIOError if nothing has arrived
+        """
+        if not self.inbox:
+            raise BlockingIOError("nothing has arrived")
+        inbox = self.inbox
+        total = 0
+        while inbox and len(inbox[0]) <= len(buffer) - total:
+            datagram = inbox.popleft()
+            buffer[total:total + len(datagram)] = datagram
+            total += len(datagram)
+        return total
+
+    def connect(self, address):
+        pass
+
+    def setblocking(self, flag):
+        pass
+
+    def settimeout(self, timeout):
+        pass
+
+    def close(self):
+        pass
+
+
+class PayloadSource:
+    """
+    Stands in for a FileSource: every segment is the same segment_size
+    zero bytes, so packets have a realistic size without a file
+    Args:
+        total_segments (int): Number of segments
+        segment_size (int): Bytes per segment
+    """
+
+    def __init__(self, total_segments, segment_size):
+        self.path = None
+        self.total_segments = total_segments
+        self.segment_size = segment_size
+        self.size = total_segments * segment_size
+        self.payload = memoryview(bytes(segment_size))
+
+    def segment(self, seq_num):
+        return self.payload
+
+    def checksum(self):
+        # the session keeps no file, there is nothing to check
+        return None
+
+    def close(self):
+        pass
+
+
+class Simulator:
+    """
+    One transfer between a Client and a ReceiverSession in virtual time
+    Args:
+        total_packets (int): Packets to send
+        segment_size (int): Payload bytes per packet, 0 for empty packets
+        bandwidth (float): Bytes per second of both directions, None for
+        no limit
+        delay (float): One-way delay in seconds of both directions
+        loss (float): Chance that a data datagram is lost
+        ack_loss (float): Chance that an ACK datagram is lost
+        queue_limit (int): Bytes each direction queues, None for one
+        bandwidth-delay product
+        mtu (int): Largest IP packet
+        congestion_control (str): Algorithm of the client, see --cc
+        arq (str): Retransmission strategy of the client, see --arq
+        pacing (str): Pacing mode of the client, None for the default
+        of the algorithm
+        pacing_rate (float): Packets per second for pacing "rate"
+        streams (int): Streams the packets are split between
+        recv_budget (int): Bytes the session buffers
+        read_rate (float): Packets per second the session reads, None
+        for no limit
+        seed (int): Seed of the losses
+        trace (str): Trace level of both ends, see tracing.py
+        trace_capacity (int): Events the trace keeps
+        metrics (str): File for the client's metrics, None for none
+        metrics_interval (float): Virtual seconds between rows of metrics
+    """
+
+    def __init__(self, total_packets, segment_size=1024,
+                 bandwidth=DEFAULT_BANDWIDTH, delay=DEFAULT_DELAY, loss=0.0,
+                 ack_loss=0.0, queue_limit=None, mtu=DEFAULT_MTU,
+                 congestion_control=DEFAULT_ALGORITHM, arq=DEFAULT_STRATEGY,
+                 pacing=None, pacing_rate=None, streams=1,
+                 recv_budget=DEFAULT_RECV_BUDGET, read_rate=None, seed=1,
+                 trace="off", trace_capacity=DEFAULT_CAPACITY, metrics=None,
+                 metrics_interval=DEFAULT_INTERVAL):
+        self.clock = VirtualClock()
+        # one trace for both ends, in virtual time
+        self.tracer = None
+        if trace != "off":
+            self.tracer = Tracer(trace, trace_capacity, clock=self.clock)
+        self.metrics = None
+        if metrics:
+            self.metrics = MetricsRecorder(metrics, SENDER_COLUMNS,
+                                           metrics_interval)
+        self.events = []  # heap of (time, order, callback, args)
+        self.order = itertools.count()  # keeps events at one time in order
+        if queue_limit is None and bandwidth:
+            queue_limit = int(bandwidth * 2 * delay) or None
+        rng = random.Random(seed)
+        self.data_link = SimLink(self, self.server_receive, bandwidth, delay,
+                                 loss, queue_limit, mtu, rng)
+        self.ack_link = SimLink(self, self.client_receive, bandwidth, delay,
+                                ack_loss, queue_limit, mtu, rng)
+        self.sock = SimSocket(self.data_link)
+
+        self.total_packets = total_packets
+        self.segment_size = segment_size
+        # the packets are split evenly between the streams
+        self.split = [total_packets // streams + (i < total_packets % streams)
+                      for i in range(streams)]
+        self.client = Client(self.split[0], transport="udp", mtu=mtu,
+                             congestion_control=congestion_control, arq=arq,
+                             pacing=pacing, pacing_rate=pacing_rate,
+                             source=self.make_source(self.split[0]),
+                             max_streams=streams, clock=self.clock,
+                             sock=self.sock, tracer=self.tracer,
+                             metrics=self.metrics)
+        self.session = ReceiverSession(recv_budget=recv_budget,
+                                       read_rate=read_rate, clock=self.clock,
+                                       tracer=self.tracer)
+        # a datagram is read whole or not at all
+        self.session.parser.min_room = MAX_DATAGRAM
+        self.client_wakeup = None  # time of the client's next timer event
+        self.server_wakeup = None  # time of the session's next timer event
+        self.started = None
+        self.elapsed = 0.0
+        self.wall_time = 0.0
+
+    def make_source(self, total_packets):
+        if not self.segment_size:
+            return None
+        return PayloadSource(total_packets, self.segment_size)
+
+    def schedule(self, when, callback, *args):
+        heapq.heappush(self.events, (when, next(self.order), callback, args))
+
+    def wakeup_time(self, timeout):
+        """
+        Args: timeout (float): Seconds until a timer is due
+        Returns: Virtual time to wake up at. now + timeout can round to
+        just before the deadline, where the timer is not due yet, so the
+        clock always moves forward.
+        """
+        now = self.clock.now
+        return max(now + timeout, math.nextafter(now, math.inf))
+
+    def handshake(self):
+        """
+        Carries the handshake over the links. It takes its share of the
+        bottleneck and the delay but is never lost.
+        """
+        clock = self.clock
+        start = clock.now
+        offer = self.client.make_offer()
+        clock.now = self.data_link.transit(len(offer))
+        reply = self.session.accept_offer(offer)
+        self.ack_link.codec = self.session.codec
+        clock.now = self.ack_link.transit(len(reply))
+        self.client.accept_reply(reply, clock.now - start)
+
+    def run(self, time_limit=None):
+        """
+        Runs the transfer until every stream is done
+        Args: time_limit (float): Virtual seconds to give up after, None
+        for no limit
+        Returns: self
+        """
+        wall_start = time.time()
+        self.handshake()
+        self.started = self.clock.now
+        for count in self.split[1:]:
+            self.client.open_stream(count, self.make_source(count))
+        self.client_send()
+        events = self.events
+        while events and not self.client.done():
+            when, _, callback, args = heapq.heappop(events)
+            if time_limit is not None and when - self.started > time_limit:
+                break
+            self.clock.now = when
+            callback(*args)
+        self.elapsed = self.clock.now - self.started
+        self.wall_time = time.time() - wall_start
+        return self
+
+    def client_send(self):
+        """
+        Tops up the client's window, like a wakeup of Client.run
+        """
+        self.client.send_window()
+        self.schedule_client()
+
+    def client_receive(self, datagram):
+        """
+        Hands an arriving ACK datagram to the client
+        """
+        self.sock.deliver(datagram)
+        self.client.handle_acks()
+        if not self.client.done():
+            self.client.send_window()
+        self.schedule_client()
+
+    def schedule_client(self):
+        """
+        Sets the client's next wakeup: its next retransmission timer,
+        pacing quantum or zero-window probe, as in Client.run
+        """
+        client = self.client
+        timeout = client.time_until_timeout()
+        if client.pacing_held:
+            pace = client.pacer.time_until_ready(self.clock.now)
+            timeout = pace if timeout is None else min(timeout, pace)
+        probe = client.time_until_probe()
+        if probe is not None:
+            timeout = probe if timeout is None else min(timeout, probe)
+        if timeout is None:
+            return
+        when = self.wakeup_time(timeout)
+        if self.client_wakeup is not None and \
+                self.clock.now < self.client_wakeup <= when:
+            return  # an earlier wakeup is already due
+        self.client_wakeup = when
+        self.schedule(when, self.client_timer, when)
+
+    def client_timer(self, when):
+        if when != self.client_wakeup:
+            return  # replaced by an earlier wakeup
+        self.client_wakeup = None
+        self.client_send()
+
+    def server_receive(self, datagram):
+        """
+        Hands an arriving data datagram to the session
+        """
+        self.session.parser.feed(datagram)
+        self.session.process_packets()
+        self.server_reply()
+
+    def server_reply(self):
+        """
+        Sends the ACKs that are due and sets the session's next wakeup
+        for its delayed ACK or window update
+        """
+        now = self.clock.now
+        msg = self.session.replies(now)
+        if msg:
+            self.ack_link.send(msg)
+        delay = self.session.time_until_reply(now)
+        if delay is None:
+            return
+        when = self.wakeup_time(delay)
+        if self.server_wakeup is not None and \
+                now < self.server_wakeup <= when:
+            return
+        self.server_wakeup = when
+        self.schedule(when, self.server_timer, when)
+
+    def server_timer(self, when):
+        if when != self.server_wakeup:
+            return
+        self.server_wakeup = None
+        self.server_reply()
+
+    def result(self):
+        """
+        Returns: dict of the stats of the run
+        """
+        client = self.client
+        fins = len(client.streams)
+        sent = client.packets_sent - fins
+        elapsed = self.elapsed
+        return {"packets": self.total_packets,
+                "done": client.done() and not client.closed,
+                "virtual_time": elapsed, "wall_time": self.wall_time,
+                "speedup": elapsed / self.wall_time if self.wall_time else 0.0,
+                "goodput": client.acks_received / sent if sent else 0.0,
+                "packets_per_sec": client.acks_received / elapsed
+                if elapsed else 0.0,
+                "bytes_per_sec": client.acks_received * self.segment_size
+                / elapsed if elapsed else 0.0,
+                "retransmits": client.packets_dropped_counter,
+                "fast_retransmits": client.fast_retransmits,
+                "timeouts": client.rtt_estimator.timeouts,
+                "win_size": client.win_size,
+                "srtt": client.rtt_estimator.srtt,
+                "datagrams_lost": self.data_link.datagrams_lost
+                + self.ack_link.datagrams_lost,
+                "queue_drops": self.data_link.queue_drops
+                + self.ack_link.queue_drops}
+
+
+def simulate(quiet=True, time_limit=None, trace_file=None, **options):
+    """
+    Runs one simulated transfer
+    Args:
+        quiet (bool): Send the output of the client and session to os.devnull
+        time_limit (float): Virtual seconds to give up after
+        trace_file (str): Where to write the trace, if options turn it on
+        options: Simulator arguments
+    Returns: dict of the stats of the run, see Simulator.result
+    """
+    sim = Simulator(**options)
+    if not quiet:
+        sim.run(time_limit)
+    else:
+        with open(os.devnull, "w") as devnull, \
+                contextlib.redirect_stdout(devnull):
+            sim.run(time_limit)
+    if sim.tracer is not None and trace_file:
+        sim.tracer.dump(trace_file)
+    if sim.metrics is not None:
+        # the last, partial interval
+        sim.client.sample_metrics(sim.clock())
+        sim.metrics.close()
+    return sim.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discrete-event simulator of a transfer")
+    parser.add_argument("--packets", type=int, default=100000)
+    parser.add_argument("--segment-size", type=int, default=1024,
+                        help="payload bytes per packet, 0 for empty packets")
+    parser.add_argument("--cc", nargs="+", choices=sorted(ALGORITHMS),
+                        default=[DEFAULT_ALGORITHM])
+    parser.add_argument("--arq", nargs="+", choices=sorted(STRATEGIES),
+                        default=[DEFAULT_STRATEGY])
+    parser.add_argument("--bandwidth", type=float, nargs="+",
+                        default=[DEFAULT_BANDWIDTH],
+                        help="bytes per second, 0 for no limit")
+    parser.add_argument("--delay", type=float, nargs="+",
+                        default=[DEFAULT_DELAY], help="one-way delay in seconds")
+    parser.add_argument("--loss", type=float, nargs="+", default=[0.0],
+                        help="chance that a data datagram is lost")
+    parser.add_argument("--ack-loss", type=float, default=0.0,
+                        help="chance that an ACK datagram is lost")
+    parser.add_argument("--queue", type=int, nargs="+", default=[None],
+                        help="bytes of the bottleneck queue "
+                             "(default: one bandwidth-delay product)")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1])
+    parser.add_argument("--pacing", choices=PACING_MODES, default=None,
+                        help="(default: cwnd for bbr, off otherwise)")
+    parser.add_argument("--pace-rate", type=float, default=None)
+    parser.add_argument("--mtu", type=int, default=DEFAULT_MTU)
+    parser.add_argument("--recv-budget", type=int, default=DEFAULT_RECV_BUDGET)
+    parser.add_argument("--read-rate", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="virtual seconds to give up after")
+    parser.add_argument("--warn-goodput", type=float, default=LOW_GOODPUT,
+                        help="flag runs whose goodput is below this")
+    parser.add_argument("--verbose", action="store_true",
+                        help="show the output of the client and server")
+    parser.add_argument("--trace", choices=LEVELS, default="off",
+                        help="record the events of both ends in virtual time")
+    parser.add_argument("--trace-file", default="simulator.trace",
+                        help="where the trace is written, a sweep adds "
+                             ".<run> for every run")
+    parser.add_argument("--trace-capacity", type=int,
+                        default=DEFAULT_CAPACITY)
+    parser.add_argument("--metrics", default=None,
+                        help="file for the client's metrics in virtual time, "
+                             "CSV if it ends in .csv, a sweep numbers it for "
+                             "every run")
+    parser.add_argument("--metrics-interval", type=float,
+                        default=DEFAULT_INTERVAL,
+                        help="virtual seconds between rows of --metrics")
+    args = parser.parse_args()
+
+    print(f"{'cc':>8} {'arq':>3} {'bandwidth':>11} {'delay':>6} {'loss':>6} "
+          f"{'queue':>8} {'str':>3} {'done':>4} {'virtual s':>10} "
+          f"{'wall s':>7} {'speedup':>7} {'goodput':>7} {'pkts/s':>9} "
+          f"{'retx':>7} {'window':>6}")
+    runs = list(itertools.product(
+        args.cc, args.arq, args.bandwidth, args.delay, args.loss, args.queue,
+        args.streams))
+    for run, (cc, arq, bandwidth, delay, loss, queue, streams) in \
+            enumerate(runs):
+        trace_file = args.trace_file
+        metrics = args.metrics
+        if len(runs) > 1:
+            trace_file = f"{trace_file}.{run}"
+            if metrics:
+                metrics = numbered_path(metrics, run)
+        result = simulate(
+            quiet=not args.verbose, time_limit=args.time_limit,
+            trace_file=trace_file, trace=args.trace,
+            trace_capacity=args.trace_capacity, metrics=metrics,
+            metrics_interval=args.metrics_interval,
+            total_packets=args.packets, segment_size=args.segment_size,
+            bandwidth=bandwidth or None, delay=delay, loss=loss,
+            ack_loss=args.ack_loss, queue_limit=queue, mtu=args.mtu,
+            congestion_control=cc, arq=arq, pacing=args.pacing,
+            pacing_rate=args.pace_rate, streams=streams,
+            recv_budget=args.recv_budget, read_rate=args.read_rate,
+            seed=args.seed)
+        print(f"{cc:>8} {arq:>3} {bandwidth:>11.0f} {delay:>6.3f} {loss:>6.3f} "
+              f"{queue if queue is not None else 'bdp':>8} {streams:>3} "
+              f"{'yes' if result['done'] else 'no':>4} "
+              f"{result['virtual_time']:>10.3f} {result['wall_time']:>7.2f} "
+              f"{result['speedup']:>7.1f} {result['goodput']:>7.3f} "
+              f"{result['packets_per_sec']:>9.0f} "
+              f"{result['retransmits']:>7} {result['win_size']:>6}")
+        if result['goodput'] < args.warn_goodput:
+            print(f"Warning: goodput {result['goodput']:.3f} is below "
+                  f"{args.warn_goodput}, {result['retransmits']} of "
+                  f"{args.packets} packets were sent again")
+
+
+if __name__ == '__main__':
+    main()
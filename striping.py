@@ -0,0 +1,224 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Striping
+"""
+Striped transfers. One Client runs on one core, so a striped transfer
+cuts the packets (or the segments of a file) into contiguous stripes
+and sends each one from its own worker process over its own connection,
+with its own window and sequence numbers starting at 0 (see --stripes
+in the client). The handshake says where the stripe belongs:
+    transfer=<id> stripe=<index> stripes=<count> first=<packet>
+    packets=<packets in the stripe> total=<packets in the transfer>
+plus the size, segment and checksum of the whole file, if one is sent.
+
+The server gathers the stripes with the same transfer id in a
+StripedTransfer. The stripes of a file are written to one FileSink at
+their offsets, so they come back together as one ordered file, and the
+stats of the stripes are combined once the last one ends. The stripes
+must all reach the same server process, so striping needs the asyncio
+server (async_server.py).
+"""
+
+import time
+
+from file_transfer import FileSink
+
+
+def stripe_ranges(total_packets, stripes):
+    """
+    Cuts the packets into contiguous stripes of nearly the same size
+    Args:
+        total_packets (int): Packets of the whole transfer
+        stripes (int): Number of stripes wanted, at most one per packet
+    Returns: List of (first packet, packets) of each stripe
+    """
+    stripes = max(1, min(stripes, total_packets))
+    ranges = []
+    first = 0
+    for i in range(stripes):
+        count = total_packets // stripes + (i < total_packets % stripes)
+        ranges.append((first, count))
+        first += count
+    return ranges
+
+
+class Stripe:
+    """
+    One stripe of a StripedTransfer, held by the session receiving it
+    Args:
+        transfer (StripedTransfer): Transfer the stripe is part of
+        index (int): Position of the stripe in the transfer
+        first (int): Packet of the transfer the stripe starts at
+        count (int): Packets in the stripe
+    """
+
+    def __init__(self, transfer, index, first, count):
+        self.transfer = transfer
+        self.index = index
+        self.first = first
+        self.count = count
+        self.total_segments = count
+        self.session = None  # ReceiverSession of the stripe's connection
+        self.done = False  # the stripe's connection has ended
+
+    def write(self, seq_num, payload):
+        """
+        Copies a segment of the stripe to its place in the whole file
+        Args:
+            seq_num (int): Sequence number of the segment in the stripe
+            payload (bytes-like): Data of the segment
+        Returns: False if the segment does not belong to the stripe or
+        was already written
+        """
+        if seq_num >= self.count:
+            return False
+        return self.transfer.sink.write(self.first + seq_num, payload)
+
+    def delivered(self):
+        """
+        Returns: Packets of the stripe received in order so far
+        """
+        stream = self.session.streams.get(0) if self.session else None
+        return min(stream.win_start, self.count) if stream else 0
+
+    def finish(self):
+        """
+        Adds the stats of the stripe's session to the transfer
+        Returns: A line about the stripe, followed by the combined stats
+        if it was the last stripe to end
+        """
+        self.done = True
+        return self.transfer.stripe_done(self)
+
+
+class StripedTransfer:
+    """
+    Server side of a striped transfer: puts the stripes that arrive on
+    separate connections back in order and combines their stats
+    Args:
+        transfer_id (str): Id the client gave the transfer
+        stripes (int): Number of stripes
+        total_packets (int): Packets of all stripes together
+        sink (FileSink): File the stripes are written to, None if the
+        packets carry no file
+        expected_checksum (str): SHA-256 of the whole file from the client
+    """
+
+    def __init__(self, transfer_id, stripes, total_packets, sink=None,
+                 expected_checksum=None):
+        self.transfer_id = transfer_id
+        self.stripes = [None] * stripes
+        self.total_packets = total_packets
+        self.sink = sink
+        self.expected_checksum = expected_checksum
+        self.started = time.time()  # the first stripe's handshake
+
+        self.packets = 0
+        self.acks_sent = 0
+        self.bytes_received = 0
+
+    def join(self, index, first, count):
+        """
+        Adds a stripe whose connection just did its handshake
+        Args:
+            index (int): Position of the stripe
+            first (int): Packet of the transfer the stripe starts at
+            count (int): Packets in the stripe
+        Returns: The Stripe, None if it does not fit the transfer
+        """
+        if not 0 <= index < len(self.stripes) or self.stripes[index] \
+                or first + count > self.total_packets:
+            return None
+        stripe = self.stripes[index] = Stripe(self, index, first, count)
+        return stripe
+
+    def in_order(self):
+        """
+        Returns: Packets of the whole transfer received in order, across
+        the stripes
+        """
+        delivered = 0
+        for stripe in self.stripes:
+            if stripe is None:
+                break
+            received = stripe.delivered()
+            delivered += received
+            if received < stripe.count:
+                break
+        return delivered
+
+    def ended(self):
+        """
+        Returns: True once the connection of every stripe has ended
+        """
+        return all(stripe is not None and stripe.done
+                   for stripe in self.stripes)
+
+    def stripe_done(self, stripe):
+        """
+        Args: stripe (Stripe): Stripe whose connection ended
+        Returns: A line about the stripe, followed by the combined stats
+        if it was the last stripe to end
+        """
+        session = stripe.session
+        self.packets += session.pkt_counter
+        self.acks_sent += session.acks_sent
+        self.bytes_received += session.bytes_received
+        line = (f"Stripe {stripe.index + 1}/{len(self.stripes)} of transfer "
+                f"{self.transfer_id}: packets {stripe.first} to "
+                f"{stripe.first + stripe.count - 1}, "
+                f"{stripe.delivered()} in order")
+        if not self.ended():
+            return line
+        return line + "\n" + self.summary()
+
+    def summary(self):
+        """
+        Closes the file, if any, and checks it against the client's checksum
+        Returns: A line with the combined stats of every stripe
+        """
+        elapsed = time.time() - self.started
+        in_order = self.in_order()
+        packet_rate = self.packets / elapsed if elapsed > 0 else 0.0
+        line = (f"Transfer {self.transfer_id}: {len(self.stripes)} stripes, "
+                f"{in_order}/{self.total_packets} packets in order, "
+                f"{self.packets} received, {self.acks_sent} ACKs in "
+                f"{elapsed:.3f}s ({packet_rate:.0f} packets/sec)")
+        if self.sink is None:
+            return line
+        digest = self.sink.checksum()
+        self.sink.close()
+        if in_order < self.total_packets:
+            result = "INCOMPLETE"
+        elif self.expected_checksum is None:
+            result = "not checked"
+        elif digest == self.expected_checksum:
+            result = "OK"
+        else:
+            result = "MISMATCH"
+        rate = self.bytes_received / elapsed if elapsed > 0 else 0.0
+        return (f"{line}\nFile {self.sink.path}: {self.bytes_received} bytes "
+                f"({rate:.0f} bytes/sec), sha256 {digest}, checksum {result}")
+
+
+def join_stripe(transfers, options, output_path=None):
+    """
+    Finds the transfer a handshake offer belongs to, starting it on the
+    first stripe that arrives, and adds the offer's stripe to it
+    Args:
+        transfers (dict): Transfers in progress by id, shared by the sessions
+        options (dict): Options of the offer, see parse_options
+        output_path (str): Where to write the file, None to drop the data
+    Returns: The Stripe, None if the offer does not fit the transfer
+    """
+    transfer_id = options["transfer"]
+    transfer = transfers.get(transfer_id)
+    if transfer is None:
+        sink = None
+        if output_path and "size" in options:
+            sink = FileSink(output_path, int(options["size"]),
+                            int(options["segment"]))
+        transfer = transfers[transfer_id] = StripedTransfer(
+            transfer_id, int(options["stripes"]), int(options["total"]),
+            sink, options.get("checksum"))
+    return transfer.join(int(options["stripe"]), int(options["first"]),
+                         int(options["packets"]))
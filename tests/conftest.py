@@ -0,0 +1,11 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Test configuration
+"""
+The modules live at the top of the repository, not in a package, so the
+tests import them from there.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
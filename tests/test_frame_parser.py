@@ -0,0 +1,126 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Frame parser tests
+"""
+Round trips of the ASCII and bin1 codecs through FrameParser, with the
+bytes fed whole, one at a time and cut at every offset, so frames split
+across reads are covered.
+"""
+
+import pytest
+
+import wire_format
+from frame_parser import FrameParser
+
+
+def bin1_stream():
+    codec = wire_format.get_codec("bin1")
+    buffer = bytearray(64)
+    end = codec.pack_data(buffer, 0, 70000, b"segment", stream=3)
+    frames = [
+        codec.encode_data(0),
+        bytes(buffer[:end]),
+        codec.encode_data(2**32 - 1, stream=255),
+        codec.encode_fin(3),
+    ]
+    expected = [
+        (wire_format.KIND_DATA, 0, 0, b""),
+        (wire_format.KIND_DATA, 3, 70000, b"segment"),
+        (wire_format.KIND_DATA, 255, 2**32 - 1, b""),
+        (wire_format.KIND_FIN, 3, 0, b""),
+    ]
+    return codec, b"".join(frames), expected
+
+
+def ascii_stream():
+    codec = wire_format.get_codec("ascii")
+    data = (codec.encode_data(0) + codec.encode_data(12345678901234)
+            + codec.encode_data(7) + codec.encode_fin())
+    expected = [
+        (wire_format.KIND_DATA, 0, 0, b""),
+        (wire_format.KIND_DATA, 0, 12345678901234, b""),
+        (wire_format.KIND_DATA, 0, 7, b""),
+        (wire_format.KIND_FIN, 0, 0, b""),
+    ]
+    return codec, data, expected
+
+
+STREAMS = {"bin1": bin1_stream, "ascii": ascii_stream}
+
+
+def parse(codec, chunks, buffer_size=64):
+    """
+    Feeds chunks to a parser and collects the frames after each one,
+    copying payloads before the next feed can move them
+    """
+    parser = FrameParser(codec, buffer_size)
+    frames = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        frames.extend((kind, stream, seq, bytes(payload))
+                      for kind, stream, seq, payload in parser.frames())
+    return frames, parser
+
+
+@pytest.mark.parametrize("name", sorted(STREAMS))
+def test_whole_stream(name):
+    codec, data, expected = STREAMS[name]()
+    frames, parser = parse(codec, [data])
+    assert frames == expected
+    assert parser.pending() == 0
+
+
+@pytest.mark.parametrize("name", sorted(STREAMS))
+def test_one_byte_at_a_time(name):
+    codec, data, expected = STREAMS[name]()
+    frames, parser = parse(codec, [data[i:i + 1] for i in range(len(data))],
+                           buffer_size=8)
+    assert frames == expected
+    assert parser.pending() == 0
+
+
+@pytest.mark.parametrize("name", sorted(STREAMS))
+def test_split_at_every_offset(name):
+    codec, data, expected = STREAMS[name]()
+    for cut in range(1, len(data)):
+        frames, parser = parse(codec, [data[:cut], data[cut:]])
+        assert frames == expected, cut
+        assert parser.pending() == 0
+
+
+@pytest.mark.parametrize("name", sorted(STREAMS))
+def test_partial_frame_is_held_back(name):
+    codec, data, expected = STREAMS[name]()
+    frames, parser = parse(codec, [data[:-1]])
+    assert frames == expected[:-1]
+    assert parser.pending() > 0
+    parser.feed(data[-1:])
+    assert list(parser.frames()) == expected[-1:]
+    assert parser.pending() == 0
+
+
+def test_bin1_sack_round_trip():
+    sender = wire_format.get_codec("bin1")
+    blocks = [(12, 20), (25, 26), (2**32 - 2, 2**32 - 1)]
+    data = sender.encode_sack(10, blocks, duplicates=2, window=300, stream=1)
+    receiver = wire_format.get_codec("bin1", wire_format.KIND_ACK)
+    frames, parser = parse(receiver, [data[:5], data[5:]])
+    [(kind, stream, cum_ack, payload)] = frames
+    assert (kind, stream, cum_ack) == (wire_format.KIND_SACK, 1, 10)
+    assert receiver.decode_sack(payload) == (2, 300, blocks)
+    assert parser.pending() == 0
+
+
+def test_ascii_numbers_decode_to_the_incoming_kind():
+    codec = wire_format.get_codec("ascii", wire_format.KIND_ACK)
+    frames, _ = parse(codec, [codec.encode_ack(41), codec.encode_ack(42)])
+    assert frames == [(wire_format.KIND_ACK, 0, 41, b""),
+                      (wire_format.KIND_ACK, 0, 42, b"")]
+
+
+def test_buffer_grows_for_a_frame_larger_than_it():
+    codec = wire_format.get_codec("bin1")
+    payload = bytes(range(256)) * 4
+    buffer = bytearray(codec.max_frame_size + len(payload))
+    codec.pack_data(buffer, 0, 5, payload)
+    frames, _ = parse(codec, [buffer[:100], buffer[100:]], buffer_size=16)
+    assert frames == [(wire_format.KIND_DATA, 0, 5, payload)]
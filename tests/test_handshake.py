@@ -0,0 +1,45 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Handshake tests
+"""
+Tests of ReceiverSession.receive_offer: offers split across reads,
+packets that arrive with the offer, and offers without an end marker.
+"""
+
+import wire_format
+from receiver_session import ReceiverSession
+
+
+def test_offer_split_across_reads():
+    session = ReceiverSession()
+    offer = wire_format.handshake_offer(("bin1",), streams=2)
+    for i in range(len(offer) - 1):
+        assert session.receive_offer(offer[i:i + 1]) is None
+    reply = session.receive_offer(offer[-1:])
+    assert wire_format.parse_accept(reply) == "bin1"
+    assert session.codec.name == "bin1"
+    assert session.max_streams == 2
+
+
+def test_packets_after_the_offer_go_to_the_parser():
+    session = ReceiverSession()
+    codec = wire_format.get_codec("bin1")
+    packets = codec.encode_data(0) + codec.encode_data(1)
+    data = wire_format.handshake_offer(("bin1",)) + packets
+    assert session.receive_offer(data[:-3]) is not None
+    session.parser.feed(data[-3:])
+    assert [seq for _, _, seq, _ in session.parser.frames()] == [0, 1]
+
+
+def test_offer_without_an_end_marker():
+    session = ReceiverSession()
+    offer = wire_format.handshake_offer(("bin1",)).rstrip(wire_format.OFFER_END)
+    assert session.receive_offer(offer) is None
+    reply = session.receive_offer(b"", complete=True)
+    assert wire_format.parse_accept(reply) == "bin1"
+
+
+def test_oversized_offer_is_taken_as_it_is():
+    session = ReceiverSession()
+    offer = wire_format.HANDSHAKE_REQUEST + b" " * wire_format.MAX_OFFER_SIZE
+    assert session.receive_offer(offer) is not None
+    assert session.codec.name == "ascii"
@@ -0,0 +1,78 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Receive window tests
+"""
+Tests of the circular bitmap, mostly of sequence numbers that wrap
+around its capacity.
+"""
+
+from receive_window import ReceiveWindow, WORD_BITS
+
+
+def test_capacity_rounds_up_to_a_power_of_two():
+    assert ReceiveWindow(100).capacity == 128
+    assert ReceiveWindow(1).capacity == WORD_BITS
+
+
+def test_mark_and_advance_in_order():
+    window = ReceiveWindow(64)
+    for seq_num in range(10):
+        assert window.mark(seq_num)
+    assert window.advance() == 10
+    assert window.is_received(9)
+    assert not window.is_received(10)
+
+
+def test_mark_refuses_packets_past_the_window():
+    window = ReceiveWindow(64)
+    assert not window.mark(64)
+    assert not window.in_window(64)
+    assert window.mark(63)
+    # behind the window counts as a duplicate
+    window.mark(0)
+    window.advance()
+    assert window.mark(0)
+
+
+def test_slots_are_reused_after_wraparound():
+    window = ReceiveWindow(64)
+    start = 0
+    # many laps of the ring, a full window at a time
+    for _ in range(20):
+        for seq_num in range(start, start + 64):
+            assert window.mark(seq_num)
+        start = window.advance()
+        assert start % 64 == 0
+        assert not window.is_received(start)
+        assert not window.is_received(start + 63)
+    assert start == 20 * 64
+
+
+def test_hole_across_the_wrap():
+    window = ReceiveWindow(64)
+    for seq_num in range(50):
+        window.mark(seq_num)
+    assert window.advance() == 50
+    # 50..113 is the window now, its slots wrap past the end of the ring
+    for seq_num in range(50, 114):
+        if seq_num != 70:
+            assert window.mark(seq_num)
+    assert window.advance() == 70
+    assert window.received_ranges(8) == [(71, 114)]
+    assert not window.is_received(70)
+    assert window.is_received(113)
+    window.mark(70)
+    assert window.advance() == 114
+
+
+def test_received_ranges_after_wraparound():
+    window = ReceiveWindow(128)
+    for seq_num in range(120):
+        window.mark(seq_num)
+    window.advance()
+    for seq_num in (121, 122, 130, 200, 201, 202, 247):
+        window.mark(seq_num)
+    assert window.received_ranges(8) == [(121, 123), (130, 131), (200, 203),
+                                         (247, 248)]
+    assert window.received_ranges(2) == [(121, 123), (130, 131)]
+    # old bits of the lap before must not show up as received
+    assert not window.is_received(128 + 5)
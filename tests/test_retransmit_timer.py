@@ -0,0 +1,76 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Retransmission timer tests
+"""
+Tests of the heap of retransmission timers: lazy deletion of cancelled
+and restarted timers, compaction, and timers stretched by a backed off
+RTO.
+"""
+
+from retransmit_timer import RetransmitTimer
+
+
+def test_expired_in_deadline_order():
+    timer = RetransmitTimer()
+    timer.schedule(3, 0.0, 3.0)
+    timer.schedule(1, 0.0, 1.0)
+    timer.schedule(2, 0.0, 2.0)
+    assert timer.expired(0.5) == []
+    assert timer.expired(2.5) == [1, 2]
+    assert len(timer) == 1
+    assert timer.expired(10.0) == [3]
+
+
+def test_cancelled_timer_is_skipped():
+    timer = RetransmitTimer()
+    for seq_num in range(5):
+        timer.schedule(seq_num, 0.0, 1.0)
+    assert timer.cancel(2)
+    assert not timer.cancel(2)
+    assert 2 not in timer
+    # the entry stays on the heap until it reaches the top
+    assert len(timer.heap) == 5
+    assert timer.expired(1.0) == [0, 1, 3, 4]
+    assert timer.heap == []
+
+
+def test_restarted_timer_only_fires_at_its_new_deadline():
+    timer = RetransmitTimer()
+    timer.schedule(7, 0.0, 1.0)
+    timer.schedule(7, 5.0, 1.0)
+    assert timer.next_deadline() == 6.0
+    assert timer.expired(2.0) == []
+    assert timer.expired(6.0) == [7]
+
+
+def test_next_deadline_drops_stale_entries():
+    timer = RetransmitTimer()
+    timer.schedule(1, 0.0, 1.0)
+    timer.schedule(2, 0.0, 2.0)
+    timer.cancel(1)
+    assert timer.next_deadline() == 2.0
+    assert len(timer.heap) == 1
+    timer.cancel(2)
+    assert timer.next_deadline() is None
+
+
+def test_compaction_bounds_the_heap():
+    timer = RetransmitTimer()
+    for seq_num in range(1000):
+        timer.schedule(seq_num, float(seq_num), 1.0)
+        if seq_num >= 10:
+            timer.cancel(seq_num - 10)
+    assert len(timer) == 10
+    assert len(timer.heap) <= 2 * len(timer) + 64 + 1
+    assert timer.expired(2000.0) == list(range(990, 1000))
+
+
+def test_backed_off_rto_stretches_running_timers():
+    timer = RetransmitTimer()
+    timer.schedule(1, 0.0, 1.0)
+    timer.schedule(2, 0.5, 1.0)
+    # the RTO doubled to 2, neither packet has been out that long
+    assert timer.expired(1.6, timeout=2.0) == []
+    assert timer.next_deadline() == 2.0
+    assert timer.expired(2.0, timeout=2.0) == [1]
+    assert timer.expired(2.5, timeout=2.0) == [2]
+    assert len(timer) == 0
@@ -0,0 +1,87 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Sender table tests
+"""
+Tests of the sender's ring of packet state, mostly of windows that wrap
+around it and of the ring growing with a window that wraps.
+"""
+
+import pytest
+
+from sender_table import SenderTable
+
+
+def send_and_ack(table, start, end, now=0.0):
+    table.reserve(end)
+    for seq_num in range(start, end):
+        table.mark_sent(seq_num, now)
+    return table.mark_acked_range(start, end)
+
+
+def test_slots_are_reused_after_wraparound():
+    table = SenderTable(1000, capacity=16)
+    base = 0
+    while base < 992:
+        assert send_and_ack(table, base, base + 8) == list(range(base, base + 8))
+        base = table.advance()
+    assert base == 992
+    assert table.capacity == 16
+    # cleared slots of the laps before do not leak into the new packets
+    for seq_num in range(992, 1000):
+        assert not table.is_sent(seq_num)
+        assert not table.is_acked(seq_num)
+        assert table.retransmit_count(seq_num) == 0
+
+
+def test_slot_outside_the_window_raises():
+    table = SenderTable(100, capacity=16)
+    with pytest.raises(IndexError):
+        table.slot(16)
+    send_and_ack(table, 0, 10)
+    table.advance()
+    assert table.slot(20) == 20 % 16
+    with pytest.raises(IndexError):
+        table.slot(26)
+
+
+def test_reserve_keeps_state_across_a_wrapped_ring():
+    table = SenderTable(1000, capacity=16)
+    send_and_ack(table, 0, 12)
+    assert table.advance() == 12
+    # 12..27 wraps: its slots are 12..15 and 0..11
+    table.reserve(28)
+    for seq_num in range(12, 28):
+        table.mark_sent(seq_num, float(seq_num))
+    table.mark_acked(14)
+    table.mark_acked(25)
+    table.mark_timed_out(20)
+    # the ring doubles, the packets keep their state in their new slots
+    table.reserve(60)
+    assert table.capacity == 64
+    assert table.is_acked(14) and table.is_acked(25)
+    assert not table.is_acked(13)
+    assert not table.is_sent(20)
+    assert table.retransmit_count(20) == 1
+    assert table.time_since_sent(27, now=30.0) == 3.0
+    assert table.acked_past_base() == 2
+
+
+def test_advance_stops_at_the_first_hole_past_the_wrap():
+    table = SenderTable(1000, capacity=16)
+    send_and_ack(table, 0, 10)
+    table.advance()
+    table.reserve(26)
+    for seq_num in range(10, 26):
+        table.mark_sent(seq_num)
+    table.mark_acked_range(10, 18)
+    table.mark_acked_range(19, 26)
+    assert table.advance() == 18
+    table.mark_acked(18)
+    assert table.advance() == 26
+
+
+def test_fin_is_the_last_index():
+    table = SenderTable(5, capacity=4)
+    assert len(table) == 6
+    send_and_ack(table, 0, 6)
+    assert table.advance() == 6
+    assert table.is_acked(table.fin_index)
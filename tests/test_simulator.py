@@ -0,0 +1,29 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Simulator tests
+"""
+Goodput of every congestion control algorithm over a simulated lossy
+path, so a change that makes an algorithm resend most of what it sends
+shows up here and not only in a benchmark.
+"""
+
+import pytest
+
+from congestion_control import ALGORITHMS
+from simulator import LOW_GOODPUT, simulate
+
+# 10 Mbit/s, 50ms RTT, 1% of the data datagrams lost
+PATH = {"bandwidth": 1.25e6, "delay": 0.025, "loss": 0.01}
+PACKETS = 20000
+# without fast retransmit every loss waits for a timeout
+FAST_RETRANSMIT_GOODPUT = 0.9
+
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+def test_goodput(name):
+    result = simulate(total_packets=PACKETS, congestion_control=name,
+                      time_limit=900, **PATH)
+    assert result["done"]
+    if ALGORITHMS[name].fast_retransmit:
+        assert result["goodput"] >= FAST_RETRANSMIT_GOODPUT
+    else:
+        assert result["goodput"] >= LOW_GOODPUT
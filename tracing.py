@@ -0,0 +1,245 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Tracing
+"""
+Structured tracing of the client and the server. Instead of printing a
+line for every packet, the hot paths record typed events into a binary
+ring buffer held in memory. Each record is a fixed size:
+    time (float64), kind (uint8), stream (uint8), a (int64), b (int64)
+where a and b depend on the kind of event (see EVENTS). Once the buffer
+is full the oldest records are overwritten, so a long transfer keeps
+its last `capacity` events. The buffer is written to a file with dump,
+at the end of a run or on demand with SIGUSR1 (see dump_on_signal), and
+read back with load or from the command line:
+    python tracing.py client.trace [--kind timeout fast_retransmit]
+        [--stream 0] [--last 100]
+
+Levels:
+    off      nothing is recorded (the default)
+    events   losses, timeouts, probes, drops and window changes
+    packets  also every packet sent, received and ACKed
+
+The components take one hook per level, see hook. A hook is the
+tracer's record method, or None when the tracer is off or below the
+level, so a disabled trace costs a single test in the hot loop:
+    if self.trace_packets:
+        self.trace_packets(SEND, stream_id, seq_num)
+"""
+
+import argparse
+import signal
+import struct
+import time
+
+OFF, EVENTS, PACKETS = 0, 1, 2
+LEVELS = {"off": OFF, "events": EVENTS, "packets": PACKETS}
+
+# Event kinds: name, level, and what a and b hold
+SEND = 1  # a: packet sent for the first time
+RETRANSMIT = 2  # a: packet sent again
+ACK = 3  # a - b: range of packets newly ACKed
+WINDOW = 4  # a: window size in packets, b: RTO in microseconds
+TIMEOUT = 5  # a: packet whose retransmission timer ran out
+FAST_RETRANSMIT = 6  # a: packet found lost by duplicate ACKs
+PROBE = 7  # a: packet sent again as a zero-window probe
+ADVANCE = 8  # a: new start of the window
+RECEIVE = 9  # a: packet received by the server
+DUPLICATE = 10  # a: packet received again
+DROP = 11  # a: packet dropped by the server, b: DROP_* reason
+ACK_SENT = 12  # a: cumulative ACK sent, b: receive window advertised
+
+EVENT_NAMES = {
+    SEND: "send", RETRANSMIT: "retransmit", ACK: "ack", WINDOW: "window",
+    TIMEOUT: "timeout", FAST_RETRANSMIT: "fast_retransmit", PROBE: "probe",
+    ADVANCE: "advance", RECEIVE: "receive", DUPLICATE: "duplicate",
+    DROP: "drop", ACK_SENT: "ack_sent",
+}
+
+# Why the server dropped a packet
+DROP_WINDOW, DROP_BUFFER, DROP_STREAM = 1, 2, 3
+DROP_REASONS = {DROP_WINDOW: "past the receive window",
+                DROP_BUFFER: "past the end of the buffer",
+                DROP_STREAM: "over the stream limit"}
+
+RECORD = struct.Struct("<dBBqq")
+# magic, version, record size, records kept, records recorded in total
+FILE_HEADER = struct.Struct("<4sHHQQ")
+MAGIC = b"SWTR"
+VERSION = 1
+
+DEFAULT_CAPACITY = 2**16  # records kept in the ring buffer
+
+
+class Tracer:
+    """
+    Ring buffer of fixed-size event records
+    Args:
+        level (str): off, events or packets
+        capacity (int): Records kept before the oldest are overwritten
+        clock (callable): Time of each record, the simulator passes its
+        virtual clock
+    """
+
+    def __init__(self, level="packets", capacity=DEFAULT_CAPACITY,
+                 clock=time.time):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown trace level: {level}")
+        if capacity < 1:
+            raise ValueError("A trace keeps at least one record")
+        self.level = LEVELS[level]
+        self.capacity = capacity
+        self.clock = clock
+        self.buffer = bytearray(RECORD.size * capacity)
+        self.offset = 0  # where the next record goes
+        self.recorded = 0  # records written in total, kept or not
+
+    def record(self, kind, stream=0, a=0, b=0):
+        """
+        Adds an event, overwriting the oldest one if the buffer is full
+        Args:
+            kind (int): Event kind, e.g. SEND
+            stream (int): Stream the event is about
+            a (int): First value, see EVENTS
+            b (int): Second value
+        """
+        RECORD.pack_into(self.buffer, self.offset, self.clock(), kind,
+                         stream, a, b)
+        self.offset += RECORD.size
+        if self.offset == len(self.buffer):
+            self.offset = 0
+        self.recorded += 1
+
+    def __len__(self):
+        return min(self.recorded, self.capacity)
+
+    def ordered(self):
+        """
+        Returns: bytes of the records kept, oldest first
+        """
+        if self.recorded < self.capacity:
+            return bytes(self.buffer[:self.offset])
+        return bytes(self.buffer[self.offset:] + self.buffer[:self.offset])
+
+    def events(self):
+        """
+        Returns: List of (time, kind, stream, a, b) of the records kept,
+        oldest first
+        """
+        return list(RECORD.iter_unpack(self.ordered()))
+
+    def dump(self, path):
+        """
+        Writes the records kept to a file, oldest first
+        Args: path (str): File to write
+        Returns: Number of records written
+        """
+        with open(path, "wb") as f:
+            f.write(FILE_HEADER.pack(MAGIC, VERSION, RECORD.size, len(self),
+                                     self.recorded))
+            f.write(self.ordered())
+        return len(self)
+
+    def __str__(self):
+        return (f"{len(self)} events kept of {self.recorded} recorded "
+                f"({self.capacity} max)")
+
+
+def hook(tracer, level):
+    """
+    Args:
+        tracer (Tracer): Tracer of the component, None for no tracing
+        level (int): EVENTS or PACKETS
+    Returns: The tracer's record method if it records events of the
+    level, otherwise None
+    """
+    if tracer is None or tracer.level < level:
+        return None
+    return tracer.record
+
+
+def dump_on_signal(tracer, path, signum=getattr(signal, "SIGUSR1", None)):
+    """
+    Dumps the trace whenever the process gets a signal (SIGUSR1 by
+    default), so a running transfer can be looked at. Does nothing where
+    the signal does not exist or outside the main thread.
+    Args:
+        tracer (Tracer): Tracer to dump
+        path (str): File to write
+        signum (int): Signal to dump on
+    """
+    if tracer is None or signum is None:
+        return
+    try:
+        signal.signal(signum, lambda *_: tracer.dump(path))
+    except ValueError:
+        pass  # not the main thread
+
+
+def load(path):
+    """
+    Reads a trace written by Tracer.dump
+    Args: path (str): File to read
+    Returns: (list of (time, kind, stream, a, b) oldest first, number of
+    records recorded in total)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f"{path} is not a trace")
+    magic, version, size, kept, recorded = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or size != RECORD.size:
+        raise ValueError(f"{path} is not a version {VERSION} trace")
+    body = data[FILE_HEADER.size:FILE_HEADER.size + kept * size]
+    if len(body) != kept * size:
+        raise ValueError(f"{path} is cut short")
+    return list(RECORD.iter_unpack(body)), recorded
+
+
+def describe(kind, stream, a, b):
+    """
+    Returns: One line of text for an event
+    """
+    name = EVENT_NAMES.get(kind, f"kind {kind}")
+    if kind == ACK:
+        detail = f"packets {a} - {b}"
+    elif kind == WINDOW:
+        detail = f"size {a} RTO {b / 1e6:.6f}s"
+    elif kind == ADVANCE:
+        detail = f"start {a}"
+    elif kind == DROP:
+        detail = f"packet {a} {DROP_REASONS.get(b, b)}"
+    elif kind == ACK_SENT:
+        detail = f"cumulative {a} window {b}"
+    else:
+        detail = f"packet {a}"
+    return f"{name:>15} stream {stream} {detail}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prints a trace file")
+    parser.add_argument("path")
+    parser.add_argument("--kind", nargs="+", choices=EVENT_NAMES.values(),
+                        help="only print these kinds of event")
+    parser.add_argument("--stream", type=int, default=None)
+    parser.add_argument("--last", type=int, default=None,
+                        help="only print the last N events that match")
+    args = parser.parse_args()
+
+    events, recorded = load(args.path)
+    kinds = None
+    if args.kind:
+        kinds = {kind for kind, name in EVENT_NAMES.items()
+                 if name in args.kind}
+    start = events[0][0] if events else 0.0
+    selected = [event for event in events
+                if (kinds is None or event[1] in kinds)
+                and (args.stream is None or event[2] == args.stream)]
+    if args.last is not None:
+        selected = selected[-args.last:] if args.last else []
+    for when, kind, stream, a, b in selected:
+        print(f"{when - start:12.6f} {describe(kind, stream, a, b)}")
+    print(f"{len(selected)} of {len(events)} events kept, "
+          f"{recorded} recorded")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# UDP transport
+"""
+UDP transport for the client and server programs.
+Over TCP the kernel already retransmits and paces the byte stream, so
+the sliding window never sees a real loss. UdpSocket gives a connected
+UDP socket the calls the programs make on a TCP socket (send, sendall,
+recv_into, settimeout, ...), so SendBuffer, FrameParser and the window,
+ACK and FIN logic run on top unchanged and do the reliability work.
+
+Sending packs as many whole frames into each datagram as fit in the MTU,
+so a lost datagram loses whole frames and never half of one.
+Receiving reads a batch of datagrams per call with recvfrom_into
+straight into the parser's buffer until the socket has nothing left.
+
+UDP has no connection setup, so the handshake is retried on a timeout.
+A repeated handshake offer is answered again by the server and a late
+handshake reply is dropped by the client.
+"""
+
+import select
+import socket
+import time
+
+import wire_format
+
+DEFAULT_MTU = 1500
+IP_UDP_OVERHEAD = 28  # 20 byte IPv4 header and 8 byte UDP header
+MAX_DATAGRAM = 2**16  # room to leave in the receive buffer for any datagram
+DEFAULT_RECV_BATCH = 64
+SOCKET_BUFFER_SIZE = 2**22  # asked for, the kernel may give less
+
+TRANSPORTS = ("tcp", "udp")
+
+
+class UdpSocket:
+    """
+    Connected UDP socket that looks like a TCP socket to the programs
+    Args:
+        mtu (int): Largest IP packet to send, frames are packed into
+        datagrams of at most mtu - 28 bytes
+        recv_batch (int): Most datagrams read by one recv_into call
+    """
+
+    def __init__(self, mtu=DEFAULT_MTU, recv_batch=DEFAULT_RECV_BATCH,
+                 sock=None):
+        if mtu <= IP_UDP_OVERHEAD + wire_format.HEADER.size:
+            raise ValueError(f"MTU {mtu} is too small for a frame")
+        self.sock = sock if sock else socket.socket(
+            socket.AF_INET, socket.SOCK_DGRAM)
+        for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, option,
+                                     SOCKET_BUFFER_SIZE)
+            except OSError:
+                pass
+        # the real socket never blocks, timeouts are waited for in select
+        self.sock.setblocking(False)
+        self.timeout = None
+        self.max_payload = mtu - IP_UDP_OVERHEAD
+        self.recv_batch = recv_batch
+        self.codec = None  # frames are not cut until the handshake is done
+        self.handshake_reply = None  # set by the server once it has replied
+        self.handshake_retries = 0
+
+        self.datagrams_sent = 0
+        self.datagrams_received = 0
+        self.recv_calls = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def bind(self, address):
+        self.sock.bind(address)
+
+    def connect(self, address):
+        self.sock.connect(address)
+
+    def getsockname(self):
+        return self.sock.getsockname()
+
+    def close(self):
+        self.sock.close()
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def setblocking(self, flag):
+        self.timeout = None if flag else 0.0
+
+    def wait(self, writing=False):
+        """
+        Waits until the socket is ready, up to the timeout
+        Args: writing (bool): Wait to send instead of to receive
+        Raises: socket.timeout if the timeout runs out first
+        """
+        if self.timeout == 0.0:
+            raise BlockingIOError("UDP socket is not ready")
+        fds = [self.sock]
+        if writing:
+            ready = select.select([], fds, [], self.timeout)[1]
+        else:
+            ready = select.select(fds, [], [], self.timeout)[0]
+        if not ready:
+            raise socket.timeout("timed out")
+
+    def recvfrom(self, size):
+        """
+        Receives one datagram, waiting up to the timeout
+        Returns: (bytes, address of the sender)
+        """
+        while True:
+            try:
+                data, address = self.sock.recvfrom(size)
+            except BlockingIOError:
+                self.wait()
+                continue
+            self.datagrams_received += 1
+            return data, address
+
+    def recv(self, size):
+        return self.recvfrom(size)[0]
+
+    def recv_into(self, buffer):
+        """
+        Reads a batch of datagrams back to back into buffer. Only the
+        first read waits, the rest stop as soon as the socket is empty.
+        Handshake messages that show up again are answered or dropped
+        here and never reach the frame parser.
+        Args: buffer (memoryview): Free space of the parser's buffer
+        Returns: Number of bytes read. 0 means the peer is gone (the
+        kernel got an ICMP port unreachable for it).
+        """
+        self.recv_calls += 1
+        recvfrom_into = self.sock.recvfrom_into
+        total = 0
+        count = 0
+        # the parser leaves MAX_DATAGRAM bytes free, so the first one fits
+        while not total or (count < self.recv_batch
+                            and len(buffer) - total >= MAX_DATAGRAM):
+            try:
+                num_bytes, _ = recvfrom_into(buffer[total:])
+            except BlockingIOError:
+                if total:
+                    break
+                self.wait()
+                continue
+            except ConnectionRefusedError:
+                if total:
+                    break
+                return 0
+            self.datagrams_received += 1
+            count += 1
+            datagram = buffer[total:total + num_bytes]
+            if datagram[:len(wire_format.HANDSHAKE_REQUEST)] == \
+                    wire_format.HANDSHAKE_REQUEST:
+                # our handshake reply was lost and the client asked again
+                if self.handshake_reply is not None:
+                    self.send_datagram(self.handshake_reply)
+                continue
+            if datagram[:len(wire_format.HANDSHAKE_REPLY)] == \
+                    wire_format.HANDSHAKE_REPLY:
+                # a late copy of the handshake reply
+                continue
+            total += num_bytes
+        return total
+
+    def send_datagram(self, data):
+        """
+        Sends one datagram
+        Returns: Number of bytes sent
+        Raises: BlockingIOError if the kernel has no room for it
+        """
+        sent = self.sock.send(data)
+        self.datagrams_sent += 1
+        return sent
+
+    def send(self, data):
+        """
+        Sends data as datagrams of whole frames, each at most max_payload
+        bytes. Before the handshake picks a codec, data goes out as one
+        datagram.
+        Args: data (bytes-like): Encoded frames
+        Returns: Number of bytes sent, less than len(data) if the kernel
+        buffer filled up part way
+        Raises: BlockingIOError if nothing could be sent
+        """
+        view = memoryview(data).cast("B")
+        if self.codec is None:
+            return self.send_datagram(view)
+        fit = self.codec.fit
+        max_payload = self.max_payload
+        sent = 0
+        while sent < len(view):
+            size = fit(view[sent:], max_payload)
+            try:
+                self.send_datagram(view[sent:sent + size])
+            except BlockingIOError:
+                if sent:
+                    break
+                raise
+            sent += size
+        return sent
+
+    def sendall(self, data):
+        """
+        Sends every frame in data, waiting for room up to the timeout
+        Args: data (bytes-like): Encoded frames
+        """
+        view = memoryview(data).cast("B")
+        while len(view):
+            try:
+                sent = self.send(view)
+            except BlockingIOError:
+                self.wait(writing=True)
+                continue
+            view = view[sent:]
+
+    def request(self, message, timeout, retries=8):
+        """
+        Sends a handshake message and waits for the reply. The message is
+        sent again with a doubled timeout whenever no reply arrives.
+        Args:
+            message (bytes): Handshake message to send
+            timeout (float): Seconds to wait for the first reply
+            retries (int): Times the message is sent again before giving up
+        Returns: The reply
+        Raises: socket.timeout if no reply ever arrives
+        """
+        old_timeout = self.timeout
+        try:
+            for attempt in range(retries + 1):
+                self.handshake_retries = attempt
+                self.send_datagram(message)
+                self.timeout = timeout
+                deadline = time.time() + timeout
+                while True:
+                    try:
+                        reply = self.recv(2**16)
+                    except socket.timeout:
+                        break
+                    if reply.startswith(wire_format.HANDSHAKE_REPLY):
+                        return reply
+                    self.timeout = deadline - time.time()
+                    if self.timeout <= 0:
+                        break
+                timeout *= 2
+            raise socket.timeout("no handshake reply")
+        finally:
+            self.timeout = old_timeout
+
+    def __str__(self):
+        return (f"datagrams sent {self.datagrams_sent}, received "
+                f"{self.datagrams_received} in {self.recv_calls} reads")
@@ -0,0 +1,163 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Wire capture
+"""
+Capture of the exact bytes the client sends to the server, and when,
+so a slow transfer can be replayed against a server with
+replay_capture.py instead of running the client again. The client
+records its handshake offer, the server's reply and the bytes taken by
+every send() call (with --capture). The bytes are kept as they went on
+the wire, so a capture is in whichever wire format the handshake picked,
+ASCII or bin1, and the reply says which.
+
+File format, little-endian:
+    header   magic b"SWWC", version (uint16), length of the transport
+             name (uint8), then the name (tcp or udp)
+    records  seconds since the capture started (float64), kind (uint8),
+             length (uint32), then the bytes
+A record costs 13 bytes on top of its data and the client sends a whole
+window per send() call, so the file is barely larger than the transfer.
+
+Run: python wire_capture.py client.wire [--records N]
+"""
+
+import argparse
+import struct
+import time
+
+import wire_format
+
+FILE_HEADER = struct.Struct("<4sHB")
+RECORD = struct.Struct("<dBI")
+MAGIC = b"SWWC"
+VERSION = 1
+BUFFER_SIZE = 2**20  # the file is written in large blocks
+
+OFFER = 1  # the client's handshake offer
+REPLY = 2  # the server's handshake reply, received, not sent
+SEND = 3  # bytes taken by one send() call
+
+KIND_NAMES = {OFFER: "offer", REPLY: "reply", SEND: "send"}
+
+
+class WireCapture:
+    """
+    Writes what the client sends to a capture file, as it is sent
+    Args:
+        path (str): File to write
+        transport (str): tcp or udp, kept in the header
+        clock (function): Returns the current time in seconds
+    """
+
+    def __init__(self, path, transport="tcp", clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.started = clock()
+        self.records = 0
+        self.bytes = 0
+        self.file = open(path, "wb", buffering=BUFFER_SIZE)
+        name = transport.encode()
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, len(name)) + name)
+
+    def record(self, kind, data):
+        """
+        Adds a record
+        Args:
+            kind (int): OFFER, REPLY or SEND
+            data (bytes-like): The bytes, e.g. a memoryview of the send
+            buffer
+        """
+        self.file.write(RECORD.pack(self.clock() - self.started, kind,
+                                    len(data)))
+        self.file.write(data)
+        self.records += 1
+        self.bytes += len(data)
+
+    def close(self):
+        self.file.close()
+
+    def __str__(self):
+        return f"{self.records} records, {self.bytes} bytes in {self.path}"
+
+
+def load(path):
+    """
+    Reads a file written by a WireCapture
+    Args: path (str): Capture file
+    Returns: (transport, list of (time, kind, bytes) records)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f"{path} is not a capture file")
+    magic, version, length = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} capture file")
+    offset = FILE_HEADER.size
+    transport = data[offset:offset + length].decode()
+    offset += length
+    records = []
+    # a capture cut short may end in part of a record
+    while len(data) - offset >= RECORD.size:
+        when, kind, size = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if len(data) - offset < size:
+            break
+        records.append((when, kind, data[offset:offset + size]))
+        offset += size
+    return transport, records
+
+
+def wire_format_of(records):
+    """
+    Args: records (list): Records of a capture
+    Returns: Name of the wire format of the SEND records, from the
+    recorded handshake reply
+    """
+    for _, kind, data in records:
+        if kind == REPLY:
+            return wire_format.parse_accept(data)
+    raise ValueError("The capture has no handshake reply")
+
+
+def describe(transport, records):
+    """
+    Args:
+        transport (str): Transport of the capture
+        records (list): Records of the capture
+    Returns: Summary of the capture: sends, bytes, frames and timing
+    """
+    name = wire_format_of(records)
+    sends = [(when, data) for when, kind, data in records if kind == SEND]
+    if not sends:
+        return f"{transport}, {name}: no data sent"
+    # frames may be split across sends, so decode the stream as a whole
+    frames, _ = wire_format.get_codec(name).decode(
+        b"".join(data for _, data in sends))
+    kinds = {}
+    for kind, _, _, _ in frames:
+        kinds[kind] = kinds.get(kind, 0) + 1
+    total = sum(len(data) for _, data in sends)
+    duration = sends[-1][0] - sends[0][0]
+    gaps = [later[0] - earlier[0] for earlier, later in zip(sends, sends[1:])]
+    return (f"{transport}, {name}: {len(sends)} sends, {total} bytes "
+            f"({total / len(sends):.0f} per send) over {duration:.3f}s, "
+            f"{kinds.get(wire_format.KIND_DATA, 0)} data frames, "
+            f"{kinds.get(wire_format.KIND_FIN, 0)} FINs, "
+            f"largest gap {max(gaps, default=0) * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prints a wire capture file")
+    parser.add_argument("path", help="capture file")
+    parser.add_argument("--records", type=int, default=0,
+                        help="also list the first N records")
+    args = parser.parse_args()
+    transport, records = load(args.path)
+    print(describe(transport, records))
+    for when, kind, data in records[:args.records]:
+        print(f"{when:12.6f} {KIND_NAMES.get(kind, kind):5} {len(data):8} "
+              f"{bytes(data[:16]).hex()}")
+
+
+if __name__ == '__main__':
+    main()
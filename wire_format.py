@@ -0,0 +1,445 @@
+# Authors: Channon Zuo and Sophia Sorensen
+# Wire format
+"""
+Wire formats shared by the client and server programs.
+There are two codecs: AsciiCodec and BinaryCodec.
+AsciiCodec is the original format where every frame is a sequence
+number (or "FIN") followed by a comma.
+BinaryCodec is a versioned fixed-width format built on struct. Every
+frame starts with an 8 byte header:
+    kind (1 byte), stream (1 byte), length (2 bytes), seq (4 bytes)
+followed by `length` bytes of payload. A DATA frame's payload is the
+segment of the file being sent, if there is one. The stream byte says
+which stream of the connection a DATA, SACK or FIN frame belongs to;
+every stream has its own sequence space.
+A SACK frame carries a cumulative ACK in seq (every packet before it has
+arrived) and a payload of the duplicate packets counted since the last
+ACK, the receive window (how many packets past seq the server can take)
+and then (start, end) blocks of packets received past seq.
+
+The codec is picked during the handshake. The client offers the formats
+it knows and the server answers with the one it picked. A peer that does
+not know about negotiation falls back to ASCII. The offer and the reply
+can carry more key=value options after the format, e.g. the size of the
+file being sent or the number of streams. The offer ends in a newline
+so a server reading a stream knows when it has all of it.
+"""
+
+import struct
+
+KIND_DATA = 1
+KIND_ACK = 2
+KIND_FIN = 3
+KIND_SACK = 4
+
+HEADER = struct.Struct("!BBHI")
+SACK_INFO = struct.Struct("!II")  # duplicates, receive window
+SACK_BLOCK = struct.Struct("!II")
+MAX_SACK_BLOCKS = (2**16 - 1 - SACK_INFO.size) // SACK_BLOCK.size
+MAX_SEQ_NUM = 2**32 - 1
+MAX_WINDOW = 2**32 - 1
+
+HANDSHAKE_REQUEST = b"Network"
+HANDSHAKE_REPLY = b"Success"
+OFFER_END = b"\n"  # ends the offer, a TCP read may hold only part of it
+MAX_OFFER_SIZE = 4096
+
+
+class AsciiCodec:
+    """
+    Comma separated ASCII frames. Numbers decode to `incoming_kind`
+    because the format does not say whether a number is a packet or an ACK.
+    """
+
+    name = "ascii"
+    supports_sack = False
+    supports_payload = False
+    supports_streams = False
+    max_frame_size = 21  # 20 digits and a comma
+
+    def __init__(self, incoming_kind=KIND_DATA):
+        self.incoming_kind = incoming_kind
+
+    def encode_data(self, seq_num, stream=0):
+        """
+        Encodes a data segment
+        Args:
+            seq_num (int): Sequence number of the segment
+            stream (int): Must be 0, ASCII frames have no stream id
+        Returns: bytes to send
+        """
+        if stream:
+            raise ValueError("ASCII frames cannot carry a stream id")
+        return b"%d," % seq_num
+
+    def pack_data(self, buffer, offset, seq_num, payload=b"", stream=0):
+        """
+        Encodes a data segment into a buffer
+        Args:
+            buffer (bytearray): Buffer with room for max_frame_size bytes
+            offset (int): Where the frame starts
+            seq_num (int): Sequence number of the segment
+            payload (bytes-like): Must be empty, ASCII frames have no payload
+            stream (int): Must be 0, ASCII frames have no stream id
+        Returns: Offset just past the frame
+        """
+        if len(payload):
+            raise ValueError("ASCII frames cannot carry a payload")
+        if stream:
+            raise ValueError("ASCII frames cannot carry a stream id")
+        frame = b"%d," % seq_num
+        end = offset + len(frame)
+        buffer[offset:end] = frame
+        return end
+
+    def encode_ack(self, seq_num):
+        """
+        Encodes an ACK
+        Args: seq_num (int): Sequence number being acknowledged
+        Returns: bytes to send
+        """
+        return b"%d," % seq_num
+
+    def encode_fin(self, stream=0):
+        """
+        Encodes a FIN
+        Args: stream (int): Must be 0, ASCII frames have no stream id
+        Returns: bytes to send
+        """
+        if stream:
+            raise ValueError("ASCII frames cannot carry a stream id")
+        return b"FIN,"
+
+    def decode(self, data):
+        """
+        Decodes every complete frame in data
+        Args: data (bytes-like): Bytes received from the socket
+        Returns: (frames, consumed) where frames is a list of
+        (kind, stream, seq, payload) tuples and consumed is the number
+        of bytes that made up complete frames
+        """
+        data = bytes(data)
+        consumed = data.rfind(b",") + 1
+        frames = []
+        for token in data[:consumed].split(b","):
+            if not token:
+                continue
+            if token == b"FIN":
+                frames.append((KIND_FIN, 0, 0, b""))
+            else:
+                frames.append((self.incoming_kind, 0, int(token), b""))
+        return frames, consumed
+
+    def split(self, data):
+        """
+        Cuts data into complete frames without decoding them
+        Args: data (bytes-like): Bytes received from the socket
+        Returns: (frames, consumed) where frames is a list of
+        (kind, raw bytes of the frame) tuples
+        """
+        data = bytes(data)
+        consumed = data.rfind(b",") + 1
+        frames = []
+        for token in data[:consumed].split(b","):
+            if token:
+                kind = KIND_FIN if token == b"FIN" else self.incoming_kind
+                frames.append((kind, token + b","))
+        return frames, consumed
+
+    def fit(self, data, limit):
+        """
+        Finds how much of data can go out together without cutting a frame
+        Args:
+            data (bytes-like): Encoded frames
+            limit (int): Most bytes wanted
+        Returns: Length of the whole frames at the start of data that fit
+        in limit. A first frame longer than limit is returned on its own.
+        """
+        data = bytes(data[:limit + self.max_frame_size])
+        cut = data.rfind(b",", 0, limit) + 1
+        if not cut:
+            cut = data.find(b",") + 1
+        return cut if cut else len(data)
+
+
+class BinaryCodec:
+    """
+    Fixed-width binary frames (version 1)
+    """
+
+    name = "bin1"
+    supports_sack = True
+    supports_payload = True
+    supports_streams = True
+    max_frame_size = HEADER.size  # without payload
+
+    def __init__(self, incoming_kind=KIND_DATA):
+        self.incoming_kind = incoming_kind
+
+    def encode_data(self, seq_num, stream=0):
+        """
+        Encodes a data segment
+        Args:
+            seq_num (int): Sequence number of the segment
+            stream (int): Stream the segment belongs to
+        Returns: bytes to send
+        """
+        return HEADER.pack(KIND_DATA, stream, 0, seq_num)
+
+    def pack_data(self, buffer, offset, seq_num, payload=b"", stream=0):
+        """
+        Encodes a data segment into a buffer
+        Args:
+            buffer (bytearray): Buffer with room for max_frame_size bytes
+            plus the payload
+            offset (int): Where the frame starts
+            seq_num (int): Sequence number of the segment
+            payload (bytes-like): Data of the segment, copied straight
+            from the caller's memoryview into the buffer
+            stream (int): Stream the segment belongs to
+        Returns: Offset just past the frame
+        """
+        length = len(payload)
+        HEADER.pack_into(buffer, offset, KIND_DATA, stream, length, seq_num)
+        offset += HEADER.size
+        if length:
+            buffer[offset:offset + length] = payload
+        return offset + length
+
+    def encode_ack(self, seq_num):
+        """
+        Encodes an ACK
+        Args: seq_num (int): Sequence number being acknowledged
+        Returns: bytes to send
+        """
+        return HEADER.pack(KIND_ACK, 0, 0, seq_num)
+
+    def encode_sack(self, cum_ack, blocks, duplicates=0, window=MAX_WINDOW,
+                    stream=0):
+        """
+        Encodes a cumulative ACK with SACK blocks
+        Args:
+            cum_ack (int): Every packet before this one has been received
+            blocks (list): (start, end) ranges received past cum_ack, end
+            exclusive
+            duplicates (int): Duplicate packets received since the last ACK
+            window (int): Packets past cum_ack the receiver can take
+            stream (int): Stream the ACK is for
+        Returns: bytes to send
+        """
+        blocks = blocks[:MAX_SACK_BLOCKS]
+        length = SACK_INFO.size + SACK_BLOCK.size * len(blocks)
+        frame = bytearray(HEADER.size + length)
+        HEADER.pack_into(frame, 0, KIND_SACK, stream, length, cum_ack)
+        SACK_INFO.pack_into(frame, HEADER.size, duplicates,
+                            min(window, MAX_WINDOW))
+        offset = HEADER.size + SACK_INFO.size
+        for start, end in blocks:
+            SACK_BLOCK.pack_into(frame, offset, start, end)
+            offset += SACK_BLOCK.size
+        return bytes(frame)
+
+    @staticmethod
+    def decode_sack(payload):
+        """
+        Reads the payload of a SACK frame
+        Args: payload (bytes-like): Payload of the frame
+        Returns: (duplicates, window, blocks)
+        """
+        duplicates, window = SACK_INFO.unpack_from(payload)
+        blocks = list(SACK_BLOCK.iter_unpack(payload[SACK_INFO.size:]))
+        return duplicates, window, blocks
+
+    def encode_fin(self, stream=0):
+        """
+        Encodes a FIN
+        Args: stream (int): Stream that is done
+        Returns: bytes to send
+        """
+        return HEADER.pack(KIND_FIN, stream, 0, 0)
+
+    def decode(self, data):
+        """
+        Decodes every complete frame in data
+        Args: data (bytes-like): Bytes received from the socket
+        Returns: (frames, consumed) where frames is a list of
+        (kind, stream, seq, payload) tuples and consumed is the number
+        of bytes that made up complete frames. Payloads are memoryviews
+        into data.
+        """
+        view = memoryview(data).cast("B")
+        end = len(view)
+        header_size = HEADER.size
+        if end % header_size == 0 and not any(view[2::header_size]) \
+                and not any(view[3::header_size]):
+            # fast path: whole header-only frames, no payloads to slice out
+            return [(kind, stream, seq, b"") for kind, stream, _, seq
+                    in HEADER.iter_unpack(view)], end
+
+        unpack_from = HEADER.unpack_from
+        frames = []
+        offset = 0
+        while end - offset >= header_size:
+            kind, stream, length, seq = unpack_from(view, offset)
+            frame_end = offset + header_size + length
+            if frame_end > end:
+                break
+            if length:
+                payload = view[offset + header_size:frame_end]
+            else:
+                payload = b""
+            frames.append((kind, stream, seq, payload))
+            offset = frame_end
+        return frames, offset
+
+    def split(self, data):
+        """
+        Cuts data into complete frames without decoding them
+        Args: data (bytes-like): Bytes received from the socket
+        Returns: (frames, consumed) where frames is a list of
+        (kind, raw bytes of the frame) tuples
+        """
+        view = memoryview(data).cast("B")
+        end = len(view)
+        frames = []
+        offset = 0
+        while end - offset >= HEADER.size:
+            kind, _, length, _ = HEADER.unpack_from(view, offset)
+            frame_end = offset + HEADER.size + length
+            if frame_end > end:
+                break
+            frames.append((kind, bytes(view[offset:frame_end])))
+            offset = frame_end
+        return frames, offset
+
+    def fit(self, data, limit):
+        """
+        Finds how much of data can go out together without cutting a frame
+        Args:
+            data (bytes-like): Encoded frames
+            limit (int): Most bytes wanted
+        Returns: Length of the whole frames at the start of data that fit
+        in limit. A first frame longer than limit is returned on its own.
+        """
+        view = memoryview(data).cast("B")
+        end = min(len(view), limit)
+        header_size = HEADER.size
+        offset = 0
+        while offset + header_size <= len(view):
+            _, _, length, _ = HEADER.unpack_from(view, offset)
+            frame_end = offset + header_size + length
+            if frame_end > end:
+                break
+            offset = frame_end
+        if not offset and len(view) >= header_size:
+            # a frame that does not fit on its own still goes out whole
+            offset = min(len(view), header_size + HEADER.unpack_from(view)[2])
+        return offset
+
+
+CODECS = {
+    AsciiCodec.name: AsciiCodec,
+    BinaryCodec.name: BinaryCodec,
+}
+
+# Formats in order of preference
+SUPPORTED_FORMATS = (BinaryCodec.name, AsciiCodec.name)
+
+
+def get_codec(name, incoming_kind=KIND_DATA):
+    """
+    Returns a codec instance
+    Args:
+        name (str): Name of the wire format
+        incoming_kind (int): Kind given to ASCII numbers when decoding
+    Returns: A codec object
+    """
+    try:
+        return CODECS[name](incoming_kind)
+    except KeyError:
+        raise ValueError(f"Unknown wire format: {name}") from None
+
+
+def handshake_offer(formats=SUPPORTED_FORMATS, **options):
+    """
+    Builds the client's handshake message
+    Args:
+        formats (tuple): Wire formats the client can speak, best first
+        options: More key=value pairs to send, e.g. size=1024
+    Returns: bytes to send
+    """
+    message = HANDSHAKE_REQUEST + b" formats=" + ",".join(formats).encode()
+    for key, value in options.items():
+        message += f" {key}={value}".encode()
+    return message + OFFER_END
+
+
+def split_offer(data):
+    """
+    Finds the end of the client's handshake message in the bytes received
+    Args: data (bytes): Bytes received from the client so far
+    Returns: (offer, rest) once the whole offer is in, rest being the
+    bytes after it, or None while it is still coming
+    """
+    end = data.find(OFFER_END)
+    if end < 0:
+        return None
+    return data[:end], data[end + len(OFFER_END):]
+
+
+def parse_options(message):
+    """
+    Reads the key=value options out of a handshake message
+    Args: message (bytes): Handshake message
+    Returns: dict of option name to value, both str
+    """
+    options = {}
+    for token in message.decode().split()[1:]:
+        key, sep, value = token.partition("=")
+        if sep:
+            options[key] = value
+    return options
+
+
+def parse_offer(message, formats=SUPPORTED_FORMATS):
+    """
+    Picks the wire format for a client's handshake message
+    Args:
+        message (bytes): Handshake message from the client
+        formats (tuple): Wire formats the server can speak
+    Returns: Name of the format to use. ASCII if the client made no offer.
+    """
+    offer = parse_options(message).get("formats", "")
+    for name in offer.split(","):
+        if name in formats:
+            return name
+    return AsciiCodec.name
+
+
+def handshake_accept(name, **options):
+    """
+    Builds the server's handshake reply
+    Args:
+        name (str): Wire format picked by the server
+        options: More key=value pairs to send, e.g. streams=4
+    Returns: bytes to send
+    """
+    if name == AsciiCodec.name:
+        # keep the reply older clients expect
+        return HANDSHAKE_REPLY
+    message = HANDSHAKE_REPLY + b" format=" + name.encode()
+    for key, value in options.items():
+        message += f" {key}={value}".encode()
+    return message
+
+
+def parse_accept(message):
+    """
+    Reads the wire format out of the server's handshake reply
+    Args: message (bytes): Handshake reply from the server
+    Returns: Name of the format to use. ASCII if the server did not pick one.
+    """
+    name = parse_options(message).get("format", "")
+    if name in CODECS:
+        return name
+    return AsciiCodec.name